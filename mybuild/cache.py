@@ -0,0 +1,208 @@
+"""
+Persistent cache of resolved configurations.
+"""
+
+__all__ = [
+    "ResolveCache",
+    "file_digest",
+    "listing_digest",
+    "optuple_descriptor",
+    "optuple_for",
+]
+
+
+from _compat import *
+
+import hashlib
+import os
+import sys
+import pickle
+
+import mybuild
+from mybuild.core import MybuildError
+
+import util, logging
+logger = util.get_extended_logger(__name__)
+
+
+def file_digest(path):
+    """Returns a hex digest of the file contents, or None if it is missing."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def listing_digest(path, names=None):
+    """Returns a hex digest of a listing of files within the directory tree
+    (only of files with the given names, if any), or None if it is missing.
+    It changes whenever such a file is added or removed."""
+    if not os.path.isdir(path):
+        return None
+
+    listing = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, path)
+        listing.extend(os.path.join(rel_dir, filename)
+                       for filename in sorted(filenames)
+                       if names is None or filename in names)
+
+    return hashlib.sha1('\n'.join(listing).encode('utf-8')).hexdigest()
+
+
+def module_for(fullname):
+    """Looks up a module type by its fullname. Raises ImportError if there is
+    no such module.
+
+    The fullname of a module is a name of a Python module defining it with
+    the last component replaced by the name of the module type. Mybuild
+    packages export module types directly, otherwise sibling Python modules
+    already imported are searched. Names without a package refer to the
+    __main__ module."""
+    package_name, _, name = fullname.rpartition('.')
+    package_name = package_name or '__main__'
+    try:
+        __import__(package_name)
+    except (ImportError, ValueError):
+        raise ImportError('No module named {0}'.format(fullname))
+
+    py_module_names = [package_name] + sorted(py_module_name
+            for py_module_name in list(sys.modules)
+            if py_module_name.rpartition('.')[0] == package_name)
+
+    for py_module_name in py_module_names:
+        module = getattr(sys.modules.get(py_module_name), name, None)
+        if getattr(module, '_fullname', None) == fullname:
+            return module
+
+    raise ImportError('No module named {0}'.format(fullname))
+
+
+def optuple_descriptor(optuple):
+    """Returns a picklable descriptor of the optuple: a pair of the module
+    fullname and a tuple of (option, value) pairs of specified options."""
+    return optuple._module._fullname, tuple(optuple._iterpairs())
+
+
+def optuple_for(descriptor):
+    """Inverse of optuple_descriptor. Raises ImportError if the module
+    can't be found."""
+    fullname, options = descriptor
+    return module_for(fullname)(**dict(options))
+
+
+def optuples_of(instance_map):
+    """Converts an instance map into a list of optuple descriptors."""
+    return sorted(optuple_descriptor(instance._optuple)
+                  for instance in itervalues(instance_map))
+
+
+def instantiate_optuples(optuples):
+    """Instantiates modules from optuple descriptors (see optuples_of)
+    without solving, and returns an instance map."""
+    instance_map = {}
+
+    for descriptor in optuples:
+        optuple = optuple_for(descriptor)
+
+        instance = optuple._instantiate_module()
+        instance._post_init()
+
+        instance_map[type(instance)] = instance
+
+    return instance_map
+
+
+class ResolveCache(object):
+    """
+    Keeps instance maps of resolved configurations on disk, one file per conf
+    module.
+
+    An entry stores chosen optuples along with digests of source files that
+    were loaded at the time of resolution, and listings of directories these
+    files are searched in. It is only valid while none of these files change,
+    no new ones appear in the directories and the version of Mybuild is the
+    same.
+    """
+
+    def __init__(self, cache_dir, version=mybuild.__version__):
+        super(ResolveCache, self).__init__()
+        self.cache_dir = cache_dir
+        self.version = version
+
+    def path_for(self, conf_module):
+        fullname = conf_module._fullname
+        name = hashlib.sha1(fullname.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.pickle')
+
+    def load(self, conf_module):
+        """Returns a cached instance map for the conf_module, or None."""
+        path = self.path_for(conf_module)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (IOError, OSError, EOFError, ImportError, AttributeError,
+                pickle.UnpicklingError):
+            return None
+
+        if not self.is_valid(conf_module, entry):
+            logger.debug('stale cache for %s', conf_module._fullname)
+            return None
+
+        try:
+            return instantiate_optuples(entry['optuples'])
+        except (ImportError, ValueError, MybuildError) as e:
+            logger.debug('unable to use cache for %s: %s',
+                         conf_module._fullname, e)
+            return None
+
+    def is_valid(self, conf_module, entry):
+        try:
+            if (entry['version'] != self.version or
+                    entry['conf'] != conf_module._fullname):
+                return False
+            files = entry['files']
+            dirs  = entry['dirs']
+            names = entry['names']
+        except (KeyError, TypeError):
+            return False
+
+        return (all(file_digest(path) == digest
+                    for path, digest in iteritems(files)) and
+                all(listing_digest(path, names) == digest
+                    for path, digest in iteritems(dirs)))
+
+    def store(self, conf_module, instance_map, files, dirs=(), names=None):
+        """Stores the instance_map of the conf_module. Files is a list of
+        source files the resolution depends on, and dirs is a list of
+        directories to search for new files in (only for files with the given
+        names, if any)."""
+        if names is not None:
+            names = sorted(names)
+        entry = dict(version  = self.version,
+                     conf     = conf_module._fullname,
+                     files    = dict((path, file_digest(path))
+                                     for path in files),
+                     dirs     = dict((path, listing_digest(path, names))
+                                     for path in dirs),
+                     names    = names,
+                     optuples = optuples_of(instance_map))
+
+        path = self.path_for(conf_module)
+        tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=2)
+
+            if os.path.exists(path):
+                os.remove(path)  # rename fails on Windows otherwise
+            os.rename(tmp_path, path)
+
+        except (IOError, OSError, TypeError, pickle.PicklingError) as e:
+            logger.warning('unable to write cache for %s: %s',
+                           conf_module._fullname, e)
@@ -8,35 +8,65 @@ __date__ = "2012-11-09"
 __all__ = [
     "Context",
     "resolve",
+    "resolve_all",
 ]
 
 
 from _compat import *
 
+import multiprocessing
+
 from collections import deque
 from functools import partial
 from itertools import product
 from itertools import starmap
 
+from mybuild.cache import module_for
+from mybuild.cache import optuple_descriptor
+from mybuild.cache import optuple_for
 from mybuild.core import *
 from mybuild.pgraph import *
+from mybuild.profiling import null_profiler
 from mybuild.solver import solve
+from mybuild.solver import IncrementalSolver
+from mybuild.solver import SolveError
 
+from util.collections import OrderedDict
 from util.itertools import pop_iter
 
-import logging
+import util, logging
 logger = logging.getLogger(__name__)
 
 
 class Context(object):
     """docstring for Context"""
 
-    def __init__(self):
+    def __init__(self, lazy=False, workers=None, profiler=None):
+        """
+        In a lazy mode only optuples reachable from constraints (with the rest
+        options taking default values) are instantiated initially, and the
+        rest of each domain product is kept symbolic. Domains are expanded
+        on demand if there is no solution among instantiated optuples.
+
+        If workers is given, optuples are instantiated in a pool of that many
+        processes (see discover_all).
+
+        A profiler (see mybuild.profiling) records resolution phases and
+        instantiation of each module.
+        """
         super(Context, self).__init__()
         self._domains = dict()   # {module: domain}, domain is optuple of sets
         self._providers = dict() # {module: provider}
+        self._instances = OrderedDict()  # {optuple: instance or error}
         self._instantiation_queue = deque()
 
+        self.lazy = lazy
+        self._lazy_modules = set()  # modules with a symbolic domain product
+        self._posted = dict()       # {module: PostedIndex}
+
+        self.workers = workers
+        self.profiler = profiler if profiler is not None else null_profiler
+
         self.pgraph = ContextPgraph(self)
         self.instance_nodes = list()
 
@@ -47,12 +77,28 @@ class Context(object):
             domain = self._domains[module] = \
                 module._opmake(set(optype._values)
                                for optype in module._optypes)
-            self.post_product(domain)
+            if self.lazy:
+                self._lazy_modules.add(module)
+                # A module must not be selected unless one of its optuples
+                # has been instantiated, even if none of them is viable yet.
+                self.init_module_providers(module)
+            else:
+                self.post_product(domain)
 
         return domain
 
     def post(self, optuple, origin=None):
-        logger.debug("add %s (posted by %s)", optuple, origin)
+        module = optuple._module
+        try:
+            posted = self._posted[module]
+        except KeyError:
+            posted = self._posted[module] = PostedIndex(module)
+
+        if not posted.add(optuple):
+            return
+
+        if util.tracing:
+            logger.debug("add %s (posted by %s)", optuple, origin)
         self._instantiation_queue.append((optuple, origin))
 
     def post_product(self, iterables_optuple, origin=None):
@@ -61,68 +107,224 @@ class Context(object):
             self.post(optuple, origin)
 
     def post_discover(self, optuple, origin=None):
-        domain = self.domain_for(optuple._module)
+        module = optuple._module
+        domain = self.domain_for(module)
 
-        logger.debug("discover %s (posted by %s)", optuple, origin)
+        if util.tracing:
+            logger.debug("discover %s (posted by %s)", optuple, origin)
         for value, domain_to_extend in optuple._zipwith(domain):
             if value in domain_to_extend:
                 continue
 
             domain_to_extend.add(value)
 
-            self.post_product(optuple._make(option_domain
-                    if option_domain is not domain_to_extend else (value,)
-                    for option_domain in domain), origin)
+            if module not in self._lazy_modules:
+                self.post_product(optuple._make(option_domain
+                        if option_domain is not domain_to_extend else (value,)
+                        for option_domain in domain), origin)
+
+        if module in self._lazy_modules:
+            self.post_product(self.default_slice_for(optuple), origin)
+
+    def default_slice_for(self, optuple):
+        """Completes an optuple using default values of unspecified options
+        (or whole domains of options having no default)."""
+        domain = self.domain_for(optuple._module)
+
+        def values_for(value, optype, option_domain):
+            if value is Ellipsis:
+                value = optype.default
+            if value is Ellipsis:
+                return option_domain
+            return (value,)
+
+        return optuple._make(map(values_for, optuple._iter(with_ellipsis=True),
+                                 optuple._module._optypes, domain))
+
+    def expand_lazy_domains(self):
+        """Posts the rest of domain products of all modules instantiated
+        lazily so far. Returns whether there was anything to expand."""
+        lazy_modules = self._lazy_modules
+        self._lazy_modules = set()
+
+        for module in lazy_modules:
+            logger.debug("expand %r", module)
+            self.post_product(self._domains[module])
+
+        return bool(lazy_modules)
 
     def init_module_providers(self, module):
         if module not in self._providers:
             self._providers[module] = set()
 
     def init_instance_providers(self, instance):
-        self.init_module_providers(type(instance))
+        self.init_module_providers(instance._optuple._module)
         for module in instance.provides:
             # Just in case it is not discovered yet.
             self.init_module_providers(module)
             self._providers[module].add(instance)
 
     def instantiate(self, optuple, origin=None):
-        g = self.pgraph
-        node = g.node_for(optuple)
+        if util.tracing:
+            logger.debug("new %s (posted by %s)", optuple, origin)
 
-        logger.debug("new %s (posted by %s)", optuple, origin)
-        try:
-            instance = optuple._instantiate_module()
+        profiler = self.profiler
+        phase_name = optuple._module._fullname if profiler.enabled else None
 
-        except InstanceError as error:
-            logger.debug("    %s inviable: %s", optuple, error)
+        with profiler.phase(phase_name, 'instantiate') as phase:
+            if profiler.enabled:
+                phase['optuple'] = str(optuple)
 
-            node.error = error
-            g.new_const(False, node,
-                        why=why_inviable_instance_is_disabled)
+            try:
+                instance = optuple._instantiate_module()
+
+            except InstanceError as error:
+                phase['inviable'] = True
+                self.add_error(optuple, error)
+                return None
 
-        else:
             instance._post_init()
 
-            node.instance = instance
+        self.add_instance(optuple, instance)
+        return instance
+
+    def add_error(self, optuple, error):
+        if util.tracing:
+            logger.debug("    %s inviable: %s", optuple, error)
+
+        self._instances[optuple] = error
+
+    def add_instance(self, optuple, instance):
+        for constraint, condition in instance._constraints:
+            self.post_discover(constraint, instance)
+
+        self.init_instance_providers(instance)
+
+        self._instances[optuple] = instance
+
+    def add_remote_result(self, optuple, origin, result):
+        """Records a result of instantiate_remote, or instantiates the optuple
+        locally if the result is unusable here."""
+        if result is not None:
+            try:
+                instance = RemoteInstance.from_result(optuple, result)
+            except ImportError:
+                pass
+            else:
+                if util.tracing:
+                    logger.debug("new %s (posted by %s, remote)",
+                                 optuple, origin)
+                if isinstance(instance, InstanceError):
+                    self.add_error(optuple, instance)
+                else:
+                    self.add_instance(optuple, instance)
+                return
+
+        self.instantiate(optuple, origin)
+
+    def discover_all(self, initial_optuple=None):
+        """Instantiates all posted optuples along with anything they discover.
+
+        In a parallel mode the queue is processed in waves: optuples posted
+        so far are independent from each other and get instantiated in worker
+        processes, then their constraints are posted for the next wave.
+        Option values must be picklable to be passed to workers. Optuples
+        of modules that can't be found by their fullname (e.g. ones defined
+        in a function) are instantiated in this process."""
+        if initial_optuple is not None:
+            self.post_discover(initial_optuple)
+
+        profiler = self.profiler
+        with profiler.phase('discover_all', 'context') as phase:
+            nr_instances = len(self._instances)
+
+            if not self.workers:
+                for optuple, origin in pop_iter(self._instantiation_queue,
+                                                pop_meth='popleft'):
+                    if profiler.enabled:
+                        profiler.counter('instantiation_queue',
+                                size=len(self._instantiation_queue))
+                    self.instantiate(optuple, origin)
+            else:
+                self.discover_in_pool()
+
+            phase.update(nr_new_instances=len(self._instances)-nr_instances)
+            if profiler.enabled:
+                profiler.counter('candidates', **dict(
+                        (module._fullname, nr_candidates) for module,
+                        nr_candidates in iteritems(self.candidate_counts())))
+
+    def candidate_counts(self):
+        """Returns a dict mapping each module to a number of its optuples
+        posted for instantiation so far. A module with a number much greater
+        than the others likely has an overly large domain product."""
+        return dict((module, len(posted))
+                    for module, posted in iteritems(self._posted))
+
+    def discover_in_pool(self):
+        profiler = self.profiler
+
+        pool = new_process_pool(self.workers)
+        try:
+            while self._instantiation_queue:
+                wave = list(pop_iter(self._instantiation_queue,
+                                     pop_meth='popleft'))
+                logger.debug("instantiate a wave of %d optuples", len(wave))
+                profiler.counter('instantiation_queue', size=len(wave))
+
+                with profiler.phase('instantiate_wave', 'context',
+                                    size=len(wave)):
+                    results = pool.map(instantiate_remote,
+                            [optuple_descriptor(optuple)
+                             for optuple, _ in wave])
+
+                    for (optuple, origin), result in zip(wave, results):
+                        self.add_remote_result(optuple, origin, result)
+        finally:
+            pool.close()
+            pool.join()
+
+    def init_pgraph(self):
+        """Builds a new pgraph for all modules instantiated so far."""
+        self.pgraph = ContextPgraph(self)
+        self.instance_nodes = list()
 
-            for constraint, condition in instance._constraints:
-                self.post_discover(constraint, instance)
-                if condition:
-                    node.implies(g.node_for(constraint),
-                                 why=why_instance_implies_its_constraints)
+        profiler = self.profiler
+        with profiler.phase('init_pgraph', 'context') as phase:
+            for init_func in (self.init_pgraph_instances,
+                              self.init_pgraph_domains,
+                              self.init_pgraph_providers):
+                with profiler.phase(init_func.__name__, 'context'):
+                    init_func()
+
+            if profiler.enabled:
+                nodes = self.pgraph.nodes
+                phase.update(nr_nodes=len(nodes),
+                             nr_literals=2*len(nodes),
+                             nr_implications=sum(len(literal.implies)
+                                                 for node in nodes
+                                                 for literal in node))
+
+    def init_pgraph_instances(self):
+        g = self.pgraph
 
-            self.init_instance_providers(instance)
+        for optuple, instance in iteritems(self._instances):
+            node = g.node_for(optuple)
 
-        self.instance_nodes.append(node)
+            if isinstance(instance, InstanceError):
+                node.error = instance
+                g.new_const(False, node,
+                            why=why_inviable_instance_is_disabled)
 
-        return node
+            else:
+                node.instance = instance
 
-    def discover_all(self, initial_optuple):
-        self.post_discover(initial_optuple)
+                for constraint, condition in instance._constraints:
+                    if condition:
+                        node.implies(g.node_for(constraint),
+                                     why=why_instance_implies_its_constraints)
 
-        for optuple, origin in pop_iter(self._instantiation_queue,
-                                        pop_meth='popleft'):
-            self.instantiate(optuple, origin)
+            self.instance_nodes.append(node)
 
     def init_pgraph_domains(self):
         g = self.pgraph
@@ -168,18 +370,254 @@ class Context(object):
     def resolve(self, initial_module):
         optuple = initial_module()
 
-        self.discover_all(optuple)
-        self.init_pgraph_domains()
-        self.init_pgraph_providers()
+        with self.profiler.phase('resolve', 'context',
+                                 conf=initial_module._fullname):
+            solution = self.resolve_optuple(optuple)
 
-        solution = solve(self.pgraph, {self.pgraph.node_for(optuple): True})
+        return self.instance_map_for(solution)
 
-        instances = [node.instance
+    def instance_map_for(self, solution):
+        instances = [materialize(node.instance)
                      for node in self.instance_nodes if solution[node]]
         instance_map = dict((type(instance), instance)
                             for instance in instances)
         return instance_map
 
+    def resolve_all(self, initial_modules):
+        """
+        Resolves a number of conf modules at once and returns a dict mapping
+        each of them to its instance map (see resolve).
+
+        Modules reachable from all confs are discovered together, and a
+        single pgraph is built for their union. Each conf is then solved on
+        that pgraph with its own initial value, reusing a trunk expanded
+        once for all of them (see IncrementalSolver). If workers are given,
+        confs are solved in worker processes as well.
+        """
+        initial_modules = list(initial_modules)
+        instance_maps = {}
+
+        with self.profiler.phase('resolve_all', 'context',
+                                 nr_confs=len(initial_modules)):
+            for initial_module in initial_modules:
+                self.post_discover(initial_module())
+            self.discover_all()
+
+            while True:
+                self.init_pgraph()
+
+                try:
+                    with self.profiler.phase('solve_all', 'context'):
+                        self.solve_all([initial_module
+                                        for initial_module in initial_modules
+                                        if initial_module not in instance_maps],
+                                       instance_maps)
+                    break
+                except SolveError:
+                    if not self.expand_lazy_domains():
+                        raise
+                    logger.debug("no solution among instantiated optuples, "
+                                 "expanding lazy domains")
+                    self.discover_all()
+
+        return instance_maps
+
+    def solve_all(self, initial_modules, instance_maps):
+        """Solves each of initial_modules on the current pgraph and stores
+        their instance maps into the given dict. Raises SolveError for the
+        first module having no solution."""
+        g = self.pgraph
+        roots = [(initial_module, g.node_for(initial_module()))
+                 for initial_module in initial_modules]
+
+        solver = IncrementalSolver(g)
+        solver.prepare_base()  # shared with workers, if any
+
+        remote_results = {}
+        if self.workers and len(roots) > 1:
+            remote_results = self.solve_in_pool(solver, roots)
+
+        for initial_module, root in roots:
+            result = remote_results.get(initial_module)
+
+            if result is not None and result[0] == 'ok':
+                node_ids = set(result[1])
+                solution = dict((node, node.id in node_ids)
+                                for node in self.instance_nodes)
+            else:
+                with self.profiler.phase('solve', 'context',
+                                         conf=initial_module._fullname):
+                    solution = solver.solve({root: True},
+                                            removed=solver.initial_literals)
+
+            instance_maps[initial_module] = self.instance_map_for(solution)
+
+    def solve_in_pool(self, solver, roots):
+        """Solves pgraph for roots in worker processes inheriting the solver.
+        Returns a dict of results of solve_remote for each initial module."""
+        global _remote_solver
+        _remote_solver = (solver, set(node.id
+                                      for node in self.instance_nodes))
+
+        pool = new_process_pool(self.workers)
+        try:
+            with self.profiler.phase('solve_in_pool', 'context',
+                                     size=len(roots)):
+                results = pool.map(solve_remote,
+                                   [root.id for _, root in roots])
+        finally:
+            pool.close()
+            pool.join()
+            _remote_solver = None
+
+        return dict((initial_module, result)
+                    for (initial_module, _), result in zip(roots, results))
+
+    def resolve_optuple(self, optuple):
+        self.discover_all(optuple)
+
+        while True:
+            self.init_pgraph()
+
+            try:
+                with self.profiler.phase('solve', 'context'):
+                    return solve(self.pgraph,
+                                 {self.pgraph.node_for(optuple): True},
+                                 profiler=self.profiler)
+            except SolveError:
+                if not self.expand_lazy_domains():
+                    raise
+                logger.debug("no solution among instantiated optuples, "
+                             "expanding lazy domains")
+                self.discover_all()
+
+
+class PostedIndex(object):
+    """
+    Optuples of a module posted for instantiation. Each optuple is encoded
+    as a tuple of small ids of its option values, which is cheaper to hash
+    and keep than an optuple itself.
+    """
+    __slots__ = 'value_ids', 'posted'
+
+    def __init__(self, module):
+        super(PostedIndex, self).__init__()
+        self.value_ids = [dict() for _ in module._optypes]  # per option
+        self.posted = set()
+
+    def __len__(self):
+        return len(self.posted)
+
+    def add(self, optuple):
+        """Returns whether the optuple has not been posted before."""
+        key = tuple(value_ids.setdefault(value, len(value_ids))
+                    for value_ids, value in zip(self.value_ids, optuple))
+        if key in self.posted:
+            return False
+        self.posted.add(key)
+        return True
+
+
+class RemoteInstance(object):
+    """
+    Stands for an instance created in a worker process. It only carries what
+    is needed to build a pgraph, a real instance is created in this process
+    once the optuple gets into a solution (see materialize).
+    """
+
+    def __init__(self, optuple, constraints, provides):
+        super(RemoteInstance, self).__init__()
+        self._optuple = optuple
+        self._constraints = constraints  # [(optuple, condition)]
+        self.provides = provides
+
+    @classmethod
+    def from_result(cls, optuple, result):
+        """Makes an instance (or an error) out of a result returned by
+        instantiate_remote. Raises ImportError if some of modules mentioned
+        in the result can't be found in this process."""
+        kind, payload = result
+        if kind == 'error':
+            return InstanceError(payload)
+
+        constraints, provides = payload
+        return cls(optuple,
+                   [(optuple_for(descriptor), condition)
+                    for descriptor, condition in constraints],
+                   list(map(module_for, provides)))
+
+    def __repr__(self):
+        return repr(self._optuple)
+
+
+def materialize(instance):
+    """Returns a real instance for a possibly remote one."""
+    if not isinstance(instance, RemoteInstance):
+        return instance
+
+    instance = instance._optuple._instantiate_module()
+    instance._post_init()
+    return instance
+
+
+def instantiate_remote(descriptor):
+    """Runs in a worker process. Instantiates an optuple given its descriptor
+    and returns a picklable result: ('ok', (constraints, provides)), where
+    constraints are (optuple descriptor, condition) pairs and provides are
+    module fullnames, or ('error', message) if the instance is inviable.
+    None means that the optuple must be instantiated by the caller."""
+    try:
+        optuple = optuple_for(descriptor)
+    except ImportError:
+        return None
+
+    try:
+        instance = optuple._instantiate_module()
+    except InstanceError as error:
+        return 'error', str(error)
+
+    instance._post_init()
+
+    constraints = [(optuple_descriptor(constraint), bool(condition))
+                   for constraint, condition in instance._constraints]
+    provides = [module._fullname for module in instance.provides]
+
+    return 'ok', (constraints, provides)
+
+
+# An IncrementalSolver with a base trunk prepared for all confs, along with ids
+# of instance nodes, inherited by forked workers (see Context.solve_in_pool).
+_remote_solver = None
+
+def solve_remote(node_id):
+    """Runs in a worker process. Solves the inherited pgraph with a node of
+    the given id set to True, and returns a picklable result: ('ok', ids of
+    instance nodes set to True), or ('error', None) if there is no solution.
+    None means that the node must be solved by the caller."""
+    if _remote_solver is None:
+        return None
+    solver, instance_node_ids = _remote_solver
+
+    root = solver.pgraph.node_at(node_id)
+    try:
+        solution = solver.solve({root: True},
+                                removed=solver.initial_literals)
+    except SolveError:
+        return 'error', None
+
+    return 'ok', [node.id for node, value in iteritems(solution)
+                  if value and node.id in instance_node_ids]
+
+
+def new_process_pool(processes):
+    """Creates a pool of forked processes, so that workers inherit modules
+    loaded so far along with importers of Mybuild files."""
+    try:
+        mp_context = multiprocessing.get_context('fork')
+    except (AttributeError, ValueError):
+        mp_context = multiprocessing  # old Python or no fork() on a platform
+    return mp_context.Pool(processes)
+
 
 class ContextPgraph(Pgraph):
 
@@ -187,16 +625,40 @@ class ContextPgraph(Pgraph):
         super(ContextPgraph, self).__init__()
         self.context = context
 
+        # Shortcuts to nodes looked up most often, bypassing new_node.
+        self._atoms = {}          # (module, option, value) to atoms
+        self._optuple_nodes = {}  # optuples to nodes
+
     def atom_for(self, module, option=None, value=Ellipsis):
+        key = module, option, value
+        try:
+            return self._atoms[key]
+        except KeyError:
+            pass
+
         if option is not None:
-            return self.new_node(OptionValueAtom, module, option, value)
+            atom = self.new_node(OptionValueAtom, module, option, value)
         else:
-            return self.new_node(ModuleAtom, module)
+            atom = self.new_node(ModuleAtom, module)
+
+        self._atoms[key] = atom
+        return atom
 
     def node_for(self, mslice):
         # TODO should accept arbitrary expr as well.
         return self.new_node(OptupleNode, mslice())
 
+    def node_descriptor(self, node):
+        """Nodes for optuples are described by optuple descriptors (see
+        mybuild.cache.optuple_descriptor), that is, a node returned by
+        node_for(optuple) is described by optuple_descriptor(optuple)."""
+        if isinstance(node, OptupleNode):
+            return optuple_descriptor(node.optuple)
+        if isinstance(node, ModuleAtom):
+            return node.module._fullname, ()
+        if isinstance(node, OptionValueAtom):
+            return node.module._fullname, ((node.option, node.value),)
+
 
 @ContextPgraph.node_type
 class ModuleAtom(Atom):
@@ -244,13 +706,22 @@ class OptupleNode(And):
 
     @classmethod
     def _new(cls, optuple):
+        nodes = cls.pgraph._optuple_nodes
+        try:
+            return nodes[optuple]
+        except KeyError:
+            pass
+
         new_atom = partial(cls.pgraph.atom_for, optuple._module)
         option_atoms = tuple(starmap(new_atom, optuple._iterpairs()))
 
         if not option_atoms:
-            return cls.pgraph.atom_for(optuple._module)
+            node = cls.pgraph.atom_for(optuple._module)
         else:
-            return super(OptupleNode, cls)._new(option_atoms, optuple)
+            node = super(OptupleNode, cls)._new(option_atoms, optuple)
+
+        nodes[optuple] = node
+        return node
 
     def __init__(self, option_atoms, optuple):
         super(OptupleNode, self).__init__(option_atoms,
@@ -304,8 +775,13 @@ def why_inviable_instance_is_disabled(outcome, *_):
     return fmt.format(**locals())
 
 
-def resolve(initial_module):
-    return Context().resolve(initial_module)
+def resolve(initial_module, lazy=False, workers=None, profiler=None):
+    return Context(lazy=lazy, workers=workers,
+                   profiler=profiler).resolve(initial_module)
+
+def resolve_all(initial_modules, lazy=False, workers=None, profiler=None):
+    return Context(lazy=lazy, workers=workers,
+                   profiler=profiler).resolve_all(initial_modules)
 
 
 if __name__ == '__main__':
@@ -11,6 +11,12 @@ __all__ = [
     "Literal",
     "Neglast",
     "Reason",
+    "NeglastReason",
+
+    "NodeList",
+    "NodeSet",
+    "LiteralSet",
+    "ImplicationTable",
 
     "to_lset",
 
@@ -34,9 +40,11 @@ __all__ = [
 
 from _compat import *
 
+from array import array
 from collections import namedtuple
 from operator import attrgetter
 
+from util.bitset import ChunkedBitSet
 from util.misc import bools
 from util.misc import Pair
 from util.operator import instanceof
@@ -79,8 +87,6 @@ class PgraphMeta(type):
 class Pgraph(extend(metaclass=PgraphMeta)):
     """docstring for Pgraph"""
 
-    nodes = property(lambda self: set(itervalues(self._node_map)))
-
     @property
     def atoms(self):
         return [node for node in self.nodes if isinstance(node, Atom)]
@@ -88,13 +94,20 @@ class Pgraph(extend(metaclass=PgraphMeta)):
     def __init__(self):
         super(Pgraph, self).__init__()
 
+        # Each node type is bound to the pgraph along with its own index of
+        # nodes by constructor arguments, see NodeBase._new.
         node_types = self._node_types = {}
         for node_type in type(self)._iter_all_node_types():
             bases = self._node_type_bases(node_type)
             node_types[node_type] = type(node_type.__name__, bases,
-                                         dict(pgraph=self))
+                                         dict(pgraph=self, _node_index={}))
+
+        self._nodes = []  # indexed by node ids
+        self.nodes = NodeList(self._nodes)
+        self._implication_table = None
+        self._reasons = {}  # interned reasons, see Reason
 
-        self._node_map = {}
+        self.nr_changes = 0  # of nodes and constraints, see _changed
 
         self.const_literals = Pair._make(
                 self.new_node(ConstNode.types[const_value])[const_value]
@@ -103,6 +116,47 @@ class Pgraph(extend(metaclass=PgraphMeta)):
     def _node_type_bases(self, node_type):
         return (node_type,)
 
+    def _changed(self):
+        """Must be called upon any change of nodes or constraints between
+        them. Drops the implication table and bumps nr_changes, which lets
+        users keeping state derived from the pgraph (like IncrementalSolver)
+        detect that it is stale."""
+        self._implication_table = None
+        self.nr_changes += 1
+
+    def _add_node(self, node):
+        """Assigns dense ids to a newly created node and its literals."""
+        node_id = len(self._nodes)
+        self._nodes.append(node)
+        self._changed()
+
+        for literal in node:
+            literal.id = node_id << 1 | literal.value
+
+    def node_descriptor(self, node):
+        """
+        Returns a picklable descriptor identifying the node among nodes of
+        other pgraphs built in the same way, or None. Used by snapshots, see
+        mybuild.snapshot.
+        """
+        return None
+
+    def node_at(self, node_id):
+        return self._nodes[node_id]
+
+    def literal_at(self, literal_id):
+        return self._nodes[literal_id >> 1][literal_id & 1]
+
+    @property
+    def implication_table(self):
+        """Literal implications compiled into a flat ImplicationTable.
+
+        The table is rebuilt lazily after adding new nodes or implications."""
+        table = self._implication_table
+        if table is None:
+            table = self._implication_table = ImplicationTable(self._nodes)
+        return table
+
     def new_node(self, node_type, *args, **kwargs):
         """
         Returns a node of the given type.
@@ -158,20 +212,17 @@ class NodeBase(extend(metaclass=NodeMeta)):
     @classmethod
     def _new(cls, *args, **kwargs):
         try:
-            pgraph = cls.pgraph
+            cache = cls._node_index
         except AttributeError:
             raise TypeError("Don't instantiate this class directly, "
                             "use pgraph.new_node(%s, ...) instead" %
                             cls.__name__)
-        else:
-            cache = pgraph._node_map
 
         if kwargs.pop('cache_kwargs', False):
-            cache_kwargs = frozenset(iteritems(kwargs))
+            cache_key = args, frozenset(iteritems(kwargs))
         else:
-            cache_kwargs = None
+            cache_key = args, None
 
-        cache_key = cls, args, cache_kwargs
         try:
             ret = cache[cache_key]
         except KeyError:
@@ -187,6 +238,8 @@ class Node(NodeBase, Pair):
     """
     __slots__ = ()
 
+    id = property(lambda self: self[False].id >> 1)
+
     def __new__(cls, *args, **kwargs):
         new_node = super(Node, cls).__new__(cls,
                                             false=Literal(), true=Literal())
@@ -194,6 +247,8 @@ class Node(NodeBase, Pair):
         for literal in new_node:
             literal.node = new_node
 
+        cls.pgraph._add_node(new_node)
+
         assert all(new_node[bool_value].value == bool_value
                    for bool_value in bools)
 
@@ -213,6 +268,10 @@ class Node(NodeBase, Pair):
                                   why_therefore, why_becauseof)
 
 
+_no_items = frozenset()
+_no_whys  = {}
+
+
 class Literal(object):
     """
     Depending on a node value the node may behave differently.
@@ -221,20 +280,30 @@ class Literal(object):
     Literal object is tightly related to its node. Do not construct it
     manually.
     """
-    __slots__ = 'node', 'level', 'implies', 'imply_reasons', 'neglasts'
+    __slots__ = 'node', 'id', 'level', 'implies', 'imply_whys', 'neglasts'
 
     pgraph = property(attrgetter('node.pgraph'))
     value  = property(lambda self: self is self.node[True])
 
     def __init__(self):
         super(Literal, self).__init__()
-        # node property is initialized by the Node itself
+        # node and id properties are initialized by the Node itself
 
         self.level = None
 
-        self.implies       = set()  # what to include among with this one
-        self.imply_reasons = set()  # precreated reason objects
-        self.neglasts      = set()  # from where to exclude
+        # Most literals have neither non-default whys nor neglasts, and some
+        # have no implications at all, so empty containers are shared until
+        # the first item is added.
+        self.implies    = _no_items  # what to include among with this one
+        self.imply_whys = None       # implied literals to non-default whys
+        self.neglasts   = _no_items  # from where to exclude
+
+    @property
+    def imply_reasons(self):
+        """Reasons of implications, created upon each access."""
+        imply_whys = self.imply_whys or _no_whys
+        return set(Reason(then, [self], imply_whys.get(then))
+                   for then in self.implies)
 
     def __invert__(self):
         """Returns the opposite literal."""
@@ -250,8 +319,14 @@ class Literal(object):
 
     @staticmethod
     def __imply(if_, then, why=None):
+        if not if_.implies:
+            if_.implies = set()
         if_.implies.add(then)
-        if_.imply_reasons.add(Reason(then, [if_], why))
+
+        if why is not None:
+            if if_.imply_whys is None:
+                if_.imply_whys = dict()
+            if_.imply_whys[then] = why
 
     def therefore(self, other, why=None):
         """Implication: self => other"""
@@ -262,12 +337,15 @@ class Literal(object):
         if self is ~other:
             raise ValueError('Implication of self negation')
 
-        if self.node.pgraph is not other.node.pgraph:
+        pgraph = self.node.pgraph
+        if pgraph is not other.node.pgraph:
             raise ValueError('Must belong to the same Pgraph')
 
         self.__imply(self,   other,  why)
         self.__imply(~other, ~self,  why)
 
+        pgraph._changed()
+
     def becauseof(self, other, why=None):
         """Implication: other => self"""
         other.therefore(self, why)
@@ -304,8 +382,12 @@ class Literal(object):
             for literal in neglast.literals:
                 if self.node.pgraph is not literal.node.pgraph:
                     raise ValueError('Must belong to the same Pgraph')
+                if not literal.neglasts:
+                    literal.neglasts = set()
                 literal.neglasts.add(neglast)
 
+            self.node.pgraph._changed()
+
     def equivalent_all(self, others, why_therefore=None, why_becauseof=None):
         """Group equivalence: self <=> all(others)"""
 
@@ -347,6 +429,16 @@ class Neglast(object):
         self.literals = literals
         self.why = why
 
+    def neg_for(self, last_literal=None):
+        """
+        Returns a literal to negate the last left literal with, and a reason
+        for that, which is not materialized until needed (see NeglastReason).
+        """
+        if last_literal is None:
+            last_literal = self.default
+
+        return ~last_literal, NeglastReason(self, last_literal)
+
     def neg_reason_for(self, last_literal=None):
         if last_literal is None:
             last_literal = self.default
@@ -368,24 +460,272 @@ class Neglast(object):
                         nr_literals=len(self.literals), default=self.default))
 
 class Reason(namedtuple('_Reason', 'literal, cause_literals, why, follow')):
-    """docstring for Reason"""
+    """
+    Reason of a literal being implied by its cause literals. Reasons are
+    interned by a pgraph of their literals, so that equal ones share a single
+    instance.
+    """
+    __slots__ = ()
 
     def __new__(cls, literal, cause_literals=[], why=None, follow=False):
         if why is None:
             why = cls.default_why_func
 
-        return super(Reason, cls).__new__(cls, literal, tuple(cause_literals),
-                                          why, follow)
+        cause_literals = tuple(cause_literals)
+        fields = (literal, cause_literals, why, follow)
+
+        any_literal = literal if literal is not None else (
+                cause_literals[0] if cause_literals else None)
+        if any_literal is None:
+            return super(Reason, cls).__new__(cls, *fields)
+
+        interned = any_literal.pgraph._reasons
+        try:
+            return interned[fields]
+        except KeyError:
+            ret = super(Reason, cls).__new__(cls, *fields)
+            interned[ret] = ret
+            return ret
 
     @classmethod
     def default_why_func(cls, outcome, *causes):
         cause_str = ' + '.join(map(str, causes)) or 'no cause'
         return '%s <= (%s)' % (outcome, cause_str)
 
+    def materialize(self):
+        return self
+
     def __repr__(self):
         return self.why(self.literal, *self.cause_literals)
 
 
+class NeglastReason(namedtuple('_NeglastReason', 'neglast, last_literal')):
+    """
+    Reason of negating the last literal left in a neglast. Being cheap to
+    create, it is stored in solutions instead of the corresponding Reason,
+    which is only materialized when explaining a solution.
+    """
+    __slots__ = ()
+
+    def materialize(self):
+        neg_literal, reason = self.neglast.neg_reason_for(self.last_literal)
+        return reason
+
+    def __repr__(self):
+        return repr(self.materialize())
+
+
+#
+# Compact integer-indexed representation.
+#
+# Each node gets a dense id upon creation, and each literal has an id of
+# node.id * 2 + value. This allows storing sets of nodes and literals as
+# bitsets, and implications as flat arrays of literal ids. Bitsets are chunked
+# (see util.bitset.ChunkedBitSet) for sets derived from one another, like
+# implication closures of branches, to share unchanged chunks.
+#
+
+class PgraphBitSet(ChunkedBitSet):
+    """
+    Set of pgraph elements backed by a bitset of their ids. A pgraph to map
+    ids back to elements is bound upon adding the first element (if not
+    passed explicitly).
+    """
+    __slots__ = 'pgraph',
+
+    def __init__(self, iterable=(), pgraph=None):
+        self.pgraph = pgraph
+        super(PgraphBitSet, self).__init__(iterable)
+
+    def _from_bits(self, bits):
+        ret = type(self)(pgraph=self.pgraph)
+        ret._bits = bits
+        return ret
+
+    def _bits_of(self, other):
+        if self._is_compatible(other):
+            if self.pgraph is None:
+                self.pgraph = other.pgraph
+            elif other.pgraph is not self.pgraph and other._bits:
+                raise ValueError('Must belong to the same Pgraph')
+            return other._bits
+
+        if self.pgraph is None:
+            other = list(other)
+            if other:
+                self.pgraph = other[0].pgraph
+
+        return super(PgraphBitSet, self)._bits_of(other)
+
+    def add(self, item):
+        if self.pgraph is None:
+            self.pgraph = item.pgraph
+        super(PgraphBitSet, self).add(item)
+
+
+class NodeList(object):
+    """
+    Read-only view of all nodes of a pgraph ordered by their ids. Nodes are
+    only appended to a pgraph, so the view is always up to date.
+    """
+    __slots__ = '_nodes',
+
+    def __init__(self, nodes):
+        super(NodeList, self).__init__()
+        self._nodes = nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __getitem__(self, node_id):
+        return self._nodes[node_id]
+
+    def __contains__(self, node):
+        try:
+            return self._nodes[node.id] is node
+        except (AttributeError, IndexError):
+            return False
+
+    def __repr__(self):
+        return '<{cls.__name__}: {nr_nodes} nodes>'.format(
+                cls=type(self), nr_nodes=len(self._nodes))
+
+
+class NodeSet(PgraphBitSet):
+    """Set of nodes indexed by node ids."""
+    __slots__ = ()
+
+    def _index_of(self, node):
+        return node.id
+
+    def _item_at(self, node_id):
+        return self.pgraph._nodes[node_id]
+
+
+class LiteralSet(PgraphBitSet):
+    """Set of literals indexed by literal ids."""
+    __slots__ = ()
+
+    def _index_of(self, literal):
+        return literal.id
+
+    def _item_at(self, literal_id):
+        return self.pgraph._nodes[literal_id >> 1][literal_id & 1]
+
+
+class ImplicationTable(object):
+    """
+    Literal implications in CSR (compressed sparse row) form: ids of literals
+    implied by a literal with the given id are stored in
+    targets[offsets[id]:offsets[id+1]].
+    """
+    __slots__ = 'offsets', 'targets'
+
+    def __init__(self, nodes):
+        super(ImplicationTable, self).__init__()
+
+        offsets = self.offsets = array('l', [0])
+        targets = self.targets = array('l')
+
+        for node in nodes:
+            for literal in node:
+                targets.extend(implied.id for implied in literal.implies)
+                offsets.append(len(targets))
+
+    @classmethod
+    def from_arrays(cls, offsets, targets):
+        """Creates a table out of arrays of another one, e.g. loaded from
+        a snapshot."""
+        ret = cls(())
+        ret.offsets = array('l', offsets)
+        ret.targets = array('l', targets)
+        return ret
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def implied_ids(self, literal_id):
+        offsets = self.offsets
+        return self.targets[offsets[literal_id]:offsets[literal_id+1]]
+
+    def strong_components(self, mask):
+        """
+        Yields strongly connected components of the implication graph
+        restricted to literals with nonzero mask[id], each component is a list
+        of literal ids. Components consisting of a single literal are omitted.
+
+        Iterative version of Tarjan's algorithm.
+        """
+        offsets = self.offsets
+        targets = self.targets
+
+        nr_literals = len(self)
+        index   = [0] * nr_literals  # DFS preorder (1-based), 0 if unvisited
+        lowlink = [0] * nr_literals
+        on_stack = bytearray(nr_literals)
+
+        component_stack = []
+        counter = 0
+
+        for root_id in range(nr_literals):
+            if not mask[root_id] or index[root_id]:
+                continue
+
+            counter += 1
+            index[root_id] = lowlink[root_id] = counter
+            component_stack.append(root_id)
+            on_stack[root_id] = 1
+
+            call_stack = [(root_id, offsets[root_id])]  # (id, next target pos)
+
+            while call_stack:
+                literal_id, pos = call_stack[-1]
+                end = offsets[literal_id+1]
+
+                while pos < end:
+                    implied_id = targets[pos]
+                    pos += 1
+
+                    if not mask[implied_id]:
+                        continue
+
+                    if not index[implied_id]:
+                        call_stack[-1] = (literal_id, pos)
+
+                        counter += 1
+                        index[implied_id] = lowlink[implied_id] = counter
+                        component_stack.append(implied_id)
+                        on_stack[implied_id] = 1
+
+                        call_stack.append((implied_id, offsets[implied_id]))
+                        break
+
+                    if on_stack[implied_id] and index[implied_id] < lowlink[literal_id]:
+                        lowlink[literal_id] = index[implied_id]
+
+                else:  # all targets visited, return from the literal
+                    call_stack.pop()
+                    if call_stack:
+                        parent_id = call_stack[-1][0]
+                        if lowlink[literal_id] < lowlink[parent_id]:
+                            lowlink[parent_id] = lowlink[literal_id]
+
+                    if lowlink[literal_id] == index[literal_id]:
+                        component = []
+                        while True:
+                            member_id = component_stack.pop()
+                            on_stack[member_id] = 0
+                            component.append(member_id)
+                            if member_id == literal_id:
+                                break
+
+                        if len(component) > 1:
+                            yield component
+
+
 #
 # Conversion between node-value mappings/pairs and literals, and vice-versa.
 #
@@ -639,23 +979,76 @@ class Implies(Node):
         return '(%r => %r)' % (self._if, self._then)
 
 
+class PrefixNode(LatticeOpNode):
+    """
+    Auxiliary node of a SingleZeroLatticeOpNode: an op of its operands up to
+    (not including) the given index.
+    """
+
+    def __init__(self, operands, owner, index):
+        super(PrefixNode, self).__init__(operands)
+        self.owner = owner
+        self.index = index
+
+    def __repr__(self):
+        # Owner operands would be repeated by each prefix of a long chain.
+        return '%s#%d[:%d]' % (type(self.owner).__name__,
+                               self.owner.id, self.index)
+
+
+def why_zero_prefix_implies_next_operand_identity(outcome, *causes):
+    # Internal, reports refer to operands of the owner instead, see
+    # mybuild.rgraph.bypass_prefix_literals.
+    return '%s <= (%s) as a prefix' % (outcome, ' + '.join(map(str, causes)))
+
+
+@Pgraph.node_type
+class OrPrefix(PrefixNode, Or):
+    pass
+
+
 class SingleZeroLatticeOpNode(LatticeOpNode):
     """
     Allows at most a single operand to be Zero, the rest must be Identity.
+
+    Instead of pairwise implications between operands a sequential counter is
+    used: operands are chained through prefix nodes, each one being an op of
+    all operands before the next one, and a Zero prefix implies the next
+    operand to be Identity. It takes a linear number of implications, while
+    a Zero operand still implies all the others to be Identity.
     """
 
+    _prefix_type = None  # PrefixNode subclass with the same zero
+
+    # Explains an operand being Identity because of another one being Zero.
+    # Implications through prefix nodes have an internal why, reports use
+    # this one instead to refer to operands, bypassing the prefixes.
+    why_one_operand_zero_implies_others_identity = None
+
     def __init__(self, operands, *args, **why_kwargs):
         why = why_kwargs.pop('why_one_operand_zero_implies_others_identity',
                              None)
         super(SingleZeroLatticeOpNode, self).__init__(operands,
                                                       *args, **why_kwargs)
 
-        # this introduces N^2 imlications between operands, uff...
-        for operand in operands:
-            operand[self.zero].therefore_all(
-                    (another[self.identity]
-                     for another in operands
-                     if another is not operand), why)
+        if why is not None:
+            self.why_one_operand_zero_implies_others_identity = why
+        why_prefix = why_zero_prefix_implies_next_operand_identity
+
+        operands = sorted(operands, key=attrgetter('id'))
+
+        prefix = None
+        for index, operand in enumerate(operands):
+            if prefix is not None:
+                prefix[self.zero].therefore(operand[self.identity],
+                        why_prefix if isinstance(prefix, PrefixNode) else why)
+
+            if prefix is None:
+                prefix = operand
+            elif index < len(operands) - 1:  # the last one is not needed
+                prefix = self.pgraph.new_node(self._prefix_type,
+                                              (prefix, operand),
+                                              self, index + 1)
 
 
 @Pgraph.node_type
@@ -671,6 +1064,8 @@ class AtMostOne(SingleZeroLatticeOpNode, Or):
     When there is no operands, evaluates to False.
     """
 
+    _prefix_type = OrPrefix
+
 
 @Pgraph.node_type
 class AllEqual(OperandSetNode):
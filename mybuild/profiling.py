@@ -0,0 +1,218 @@
+"""
+Profiling of resolution phases.
+"""
+
+__all__ = [
+    "Profiler",
+    "NullProfiler",
+    "null_profiler",
+    "max_rss",
+]
+
+
+from _compat import *
+
+import json
+import os
+import sys
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def max_rss():
+    """Returns the maximum resident set size of the process in bytes."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss  # bytes
+    return maxrss * 1024  # kilobytes elsewhere
+
+
+class Phase(object):
+    """A record of a single phase. Counters may be added while the phase is
+    running by setting items: phase['nr_nodes'] = 42."""
+
+    __slots__ = 'name', 'cat', 'start', 'duration', 'depth', 'args'
+
+    def __init__(self, name, cat, start, depth, args):
+        super(Phase, self).__init__()
+        self.name     = name
+        self.cat      = cat
+        self.start    = start
+        self.duration = None
+        self.depth    = depth
+        self.args     = args
+
+    def __setitem__(self, key, value):
+        self.args[key] = value
+
+    def update(self, *args, **kwargs):
+        self.args.update(*args, **kwargs)
+
+    def to_dict(self):
+        return dict(name=self.name, cat=self.cat, start=self.start,
+                    duration=self.duration, depth=self.depth,
+                    args=self.args)
+
+    def __repr__(self):
+        return '<{cls.__name__} {self.name}: {self.duration}>'.format(
+                cls=type(self), self=self)
+
+
+class NullProfiler(object):
+    """Does nothing, used when profiling is off."""
+
+    enabled = False
+
+    class _NullPhase(object):
+        __slots__ = ()
+        def __setitem__(self, key, value): pass
+        def update(self, *args, **kwargs): pass
+        def __enter__(self): return self
+        def __exit__(self, *exc_info): pass
+
+    _null_phase = _NullPhase()
+
+    def phase(self, name, cat='phase', **args):
+        return self._null_phase
+
+    def counter(self, name, **values):
+        pass
+
+null_profiler = NullProfiler()
+
+
+class Profiler(object):
+    """
+    Records wall time of nested phases along with arbitrary counters.
+
+    Phases are opened using 'with profiler.phase(name, **args) as phase',
+    and counters are sampled with 'profiler.counter(name, **values)'. If
+    trace_memory is set, each phase also records the change of memory
+    allocated by Python (memory_delta) and its peak over the memory
+    allocated at the start of the phase (memory_peak), including peaks of
+    nested phases. Without tracemalloc (before Python 3.4) only a growth of
+    the maximum resident set size of the process is recorded instead
+    (max_rss_delta), which is zero unless the phase has reached a new peak,
+    and trace_rss is set. Neither is set if memory can't be measured at all.
+
+    Records can be exported either as a JSON report (see to_json) or in the
+    Chrome trace-event format (see to_chrome_trace), the latter is viewable
+    in chrome://tracing or Perfetto UI.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False, clock=time.time):
+        super(Profiler, self).__init__()
+
+        self.clock = clock
+        self.epoch = clock()
+
+        self.phases   = []  # completed phases, in order of completion
+        self.counters = []  # (time, name, values) tuples
+
+        self._depth = 0
+        self._peaks = []  # of open phases, up to the start of the innermost
+
+        self.trace_memory = trace_memory and tracemalloc is not None
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.trace_rss = (trace_memory and not self.trace_memory and
+                          resource is not None)
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = self.trace_rss = False
+
+    @contextmanager
+    def phase(self, name, cat='phase', **args):
+        if self.trace_memory:
+            memory_before, peak = tracemalloc.get_traced_memory()
+            # Resetting the peak below loses it for the outer phase, save it.
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self._peaks.append(memory_before)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        elif self.trace_rss:
+            rss_before = max_rss()
+
+        phase = Phase(name, cat, self.clock() - self.epoch, self._depth, args)
+        self._depth += 1
+        try:
+            yield phase
+        finally:
+            self._depth -= 1
+            phase.duration = self.clock() - self.epoch - phase.start
+
+            if self.trace_memory:
+                memory, peak = tracemalloc.get_traced_memory()
+                peak = max(self._peaks.pop(), peak)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                phase.update(memory_delta=memory - memory_before,
+                             memory_peak=peak - memory_before)
+            elif self.trace_rss:
+                phase['max_rss_delta'] = max_rss() - rss_before
+
+            self.phases.append(phase)
+
+    def counter(self, name, **values):
+        self.counters.append((self.clock() - self.epoch, name, values))
+
+    def summary(self):
+        """Returns {(cat, name): (count, total time)} for all phases."""
+        ret = defaultdict(lambda: [0, 0.0])
+        for phase in self.phases:
+            entry = ret[phase.cat, phase.name]
+            entry[0] += 1
+            entry[1] += phase.duration
+        return dict((key, tuple(value)) for key, value in iteritems(ret))
+
+    def to_json(self):
+        """Returns a JSON-ready report: all phases ordered by start time,
+        counter samples and a per-name summary."""
+        return dict(
+            phases=[phase.to_dict() for phase in
+                    sorted(self.phases, key=lambda phase: phase.start)],
+            counters=[dict(time=time_, name=name, values=values)
+                      for time_, name, values in self.counters],
+            summary=[dict(cat=cat, name=name, count=count, total=total)
+                     for (cat, name), (count, total)
+                     in sorted(iteritems(self.summary()))])
+
+    def to_chrome_trace(self):
+        """Returns a dict in the Chrome trace-event format."""
+        pid = os.getpid()
+        us = 1e6
+
+        events = [dict(name=phase.name, cat=phase.cat, ph='X',
+                       ts=phase.start * us, dur=phase.duration * us,
+                       pid=pid, tid=0, args=phase.args)
+                  for phase in self.phases]
+        events.extend(dict(name=name, ph='C', ts=time_ * us,
+                           pid=pid, tid=0, args=values)
+                      for time_, name, values in self.counters)
+
+        events.sort(key=lambda event: event['ts'])
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def dump_json(self, f, **kwargs):
+        json.dump(self.to_json(), f, default=repr, **kwargs)
+
+    def dump_chrome_trace(self, f, **kwargs):
+        json.dump(self.to_chrome_trace(), f, default=repr, **kwargs)
@@ -0,0 +1,165 @@
+"""
+Reports of solver errors.
+
+A report walks error rgraphs (see mybuild.rgraph) and yields records
+explaining a SolveError one by one, following into dead branches on demand.
+Records can be written as text or as JSON lines, or sent to a logger.
+"""
+
+__all__ = [
+    "ErrorReport",
+    "ReportRecord",
+]
+
+
+from _compat import *
+
+import json
+from collections import namedtuple
+
+from mybuild.rgraph import bypass_prefix_literals
+from mybuild.rgraph import get_error_rgraph
+from mybuild.rgraph import is_prefix_literal
+from mybuild.rgraph import traverse_error_rgraph
+
+import util, logging
+logger = util.get_extended_logger(__name__)
+
+
+class ReportRecord(namedtuple('_ReportRecord',
+                              'kind, depth, shift, literal, text')):
+    """
+    A single record of an error report.
+
+    Kinds of records are:
+        'reason'    - text is a reason of the literal, shift is its position
+                      in a chain of reasons as yielded by traverse_error_rgraph
+        'branch'    - starts explanation of a dead branch of the literal,
+                      which is followed by records having depth one greater
+        'end'       - ends explanation of a dead branch
+        'seen'      - the dead branch has already been explained above
+        'truncated' - the rest is omitted due to a limit of the report
+
+    Depth is a number of dead branches followed to get to the record.
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        return dict(kind=self.kind, depth=self.depth, shift=self.shift,
+                    literal=(repr(self.literal)
+                             if self.literal is not None else None),
+                    text=self.text)
+
+    def __str__(self):
+        return '  ' * (self.depth + self.shift) + self.text
+
+
+class ErrorReport(object):
+    """
+    Explanation of a SolveError. Iterating over a report yields ReportRecords
+    lazily: an error rgraph is only built for the trunk upon the first
+    iteration, and rgraphs of dead branches are built once followed into.
+
+    Args:
+        error: the SolveError to explain.
+        max_depth: how many dead branches to follow into one another.
+        max_reasons: how many reasons to report per an rgraph of the trunk
+            or of a dead branch.
+
+    Each dead branch is explained at most once, as well as each literal:
+    reasons of literals that have been already explained are skipped.
+    Auxiliary prefix nodes (see pgraph.SingleZeroLatticeOpNode) are not
+    reported, reasons refer to the operands they are caused by instead.
+    """
+
+    def __init__(self, error, max_depth=3, max_reasons=50):
+        super(ErrorReport, self).__init__()
+
+        self.error = error
+        self.max_depth = max_depth
+        self.max_reasons = max_reasons
+
+        self._rgraph = None
+
+    @property
+    def rgraph(self):
+        if self._rgraph is None:
+            self._rgraph = get_error_rgraph(self.error)
+        return self._rgraph
+
+    def __iter__(self):
+        rgraph = self.rgraph
+        return self._iter_records(rgraph, rgraph.violation_graphs, 0,
+                                  explained=set(), followed=set())
+
+    def _iter_records(self, rgraph, violation_graphs, depth,
+                      explained, followed):
+        nr_reasons = 0
+
+        for reason, shift in traverse_error_rgraph(rgraph):
+            literal = reason.literal
+            if is_prefix_literal(literal):
+                continue  # operands are reported instead, see below
+            reason = bypass_prefix_literals(rgraph, reason)
+
+            if literal is not None:
+                if literal in explained:
+                    continue
+                explained.add(literal)
+
+            if nr_reasons == self.max_reasons:
+                yield ReportRecord('truncated', depth, 0, None,
+                                   '(more reasons omitted)')
+                return
+            nr_reasons += 1
+
+            yield ReportRecord('reason', depth, shift, literal, repr(reason))
+
+            if not reason.follow:
+                continue
+
+            if literal is not None:
+                branch_literal = ~literal
+            else:
+                branch_literal = reason.cause_literals[0]
+            if branch_literal not in violation_graphs:
+                continue
+
+            shift += 1
+            if depth == self.max_depth:
+                yield ReportRecord('truncated', depth, shift, branch_literal,
+                                   '(dead branch {0} omitted)'
+                                   .format(branch_literal))
+                continue
+
+            branch_rgraph = violation_graphs[branch_literal]
+            if branch_rgraph in followed:
+                yield ReportRecord('seen', depth, shift, branch_literal,
+                                   '(dead branch {0} is explained above)'
+                                   .format(branch_literal))
+                continue
+            followed.add(branch_rgraph)
+
+            yield ReportRecord('branch', depth, shift, branch_literal,
+                               '---dead branch {0}---'.format(branch_literal))
+            for record in self._iter_records(branch_rgraph, violation_graphs,
+                                             depth + 1, explained, followed):
+                yield record
+            yield ReportRecord('end', depth, shift, branch_literal,
+                               '---end of dead branch {0}---'
+                               .format(branch_literal))
+
+    def dump_text(self, f):
+        """Writes records to a text file object, one per line."""
+        for record in self:
+            f.write(str(record) + '\n')
+
+    def dump_json(self, f, **kwargs):
+        """Writes records to a text file object as JSON lines."""
+        for record in self:
+            f.write(json.dumps(record.to_dict(), **kwargs) + '\n')
+
+    def log(self, logger=logger, level=logging.ERROR):
+        """Sends records to a logger, one message per record."""
+        for record in self:
+            logger.log(level, '%s', record)
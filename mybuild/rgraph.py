@@ -9,8 +9,11 @@ __date__ = "2013-06-28"
 from  _compat import *
 
 import heapq
+import itertools
 from collections import deque
 
+from mybuild.pgraph import NeglastReason
+from mybuild.pgraph import PrefixNode
 from mybuild.pgraph import Reason
 
 import util, logging
@@ -38,10 +41,6 @@ class Rnode(object):
         return self.rgraph.containers[frozenset([self.literal])]
 
 class Container(object):
-    @property
-    def length(self):
-        return sum(member.length for member in self.members)
-
     def __init__(self, literals, rgraph):
         super(Container, self).__init__()
 
@@ -51,6 +50,8 @@ class Container(object):
         self.members = set()
         self.therefore = {} # key = Rnode, value = Reason
 
+        self.length = float("+inf") # sum of lengths of members
+
     def __repr__(self):
         return ("<{cls.__name__}: {literals}>"
                 .format(cls=type(self), literals=list(self.literals)))
@@ -66,7 +67,12 @@ class Rgraph(object):
     """
     Rgraph or Reason graph
     """
-    def __init__(self, solution):
+    def __init__(self, solution, excluded=()):
+        """
+        Args:
+            solution: the solution to build the rgraph for.
+            excluded: literals which are not used as causes of implications.
+        """
         self.initial = Container(set(), self)
 
         self.containers = {}
@@ -85,10 +91,12 @@ class Rgraph(object):
                 literal_set = frozenset([literal])
                 self.containers[literal_set] = Container(literal_set, self)
 
-        for reason in solution.reasons:
+        for reason in solution.iter_reasons():
             self.initialize_nodes(reason)
 
         for literal in solution.literals:
+            if literal in excluded:
+                continue
             for reason in literal.imply_reasons:
                 self.initialize_nodes(reason)
 
@@ -110,43 +118,66 @@ class Rgraph(object):
 
     def find_shortest_paths(self):
         """
-        Finds the shortest paths to each of the self.nodes using modified
-        Dijkstra's algorithm. The length of path to node is computed as
-        a sum of it's becauseof.
+        Finds the shortest paths to each of the self.nodes using
+        find_shortest_hyperpaths with containers as hyperedges. The length of
+        path to node is computed as a sum of it's becauseof.
         Output:
             Rnode.length - length of the shortest path (inf if there is no one)
             Rnode.parent - cause container (self for initials and None for ones
                                             with infinite length)
+            Container.length - sum of lengths of members
         """
-        queue = []
-        used = set()
+        containers = set(itervalues(self.containers))
+        lengths, parents = find_shortest_hyperpaths(
+                (container.members, container.therefore, container)
+                for container in containers)
 
-        def update_and_post(node, parent):
-            length = 0 if node == parent else parent.length + 1
-            node.length = length
-            node.parent = parent
-            for container in node.containers:
-                heapq.heappush(queue, (container.length, container))
+        self.set_paths(lengths, parents)
 
-        heapq.heapify(queue)
+        logger.debug('Lengths for shortest ways to {0}'.format(self))
+        for node in itervalues(self.nodes):
+            logger.debug('{0}: length {1}'.format(node, node.length))
 
-        for container in self.initial.therefore:
-            update_and_post(container, container)
+    def set_paths(self, lengths, parents):
+        """
+        Sets lengths and parents of nodes given by dicts keyed by nodes, and
+        updates lengths of containers accordingly.
+        """
+        for node in itervalues(self.nodes):
+            node.length = lengths.get(node, float("+inf"))
+            node.parent = parents.get(node)
+            if node.parent is self.initial:
+                node.parent = node
 
-        while queue:
-            length, container = heapq.heappop(queue)
+        for container in itervalues(self.containers):
+            container.length = sum(member.length
+                                   for member in container.members)
 
-            if container in used:
-                continue
-            used.add(container)
+    @classmethod
+    def new_bare(cls, literals):
+        """
+        Returns rgraph with nodes for the given literals but without any reason
+        """
+        new = cls.__new__(cls)
+
+        new.nodes = {}
+        new.containers = {}
+        new.violation_graphs = {}
 
-            for cons in container.therefore:
-                if cons.length > length + 1:
-                    update_and_post(cons, container)
+        new.initial = Container(set(), new)
+        new.containers[frozenset()] = new.initial
 
-        logger.debug('Lengths for shortest ways to {0}'.format(self))
-        for node in itervalues(self.nodes):
-            logger.debug('{0}: length {1}'.format(node, node.length))
+        for literal in literals:
+            new.add_node(literal)
+
+        return new
+
+    def add_node(self, literal):
+        if literal not in self.nodes:
+            self.nodes[literal] = Rnode(literal, self)
+
+            literal_set = frozenset([literal])
+            self.containers[literal_set] = Container(literal_set, self)
 
     def make_bare_copy(self):
         """
@@ -171,6 +202,69 @@ class Rgraph(object):
         return new
 
 
+def find_shortest_hyperpaths(hyperedges):
+    """
+    Finds the shortest hyperpaths using Knuth's generalization of Dijkstra's
+    algorithm. A hyperedge leads from a set of its tails to each of its heads,
+    and is only passable once lengths of all of its tails are known. The
+    length of a path through a hyperedge is a sum of lengths of its tails plus
+    one, or 0 for a hyperedge without tails.
+
+    Each hyperedge is given an integer id, and the number of its tails with
+    unknown length is tracked, so that its length is computed just once. Takes
+    O(E log V) time, E being a total size of the hyperedges.
+
+    Args:
+        hyperedges: iterable of (tails, heads, label) triples, where tails is
+            a set of vertices, and heads is an iterable of vertices.
+
+    Returns:
+        (lengths, labels) pair of dicts mapping each reachable vertex to the
+        length of its shortest path and to a label of its last hyperedge.
+    """
+    queue = []
+    counter = itertools.count()  # tie-breaker, vertices are never compared
+
+    edges    = []  # id -> (tails, heads, label)
+    missing  = []  # id -> number of tails with unknown length
+    tail_ids = {}  # vertex -> ids of hyperedges having it as a tail
+
+    lengths = {}
+    labels  = {}
+
+    def post(edge_id, length):
+        tails, heads, label = edges[edge_id]
+        for head in heads:
+            if head not in lengths:
+                heapq.heappush(queue, (length, next(counter), head, edge_id))
+
+    for tails, heads, label in hyperedges:
+        edge_id = len(edges)
+        edges.append((tails, heads, label))
+        missing.append(len(tails))
+
+        if tails:
+            for tail in tails:
+                tail_ids.setdefault(tail, []).append(edge_id)
+        else:
+            post(edge_id, 0)
+
+    while queue:
+        length, _, vertex, edge_id = heapq.heappop(queue)
+        if vertex in lengths:
+            continue  # a stale entry
+        lengths[vertex] = length
+        labels[vertex] = edges[edge_id][2]
+
+        for tail_id in tail_ids.get(vertex, ()):
+            missing[tail_id] -= 1
+            if not missing[tail_id]:
+                tails = edges[tail_id][0]
+                post(tail_id, 1 + sum(lengths[tail] for tail in tails))
+
+    return lengths, labels
+
+
 def shorten_rgraph(rgraph, rnodes):
     """
     Constructs rgraph containing the the most shortest paths to the rnodes
@@ -216,21 +310,6 @@ def shorten_error_rgraph(rgraph, violation_nodes):
     return shorten_rgraph(rgraph, [rgraph.initial])
 
 
-def prepare_rgraph_branch(trunk, branch):
-    solution = branch.flatten()
-    # TODO move to solver
-    for gen_literal in branch.gen_literals:
-        solution.reasons.add(Reason(gen_literal))
-
-    for literal in solution.literals:
-        for reason in literal.imply_reasons[:]:
-            if (literal in trunk.dead_branches and
-                literal not in branch.gen_literals):
-                literal.imply_reasons.remove(reason)
-
-    return solution
-
-
 def get_violation_nodes(solution):
     def is_violation(node):
         literals = solution.literals
@@ -240,15 +319,16 @@ def get_violation_nodes(solution):
 
 
 def get_error_rgraph(solution, is_short=True):
-    def build_rgraph(branch):
-        rgraph = Rgraph(branch)
-        if is_short:
-            violation_nodes = list(get_violation_nodes(branch))
-            rgraph = shorten_error_rgraph(rgraph, violation_nodes)
-        return rgraph
+    """
+    Constructs rgraph explaining an error of the solution (which is usually
+    SolveError) along with rgraphs of invalid dead branches. Shortened rgraphs
+    are constructed lazily, see get_lazy_error_rgraph.
+    """
+    if is_short:
+        return get_lazy_error_rgraph(solution)
 
     trunk = solution.trunk
-    rgraph = build_rgraph(trunk)
+    rgraph = Rgraph(trunk)
 
     branchmap = {}
     for literal, branch in iteritems(trunk.dead_branches):
@@ -260,8 +340,7 @@ def get_error_rgraph(solution, is_short=True):
             rgraph.violation_graphs[literal] = rgraph_branch
             continue
 
-        branch_solution = prepare_rgraph_branch(trunk, branch)
-        rgraph_branch = build_rgraph(branch_solution)
+        rgraph_branch = Rgraph(*prepare_rgraph_branch(trunk, branch))
         rgraph_branch.violation_graphs = rgraph.violation_graphs
 
         branchmap[frozenset(branch.gen_literals)] = rgraph_branch
@@ -270,6 +349,226 @@ def get_error_rgraph(solution, is_short=True):
     return rgraph
 
 
+class ViolationGraphs(dict):
+    """
+    Maps gen literals of invalid dead branches to shortened rgraphs explaining
+    why these branches are dead. Unless filled in advance, an rgraph is built
+    upon the first access, branches sharing the same gen literals share an
+    rgraph too.
+    """
+
+    def __init__(self, trunk, *args):
+        super(ViolationGraphs, self).__init__(*args)
+        self.trunk = trunk
+        self.branches = dict((literal, branch)
+                             for literal, branch
+                             in iteritems(trunk.dead_branches)
+                             if not branch.valid)
+        self.branchmap = {}
+
+    def __contains__(self, literal):
+        return literal in self.branches
+
+    def __missing__(self, literal):
+        branch = self.branches[literal]
+
+        gen_literals = frozenset(branch.gen_literals)
+        try:
+            rgraph_branch = self.branchmap[gen_literals]
+        except KeyError:
+            rgraph_branch = explain_solution(
+                    *prepare_rgraph_branch(self.trunk, branch))
+            rgraph_branch.violation_graphs = self
+            self.branchmap[gen_literals] = rgraph_branch
+
+        self[literal] = rgraph_branch
+        return rgraph_branch
+
+
+def prepare_rgraph_branch(trunk, branch):
+    """
+    Returns a solution of the dead branch to build an rgraph for, along with
+    a set of literals to exclude from causes of implications: other dead
+    branches are explained on their own.
+    """
+    solution = branch.flatten()
+    for gen_literal in branch.gen_literals:
+        solution.reasons.add(Reason(gen_literal))
+
+    excluded = set(literal for literal in trunk.dead_branches
+                   if literal not in branch.gen_literals)
+
+    return solution, excluded
+
+
+def iter_literal_reasons(solution, literal, special_reasons, excluded=()):
+    """
+    Yields reasons of the literal within the solution: special ones of the
+    solution and implications from other literals of the solution. The latter
+    are found through contrapositive implications of the opposite literal.
+    """
+    for reason in special_reasons.get(literal, ()):
+        yield reason.materialize()
+
+    literals = solution.literals
+    for implied in (~literal).implies:
+        cause = ~implied
+        if cause in literals and cause not in excluded:
+            imply_whys = cause.imply_whys or {}
+            yield Reason(literal, [cause], imply_whys.get(literal))
+
+
+def explain_solution(solution, excluded=()):
+    """
+    Constructs shortened rgraph for an invalid solution, like
+    shorten_error_rgraph does, but without building the full rgraph.
+
+    Only the reasons reachable by a backward search from violations are
+    examined, that is from both literals of violated nodes and from literals
+    implying a dead branch. Then the shortest paths to them are found with
+    Knuth's generalization of Dijkstra's algorithm: the length of a literal
+    is 0 if it has a reason without causes, and otherwise the least sum of
+    lengths of causes of its reasons plus one.
+
+    Args:
+        solution: the solution to explain.
+        excluded: literals which are not used as causes of implications.
+    """
+    special_reasons = {}  # literal -> unmaterialized reasons
+    violations = []       # (literals, extra reason) pairs
+
+    for reason in solution.reasons:
+        if isinstance(reason, NeglastReason):
+            literal = ~reason.last_literal
+        else:
+            literal = reason.literal
+            if literal is None:
+                violations.append((reason.cause_literals, reason))
+                continue
+        special_reasons.setdefault(literal, []).append(reason)
+
+    literals = solution.literals
+    for literal in literals:
+        if literal.value and ~literal in literals:
+            violations.append(((~literal, literal), None))
+
+    # Backward search from the violations.
+    literal_reasons = {}
+    stack = [literal for violated, _ in violations for literal in violated]
+    while stack:
+        literal = stack.pop()
+        if literal in literal_reasons:
+            continue
+        reasons = literal_reasons[literal] = list(iter_literal_reasons(
+                solution, literal, special_reasons, excluded))
+        for reason in reasons:
+            stack.extend(cause for cause in reason.cause_literals
+                         if cause not in literal_reasons)
+
+    # Shortest paths over the found reasons only.
+    lengths, parents = find_shortest_hyperpaths(
+            (set(reason.cause_literals), (reason.literal,), reason)
+            for reasons in itervalues(literal_reasons)
+            for reason in reasons)
+
+    logger.debug('Lengths for shortest ways to {0} literal(s) of {1}'
+                 .format(len(lengths), solution))
+
+    def violation_length(violation):
+        violated, _ = violation
+        return sum(lengths.get(literal, float("+inf"))
+                   for literal in violated)
+
+    violations = [violation for violation in violations
+                  if violation_length(violation) != float("+inf")]
+    if violations:
+        min_length = min(map(violation_length, violations))
+        violations = [violation for violation in violations
+                      if violation_length(violation) == min_length]
+
+    # Collect paths to the shortest violations.
+    path_reasons = []
+    stack = [literal for violated, _ in violations for literal in violated]
+    visited = set()
+    while stack:
+        literal = stack.pop()
+        if literal in visited:
+            continue
+        visited.add(literal)
+        reason = parents[literal]
+        path_reasons.append(reason)
+        stack.extend(reason.cause_literals)
+
+    rgraph = Rgraph.new_bare(visited)
+    for reason in path_reasons:
+        rgraph.initialize_nodes(reason)
+
+    for _, extra_reason in violations:
+        if extra_reason is not None:
+            rgraph.add_node(None)
+            rgraph.initialize_nodes(extra_reason)
+
+    for container in itervalues(rgraph.containers):
+        container.update()
+
+    rgraph.set_paths(
+            dict((node, lengths[literal])
+                 for literal, node in iteritems(rgraph.nodes)
+                 if literal in lengths),
+            dict((node, rgraph.containers[
+                            frozenset(parents[literal].cause_literals)])
+                 for literal, node in iteritems(rgraph.nodes)
+                 if literal in parents))
+
+    return rgraph
+
+
+def get_lazy_error_rgraph(solution):
+    """
+    Constructs shortened rgraph for a trunk of the solution (which is usually
+    SolveError) using explain_solution. Rgraphs of dead branches are only
+    built once looked up in violation_graphs.
+    """
+    trunk = solution.trunk
+    rgraph = explain_solution(trunk)
+    rgraph.violation_graphs = ViolationGraphs(trunk)
+    return rgraph
+
+
+def is_prefix_literal(literal):
+    """Tells whether the literal is of an auxiliary prefix node of some
+    SingleZeroLatticeOpNode, which should not be shown to users."""
+    return literal is not None and isinstance(literal.node, PrefixNode)
+
+
+def bypass_prefix_literals(rgraph, reason):
+    """
+    Returns a reason equivalent to the given one but with prefix literals
+    among its causes replaced by the operands they are caused by in the
+    rgraph, explained with a why of the owner of the prefixes.
+    """
+    if not any(map(is_prefix_literal, reason.cause_literals)):
+        return reason
+
+    owner = None
+    cause_literals = []
+    for cause in reason.cause_literals:
+        while is_prefix_literal(cause):
+            owner = cause.node.owner
+            rnode = rgraph.nodes.get(cause)
+            if rnode is None or not isinstance(rnode.parent, Container):
+                break
+            parent_reason = rnode.becauseof[rnode.parent]
+            if len(parent_reason.cause_literals) != 1:
+                break
+            cause, = parent_reason.cause_literals
+        cause_literals.append(cause)
+
+    return Reason(reason.literal, cause_literals,
+                  owner.why_one_operand_zero_implies_others_identity,
+                  reason.follow)
+
+
 def traverse_error_rgraph(rgraph):
     """
     Traverses the input rgraph and yields tuples (reason, shift) in the reverse
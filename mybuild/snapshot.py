@@ -0,0 +1,327 @@
+"""
+Compiled pgraph snapshots.
+
+A snapshot stores a pgraph in a compact binary form: literal levels,
+implications (in the CSR form of ImplicationTable) and neglasts are kept in
+flat arrays of 32-bit integers indexed by literal ids, each array aligned to
+8 bytes, so that they are read with a single copy each instead of being
+parsed. Everything else (node descriptors and why functions used for
+explanation) is pickled into a trailing metadata block.
+
+This is just a compact serialization: the solver works with nodes and
+literals, so loading still reads the whole file and rebuilds all of them.
+Only the implication table is copied from the arrays instead of being
+computed from the literals again.
+
+A loaded snapshot is a SnapshotPgraph: node ids are preserved, nodes carry
+descriptors provided by the original pgraph (see Pgraph.node_descriptor), and
+the pgraph can be passed to the solver as is.
+"""
+
+__all__ = [
+    "SnapshotPgraph",
+    "SnapshotNode",
+    "SnapshotAtom",
+    "SnapshotError",
+    "dump_pgraph",
+    "load_pgraph",
+]
+
+
+from _compat import *
+
+import pickle
+import struct
+import sys
+
+from array import array
+
+from mybuild.core import MybuildError
+from mybuild.pgraph import *
+
+import util, logging
+logger = util.get_extended_logger(__name__)
+
+
+MAGIC   = b'MYPG'
+VERSION = 1
+
+_BYTEORDER_MARK = 0x01020304
+
+_NO_LEVEL = -0x80000000  # stands for a literal with level None
+_NO_WHY   = -1           # stands for a default why
+
+# Arrays stored in a snapshot, in order.
+_SECTIONS = [
+    'levels',            # literal id -> level
+    'imply_offsets',     # literal id -> start in imply_targets/imply_whys
+    'imply_targets',     # implied literal ids
+    'imply_whys',        # index into metadata['whys'] for each implication
+    'neglast_offsets',   # neglast index -> start in neglast_literals
+    'neglast_literals',  # literal ids of each neglast, its default first
+    'neglast_whys',      # index into metadata['whys'] for each neglast
+]
+
+# Magic, version, byte order mark, number of nodes, metadata offset and size,
+# followed by an offset and length of each section.
+_header = struct.Struct('=4sIIIQQ' + 'QQ' * len(_SECTIONS))
+
+_ALIGN = 8
+
+
+class SnapshotError(MybuildError):
+    """Raised upon loading a malformed or incompatible snapshot."""
+
+
+def _int_array(iterable=()):
+    ret = array('i', iterable)
+    assert ret.itemsize == 4
+    return ret
+
+
+def _array_bytes(a):
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
+def _why_name(why):
+    """Returns a (module, name) pair to find a why function by upon loading,
+    or None if the function is not accessible by a global name."""
+    module_name = getattr(why, '__module__', None)
+    name = getattr(why, '__name__', None)
+    if getattr(sys.modules.get(module_name), name or '', None) is why:
+        return module_name, name
+
+
+def _why_for(why_name):
+    """Inverse of _why_name. Why functions may look into attributes of nodes
+    which are not kept in a snapshot, in such case a reason is shown in the
+    default form."""
+    if why_name is None:
+        return None
+
+    module_name, name = why_name
+    try:
+        __import__(module_name)
+        why = getattr(sys.modules[module_name], name)
+    except (ImportError, AttributeError):
+        logger.debug('unable to find why function %s.%s', module_name, name)
+        return None
+
+    def snapshot_why(outcome, *causes):
+        try:
+            return why(outcome, *causes)
+        except AttributeError:
+            return Reason.default_why_func(outcome, *causes)
+
+    return snapshot_why
+
+
+def dump_pgraph(pgraph, f):
+    """Writes a snapshot of the pgraph into a binary file object."""
+    nodes = pgraph.nodes
+    const_ids = [literal.id for literal in pgraph.const_literals]
+    if const_ids != [0, 3]:
+        raise ValueError('const nodes must go first')
+
+    whys = []
+    why_indices = {None: _NO_WHY}
+
+    def why_index(why):
+        try:
+            return why_indices[why]
+        except KeyError:
+            name = _why_name(why)
+            if name is None:
+                index = _NO_WHY
+            else:
+                index = len(whys)
+                whys.append(name)
+            why_indices[why] = index
+            return index
+
+    arrays = dict((section, _int_array()) for section in _SECTIONS)
+    levels  = arrays['levels']
+    targets = arrays['imply_targets']
+    imply_whys = arrays['imply_whys']
+    imply_offsets = arrays['imply_offsets']
+    imply_offsets.append(0)
+
+    neglasts = set()
+    for node in nodes:
+        for literal in node:
+            level = literal.level
+            levels.append(_NO_LEVEL if level is None else level)
+
+            whys_of_literal = literal.imply_whys or {}
+            for implied in literal.implies:
+                targets.append(implied.id)
+                imply_whys.append(why_index(whys_of_literal.get(implied)))
+            imply_offsets.append(len(targets))
+
+            neglasts.update(literal.neglasts)
+
+    neglast_offsets = arrays['neglast_offsets']
+    neglast_offsets.append(0)
+    neglast_literals = arrays['neglast_literals']
+    for neglast in sorted(neglasts, key=lambda neglast: neglast.default.id):
+        default = neglast.default
+        neglast_literals.append(default.id)
+        neglast_literals.extend(literal.id for literal in neglast.literals
+                                if literal is not default)
+        neglast_offsets.append(len(neglast_literals))
+        arrays['neglast_whys'].append(why_index(neglast.why))
+
+    metadata = pickle.dumps(dict(
+            whys  = whys,
+            nodes = [(pgraph.node_descriptor(node), repr(node),
+                      isinstance(node, Atom)) for node in nodes[2:]]),
+            protocol=2)
+
+    offset = _header.size
+    section_fields = []
+    chunks = []
+    for section in _SECTIONS:
+        padding = -offset % _ALIGN
+        data = _array_bytes(arrays[section])
+        chunks.append(b'\0' * padding + data)
+        offset += padding
+        section_fields.extend((offset, len(arrays[section])))
+        offset += len(data)
+
+    f.write(_header.pack(MAGIC, VERSION, _BYTEORDER_MARK, len(nodes),
+                         offset, len(metadata), *section_fields))
+    for chunk in chunks:
+        f.write(chunk)
+    f.write(metadata)
+
+
+def load_pgraph(f):
+    """Reads a snapshot from a binary file object, and returns a new
+    SnapshotPgraph. Raises SnapshotError if the snapshot is malformed."""
+    return SnapshotPgraph(f.read())
+
+
+class SnapshotPgraph(Pgraph):
+    """Pgraph loaded from a snapshot, see load_pgraph."""
+
+    def __init__(self, data):
+        super(SnapshotPgraph, self).__init__()
+
+        if len(data) < _header.size:
+            raise SnapshotError('Truncated snapshot header')
+        header = _header.unpack(data[:_header.size])
+        magic, version, byteorder_mark, nr_nodes, \
+                metadata_offset, metadata_size = header[:6]
+
+        if magic != MAGIC:
+            raise SnapshotError('Not a pgraph snapshot')
+        if version != VERSION:
+            raise SnapshotError('Unsupported snapshot version: %d' % version)
+        if byteorder_mark != _BYTEORDER_MARK:
+            raise SnapshotError('Snapshot has a different byte order')
+
+        arrays = {}
+        section_fields = header[6:]
+        for index, section in enumerate(_SECTIONS):
+            offset, length = section_fields[2*index:2*index+2]
+            end = offset + 4 * length
+            if end > len(data):
+                raise SnapshotError('Truncated snapshot section: ' + section)
+            a = arrays[section] = _int_array()
+            if hasattr(a, 'frombytes'):
+                a.frombytes(data[offset:end])
+            else:
+                a.fromstring(data[offset:end])
+
+        if metadata_offset + metadata_size > len(data):
+            raise SnapshotError('Truncated snapshot metadata')
+        try:
+            metadata = pickle.loads(
+                    data[metadata_offset:metadata_offset+metadata_size])
+            whys = [_why_for(why_name) for why_name in metadata['whys']]
+            node_entries = metadata['nodes']
+        except Exception as e:
+            raise SnapshotError('Malformed snapshot metadata: %s' % e)
+
+        if len(node_entries) + 2 != nr_nodes:
+            raise SnapshotError('Inconsistent number of nodes')
+
+        self._descriptor_map = {}
+        for node_id, (descriptor, label, is_atom) in enumerate(node_entries,
+                                                                2):
+            node = self.new_node(SnapshotAtom if is_atom else SnapshotNode,
+                                 node_id, descriptor, label)
+            if descriptor is not None:
+                self._descriptor_map[descriptor] = node
+
+        self._init_literals(arrays, whys)
+
+    def _init_literals(self, arrays, whys):
+        literals = [literal for node in self.nodes for literal in node]
+        levels = arrays['levels']
+        if len(levels) != len(literals):
+            raise SnapshotError('Inconsistent number of literals')
+
+        def why_at(index):
+            return whys[index] if index != _NO_WHY else None
+
+        imply_offsets = arrays['imply_offsets']
+        imply_targets = arrays['imply_targets']
+        imply_whys    = arrays['imply_whys']
+
+        for literal_id, literal in enumerate(literals):
+            level = levels[literal_id]
+            literal.level = None if level == _NO_LEVEL else level
+
+            start, end = imply_offsets[literal_id:literal_id+2]
+            if start == end:
+                continue
+            literal.implies = set(literals[implied_id]
+                                  for implied_id in imply_targets[start:end])
+            imply_whys_of_literal = dict(
+                    (literals[imply_targets[pos]], why_at(imply_whys[pos]))
+                    for pos in range(start, end)
+                    if imply_whys[pos] != _NO_WHY)
+            if imply_whys_of_literal:
+                literal.imply_whys = imply_whys_of_literal
+
+        neglast_offsets  = arrays['neglast_offsets']
+        neglast_literals = arrays['neglast_literals']
+        for index, why_index in enumerate(arrays['neglast_whys']):
+            start, end = neglast_offsets[index:index+2]
+            default = literals[neglast_literals[start]]
+            neglast = Neglast(default, (literals[literal_id] for literal_id
+                                        in neglast_literals[start+1:end]),
+                              why_at(why_index))
+            for literal in neglast.literals:
+                if not literal.neglasts:
+                    literal.neglasts = set()
+                literal.neglasts.add(neglast)
+
+        self._implication_table = ImplicationTable.from_arrays(
+                imply_offsets, imply_targets)
+
+    def node_for_descriptor(self, descriptor):
+        """Returns a node with the given descriptor, or None."""
+        return self._descriptor_map.get(descriptor)
+
+
+@SnapshotPgraph.node_type
+class SnapshotNode(Node):
+    """
+    Node of a loaded snapshot. Descriptor is the one provided by the original
+    pgraph, and label is a repr of the original node.
+    """
+
+    def __init__(self, node_id, descriptor, label):
+        super(SnapshotNode, self).__init__()
+        self.descriptor = descriptor
+        self.label = label
+
+    def __repr__(self):
+        return self.label
+
+
+@SnapshotPgraph.node_type
+class SnapshotAtom(SnapshotNode, Atom):
+    """Node of a loaded snapshot that was an atom in the original pgraph."""
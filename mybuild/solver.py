@@ -12,24 +12,31 @@ __all__ = [
     "Diff",
     "Branch",
 
+    "trunk_engines",
     "create_trunk",
+    "collapse_branchset",
     "expand_branch",
     "expand_branchset",
     "resolve_branches",
+    "commit_resolved",
     "stepwise_resolve",
     "solve_trunk",
 
     "solve",
     "SolveError",
+
+    "IncrementalSolver",
 ]
 
 
 from _compat import *
 
 from collections import defaultdict
+import copy
 import operator
 
 from mybuild.pgraph import *
+from mybuild.profiling import null_profiler
 
 from util.itertools import pop_iter
 from util.operator import getter
@@ -40,13 +47,14 @@ import util, logging
 logger = util.get_extended_logger(__name__)
 
 
-def log_debug_enabled(logger=logger):
-    return logger.isEnabledFor(logging.DEBUG)
-
-
 class Solution(object):
     """
     Solution backed by sets of nodes and their literals.
+
+    Nodes and literals are stored in bitsets indexed by their ids, so that
+    merging solutions is carried out word-wise. Bitsets are persistent: a
+    closure merged into a branch or a diff is shared with it chunk by chunk
+    rather than copied.
     """
 
     _dump_attrs = 'valid nodes literals'.split() + ['reasons']
@@ -55,23 +63,41 @@ class Solution(object):
     def valid(self):
         return len(self.nodes) == len(self.literals)
 
-    def __init__(self, initial=None):
+    @property
+    def pgraph(self):
+        return self.literals.pgraph
+
+    def __init__(self, initial=None, pgraph=None):
         super(Solution, self).__init__()
 
-        self.nodes    = set()
-        self.literals = set()
+        self.nodes    = NodeSet(pgraph=pgraph)
+        self.literals = LiteralSet(pgraph=pgraph)
         self.reasons  = set()  # note that this set does NOT include reasons
                                # from each literal's imply_reasons set, only
                                # special (like for neglasts or assumptions).
+                               # Some of them are not materialized, see
+                               # iter_reasons.
 
         if initial is not None:
             self |= initial
 
+    def iter_reasons(self):
+        """Yields materialized reasons of the solution."""
+        for reason in self.reasons:
+            yield reason.materialize()
+
     def dispose(self):
         del self.nodes
         del self.literals
         del self.reasons
 
+    def copy(self):
+        ret = copy.copy(self)
+        ret.nodes    = self.nodes.copy()
+        ret.literals = self.literals.copy()
+        ret.reasons  = set(self.reasons)
+        return ret
+
     def __ior__(self, other):
         self.nodes    |= other.nodes
         self.literals |= other.literals
@@ -101,6 +127,24 @@ class ComparableSolution(Solution):
                 self.reasons  == other.reasons)
 
 
+class Neglefts(dict):
+    """
+    Maps neglasts to sets of their literals left out of the trunk. Unless
+    filled in advance, a set is computed upon the first access.
+    """
+
+    def __init__(self, trunk, *args):
+        super(Neglefts, self).__init__(*args)
+        self.trunk = trunk
+
+    def __missing__(self, neglast):
+        trunk_literals = self.trunk.literals
+        negleft = self[neglast] = set(literal
+                                      for literal in neglast.literals
+                                      if literal not in trunk_literals)
+        return negleft
+
+
 class Trunk(Solution):
     """docstring for Trunk"""
 
@@ -109,27 +153,100 @@ class Trunk(Solution):
 
     @cached_property
     def base(self):
-        ret = Solution()
+        return self.revision(0)
 
-        ret |= self
-        for diff in reversed(self.commits):
-            ret -= diff
+    def revision(self, rev):
+        """
+        Returns a solution of the trunk as of the given revision, that is its
+        base with the first rev commits applied.
+
+        Revisions are cached, since commits are never modified, and a new one
+        is built from the closest earlier revision cached (or by subtracting
+        later commits from the trunk if there is no such one). Solutions
+        returned share chunks of bitsets with each other and with the trunk,
+        and must not be modified.
+        """
+        revisions = self.revisions
+        try:
+            return revisions[rev]
+        except KeyError:
+            pass
+
+        if not 0 <= rev <= self.rev:
+            raise ValueError('No such revision: {0}'.format(rev))
+
+        earlier = [cached_rev for cached_rev in revisions if cached_rev < rev]
+        if earlier:
+            start = max(earlier)
+            ret = Solution(revisions[start])
+        else:
+            start = rev
+            ret = Solution(self)
+            for diff in reversed(self.commits[rev:]):
+                ret -= diff
+
+        for diff in self.commits[start:rev]:
+            assert ret.isdisjoint(diff)
+            ret |= diff
 
+        revisions[rev] = ret
         return ret
 
     @property
     def rev(self):
         return len(self.commits)
 
-    def __init__(self):
-        super(Trunk, self).__init__()
+    def __init__(self, pgraph=None):
+        super(Trunk, self).__init__(pgraph=pgraph)
 
-        self.neglefts = dict()   # neglasts to sets of left literals
+        self.neglefts = Neglefts(self)  # neglasts to sets of left literals
 
         self.branchmap     = dict()  # maps gen literals to branches
         self.dead_branches = dict()  # gen literals to dead branches
 
         self.commits = list()  # incremental diffs applied to the trunk
+        self.revisions = dict()  # cached solutions by revisions, see revision
+
+        # Inverted index of branches by blocks of literal ids, built upon
+        # the first call to touched_branches or copy.
+        self.branch_index = None
+
+    def copy(self):
+        """Returns a copy of the trunk among with all of its branches, which
+        can be committed to independently from the original."""
+        ret = Trunk(self.pgraph)
+        ret |= self
+
+        ret.neglefts = Neglefts(ret, ((neglast, set(negleft))
+                                      for neglast, negleft
+                                      in iteritems(self.neglefts)))
+        ret.commits = list(self.commits)  # diffs are not modified once committed
+        ret.revisions = dict(self.revisions)  # neither are revisions
+
+        branch_copies = dict()  # {id(branch): copy}, keeps branches shared
+        def copy_of(branch):
+            try:
+                return branch_copies[id(branch)]
+            except KeyError:
+                branch_copy = branch_copies[id(branch)] = branch.copy(trunk=ret)
+                return branch_copy
+
+        ret.branchmap = dict((literal, copy_of(branch))
+                             for literal, branch in iteritems(self.branchmap))
+        ret.dead_branches = dict((literal, copy_of(branch))
+                                 for literal, branch
+                                 in iteritems(self.dead_branches))
+
+        # The index is built once for the original and carried over to the
+        # copy, so that committing to any of them only looks up the touched
+        # branches instead of indexing all of them anew.
+        index = ret.branch_index = defaultdict(set)
+        for block, branches in iteritems(self.get_branch_index()):
+            index[block] = set(branch_copies[id(branch)]
+                               for branch in branches
+                               if self.has_branch(branch))
+
+        return ret
 
     def commit(self, diff):
         if self is not diff.trunk:
@@ -176,6 +293,19 @@ class Trunk(Solution):
             assert self.branchmap[gen_literal] is branch
             self.branchmap[gen_literal] = other
 
+    def join_branch(self, branch, other):
+        """
+        Merges a branch into an equivalent one (i.e. gen literals of both
+        imply each other) and substitutes it. The branch is disposed.
+        """
+        other.todo |= branch.todo
+        branch.todo.clear()  # otherwise merge() would refuse it
+
+        other.merge(branch)
+
+        self.substitute_branch(branch, other)
+        branch.dispose()  # forget about this branch and make gc happy
+
     def iter_branch_todo_away(self, branch):
         """
         Exhausts a todo set of literals of the given branch, yielding them
@@ -204,6 +334,79 @@ class Trunk(Solution):
     def branchset(self):
         return set(itervalues(self.branchmap))
 
+    def has_branch(self, branch):
+        return (branch.trunk is self and
+                any(self.branchmap.get(gen_literal) is branch
+                    for gen_literal in branch.gen_literals))
+
+    index_block_shift = 6  # 64 literals (32 nodes) per block
+
+    def index_branch(self, branch, literals):
+        """
+        Adds a branch to the index under blocks of the given literals, which
+        is either a LiteralSet or an iterable of literals. Must be called
+        whenever literals are added to a branch. Does nothing until the index
+        is built.
+        """
+        index = self.branch_index
+        if index is None:
+            return
+
+        block_shift = self.index_block_shift
+        if isinstance(literals, LiteralSet):
+            blocks = literals.iter_blocks(block_shift)
+        else:
+            blocks = set(literal.id >> block_shift for literal in literals)
+
+        for block in blocks:
+            index[block].add(branch)
+
+    def get_branch_index(self):
+        """Returns the index of branches, building it if necessary."""
+        index = self.branch_index
+        if index is None:
+            index = self.branch_index = defaultdict(set)
+            for branch in self.branchset():
+                self.index_branch(branch, branch.literals)
+        return index
+
+    def touched_branches(self, diff):
+        """
+        Returns a set of branches of the branchmap intersecting with the given
+        diff, i.e. including some of its literals or nodes, or excluding from
+        the same neglasts. Only these branches need to be updated after the
+        diff is committed.
+
+        Candidates are looked up in the index by blocks of literals of the
+        diff (both literals of a node fall into the same block) and of its
+        neglasts, so that the cost is proportional to the size of the diff
+        rather than to the number of branches. The index is only grown by
+        index_branch, it may keep branches that have shrunk since then, and
+        those which are not in the branchmap anymore, the latter are dropped
+        lazily.
+        """
+        index = self.get_branch_index()
+
+        block_shift = self.index_block_shift
+        blocks = set(diff.literals.iter_blocks(block_shift))
+        for neglast in diff.negexcls:
+            blocks.update(literal.id >> block_shift
+                          for literal in neglast.literals)
+
+        candidates = set()
+        for block in blocks:
+            branches = index.get(block)
+            if branches:
+                branches -= set(branch for branch in branches
+                                if not self.has_branch(branch))
+                candidates |= branches
+
+        return set(branch for branch in candidates
+                   if not (branch.literals.isdisjoint(diff.literals) and
+                           branch.nodes.isdisjoint(diff.nodes) and
+                           not any(branch.negexcls.get(neglast)
+                                   for neglast in diff.negexcls)))
+
 
 class Diff(Solution):
     """docstring for Diff"""
@@ -219,7 +422,7 @@ class Diff(Solution):
         return not self.todo
 
     def __init__(self, trunk):
-        super(Diff, self).__init__()
+        super(Diff, self).__init__(pgraph=trunk.pgraph)
 
         self.trunk   = trunk
         self.baserev = trunk.rev  # always 0 as long as all branches are
@@ -234,21 +437,29 @@ class Diff(Solution):
         del self.negexcls
         super(Diff, self).dispose()
 
+    def copy(self, trunk=None):
+        ret = super(Diff, self).copy()
+        if trunk is not None:
+            ret.trunk = trunk
+
+        ret.todo = set(self.todo)
+        ret.negexcls = defaultdict(set, ((neglast, set(negexcl))
+                                         for neglast, negexcl
+                                         in iteritems(self.negexcls)))
+        return ret
+
     def flatten(self):
         if not self.ready:
             raise ValueError('not ready: {0}: {0.todo}'.format(self))
 
         trunk = self.trunk
         if self.baserev == trunk.rev:
-            changesets = [trunk]
+            ret = Solution(trunk)
         else:
-            changesets = [trunk.base] + trunk.commits[:self.baserev]
-        changesets.append(self)
+            ret = Solution(trunk.revision(self.baserev))
 
-        ret = Solution()
-        for diff in changesets:
-            assert ret.isdisjoint(diff)
-            ret |= diff
+        assert ret.isdisjoint(self)
+        ret |= self
 
         return ret
 
@@ -299,7 +510,7 @@ class Diff(Solution):
         if left <= 1:
             negleft = (trunk_negleft-negexcl) if left else ()
 
-            neg_literal, neg_reason = neglast.neg_reason_for(*negleft)
+            neg_literal, neg_reason = neglast.neg_for(*negleft)
 
             if neg_reason not in self.trunk.reasons:
                 self.reasons.add(neg_reason)
@@ -333,8 +544,13 @@ class Branch(Diff):
 
         self.todo |= gen_literal.implies
 
+    def copy(self, trunk=None):
+        ret = super(Branch, self).copy(trunk)
+        ret.gen_literals = set(self.gen_literals)
+        return ret
+
     def merge(self, other):
-        if self.literals >= other.gen_literals:  # other is already in self
+        if self.literals.issuperset(other.gen_literals):  # other is in self
             assert self.nodes    >= other.nodes
             assert self.literals >= other.literals
             assert self.reasons  >= other.reasons
@@ -344,6 +560,11 @@ class Branch(Diff):
             return
 
         super(Branch, self).merge(other)
+        self.trunk.index_branch(self, other.literals)
+
+    def add_literal(self, literal, add_node=True):
+        super(Branch, self).add_literal(literal, add_node)
+        self.trunk.index_branch(self, (literal,))
 
     def __repr__(self):
         try:
@@ -356,19 +577,18 @@ class Branch(Diff):
             return '<{cls.__name__}: DISPOSED>'.format(cls=type(self))
 
 
-@logger.wrap
-def create_trunk(pgraph, initial_literals=[]):
-    initial_literals = to_lset(initial_literals)
-
-    logger.info('creating trunk for %d node(s)', len(initial_literals))
-    if log_debug_enabled():
-        for literal in initial_literals:
-            logger.debug('\tinitial literal: %r', literal)
+def propagate_sets(trunk, literals):
+    """
+    Computes an implication closure of literals for a newly created trunk.
+    Reasons and neglefts are filled in the trunk, and the closure itself is
+    returned as a byte array of flags indexed by literal ids.
 
-    trunk = Trunk()
+    Each neglast keeps a set of its literals left out of the trunk, which is
+    updated upon adding any of them.
+    """
+    pgraph = trunk.pgraph
+    trace = util.tracing
 
-    nodes    = trunk.nodes
-    literals = trunk.literals
     reasons  = trunk.reasons
     neglefts = trunk.neglefts
 
@@ -383,25 +603,32 @@ def create_trunk(pgraph, initial_literals=[]):
                     logger.warning('len(negleft) <= 1')
                     neg_todo.append((neglast, negleft))
 
+    # The closure is computed in terms of literal ids using a compiled
+    # implication table, seen literals are flagged in a byte array and
+    # converted into bitsets of the trunk at the end.
+    table = pgraph.implication_table
+    literal_at = pgraph.literal_at
+
+    seen = bytearray(len(table))
+
     # During the loop below we admit possible violation of the main context
     # invariant, i.e. len(nodes) may become less than len(literals).
     #
     # A difference between implication closures of conflicting literals is
     # accumulated in order to be able to produce better error reporting
     # because of keeping more reason chains for all literals.
-    todo = initial_literals
-    todo.update(pgraph.const_literals)
+    todo = []
 
-    for literal in todo:
+    for literal in literals:
         reasons.add(Reason(literal))
+        seen[literal.id] = 1
+        todo.append(literal.id)
 
-    literals |= todo
-
-    for literal in pop_iter(todo):
-        logger.debug('\ttrunk literal: %r', literal)
-
-        assert literal in literals, "must has already been added"
-        nodes.add(literal.node)
+    while todo:
+        literal_id = todo.pop()
+        literal = literal_at(literal_id)
+        if trace:
+            logger.debug('\ttrunk literal: %r', literal)
 
         for neglast in literal.neglasts:
             negleft = neglefts[neglast]
@@ -412,25 +639,166 @@ def create_trunk(pgraph, initial_literals=[]):
                 # cause it still may be excluded.
                 neg_todo.append((neglast, negleft))
 
-        newly_seen = literal.implies - literals
+        for implied_id in table.implied_ids(literal_id):
+            if not seen[implied_id]:
+                seen[implied_id] = 1
+                todo.append(implied_id)
 
-        if not todo and not newly_seen:
+        if not todo:
             # no more direct implications, flush neg_todo
             for neglast, negleft in neg_todo:
-                logger.debug('\ttrunk negleft: %r', negleft)
+                if trace:
+                    logger.debug('\ttrunk negleft: %r', negleft)
+
+                assert len(negleft) <= 1, "at most one literal must have left"
+                neg_literal, neg_reason = neglast.neg_for(*negleft)
+
+                if not seen[neg_literal.id]:
+                    seen[neg_literal.id] = 1
+                    todo.append(neg_literal.id)
+
+                reasons.add(neg_reason)
+
+            del neg_todo[:]
+
+    return seen
+
+
+def propagate_watched(trunk, literals):
+    """
+    Does the same as propagate_sets, but uses two watched literals per
+    neglast: a neglast is only visited when one of two literals it watches
+    gets into the trunk, and it then looks for another literal to watch,
+    which is not in the trunk yet. A neglast having none fires and negates
+    the last literal left (if any).
+
+    Neglefts of the trunk are not filled, they are computed on demand for
+    neglasts touched by branches.
+    """
+    pgraph = trunk.pgraph
+    trace = util.tracing
+
+    reasons = trunk.reasons
+
+    table = pgraph.implication_table
+    literal_at = pgraph.literal_at
+
+    seen = bytearray(len(table))
+
+    # Literal ids of each neglast, the first two of them are watched.
+    neglast_ids = dict()
+    watches = defaultdict(list)  # {literal id: [neglasts watching it]}
+
+    neg_todo = list()
+    fired = set()  # neglasts in neg_todo, or already flushed
+
+    for node in pgraph.nodes:
+        for literal in node:
+            for neglast in literal.neglasts:
+                if neglast in neglast_ids:
+                    continue
+
+                ids = neglast_ids[neglast] = [literal.id for literal
+                                              in neglast.literals]
+                if len(ids) <= 1:  # will not happen, generally speaking
+                    logger.warning('len(negleft) <= 1')
+                    fired.add(neglast)
+                    neg_todo.append(neglast)
+                else:
+                    watches[ids[0]].append(neglast)
+                    watches[ids[1]].append(neglast)
+
+    # See comments in propagate_sets.
+    todo = []
+
+    for literal in literals:
+        reasons.add(Reason(literal))
+        seen[literal.id] = 1
+        todo.append(literal.id)
+
+    while todo:
+        literal_id = todo.pop()
+        if trace:
+            logger.debug('\ttrunk literal: %r', literal_at(literal_id))
+
+        for neglast in watches.pop(literal_id, ()):
+            if neglast in fired:
+                continue
+
+            ids = neglast_ids[neglast]
+            if ids[0] == literal_id:
+                ids[0], ids[1] = ids[1], ids[0]
+
+            for i in range(2, len(ids)):
+                if not seen[ids[i]]:
+                    ids[1], ids[i] = ids[i], ids[1]
+                    watches[ids[1]].append(neglast)
+                    break
+
+            else:
+                # All but the other watched literal are in the trunk, which
+                # is either left out, or negated upon flushing neg_todo.
+                fired.add(neglast)
+                neg_todo.append(neglast)
+
+        for implied_id in table.implied_ids(literal_id):
+            if not seen[implied_id]:
+                seen[implied_id] = 1
+                todo.append(implied_id)
+
+        if not todo:
+            for neglast in neg_todo:
+                negleft = [literal_at(left_id)
+                           for left_id in neglast_ids[neglast]
+                           if not seen[left_id]]
+                if trace:
+                    logger.debug('\ttrunk negleft: %r', negleft)
 
                 assert len(negleft) <= 1, "at most one literal must have left"
-                neg_literal, neg_reason = neglast.neg_reason_for(*negleft)
+                neg_literal, neg_reason = neglast.neg_for(*negleft)
 
-                if neg_literal not in literals:
-                    newly_seen.add(neg_literal)
+                if not seen[neg_literal.id]:
+                    seen[neg_literal.id] = 1
+                    todo.append(neg_literal.id)
 
                 reasons.add(neg_reason)
 
             del neg_todo[:]
 
-        literals |= newly_seen
-        todo     |= newly_seen
+    return seen
+
+
+trunk_engines = {
+    'sets':    propagate_sets,
+    'watched': propagate_watched,
+}
+
+
+@logger.wrap
+def create_trunk(pgraph, initial_literals=[], engine='sets'):
+    """
+    Creates a trunk of literals implied by the initial ones, and branches
+    for the rest nodes. Engine is a name of the propagation engine for the
+    trunk, see trunk_engines.
+    """
+    try:
+        propagate = trunk_engines[engine]
+    except KeyError:
+        raise ValueError('Unknown engine: {0!r}'.format(engine))
+
+    initial_literals = to_lset(initial_literals)
+    trace = util.tracing
+
+    logger.info('creating trunk for %d node(s)', len(initial_literals))
+    if trace:
+        for literal in initial_literals:
+            logger.debug('\tinitial literal: %r', literal)
+
+    trunk = Trunk(pgraph)
+    seen = propagate(trunk, initial_literals | set(pgraph.const_literals))
+
+    trunk.literals.update_flags(seen)
+    trunk.nodes.update_flags(map(operator.or_, seen[0::2], seen[1::2]))
 
     if not trunk.valid:
         logger.info('trunk is not valid')
@@ -446,17 +814,55 @@ def create_trunk(pgraph, initial_literals=[]):
                 len(unresolved_nodes))
 
     for node in unresolved_nodes:
-        logger.debug('\tunresolved node: %r', node)
+        if trace:
+            logger.debug('\tunresolved node: %r', node)
 
         for literal in node:
             trunk.branchmap[literal] = Branch(trunk, literal)
 
     assert len(trunk.branchmap) == 2*len(unresolved_nodes)
 
-    logger.dump(trunk)
+    if trace:
+        logger.dump(trunk)
     return trunk
 
 
+def collapse_branchset(trunk):
+    """
+    Joins branches of literals implying each other into a single branch.
+
+    Literals of a strongly connected component of the implication graph have
+    the same closure, so their branches can share a single representative
+    before expansion, instead of finding such cycles one by one during DFS
+    of expand_branch. Only unresolved literals are considered.
+    """
+    pgraph = trunk.pgraph
+    literal_at = pgraph.literal_at
+    branchmap = trunk.branchmap
+
+    table = pgraph.implication_table
+
+    mask = bytearray(len(table))
+    for literal in branchmap:
+        mask[literal.id] = 1
+
+    nr_joined = 0
+
+    for component in table.strong_components(mask):
+        literals = [literal_at(literal_id) for literal_id in component]
+        if util.tracing:
+            logger.debug('\tmutual implication: %r', literals)
+
+        branch = branchmap[literals[0]]
+        for literal in literals[1:]:
+            other = branchmap[literal]
+            if other is not branch:
+                trunk.join_branch(other, branch)
+                nr_joined += 1
+
+    logger.info('joined %d branch(es) of mutually implied literals', nr_joined)
+
+
 def expand_branch(branch):
     """Handles all branch todos (if any), in other words makes it ready.
 
@@ -465,6 +871,7 @@ def expand_branch(branch):
         return
 
     trunk = branch.trunk
+    trace = util.tracing
 
     stack = list()
 
@@ -484,34 +891,35 @@ def expand_branch(branch):
     while stack:
         branch = stack[-1]
 
-        log_indent = '. '*len(stack)
-        logger.debug('\t%shandling  %r', log_indent, branch)
+        if trace:
+            log_indent = '. '*len(stack)
+            logger.debug('\t%shandling  %r', log_indent, branch)
 
         try:
             literal, implied = next(branch.todo_it)
-            logger.debug('\t%s todo literal: %r, implied: %r', log_indent,
-                         literal, implied)
+            if trace:
+                logger.debug('\t%s todo literal: %r, implied: %r',
+                             log_indent, literal, implied)
 
             if hasattr(implied, 'todo_it'):  # equivalent (mutual implication)
-                logger.debug('\t%s(mutual implication with %r)', log_indent,
-                             implied)
-                implied.todo |= branch.todo
-                branch.todo.clear()  # otherwise merge() would refuse it
-
-                implied.merge(branch)
-
-                trunk.substitute_branch(branch, implied)
-                branch.dispose()  # forget about this branch and make gc happy
+                if trace:
+                    logger.debug('\t%s(mutual implication with %r)',
+                                 log_indent, implied)
+                trunk.join_branch(branch, implied)
                 raise StopIteration
 
         except StopIteration:
-            logger.debug('\t%ssucceeded %r', log_indent, branch)
+            if trace:
+                logger.debug('\t%ssucceeded %r', log_indent, branch)
             stack_pop()
 
         else:
-            if implied is None or not implied.valid:
-                logger.debug('\t%s(implied is not valid: %r)', log_indent,
-                             implied)
+            # A branch refused by trunk is dead even if it is valid per se.
+            if (implied is None or not implied.valid or
+                    ~literal in trunk.literals):
+                if trace:
+                    logger.debug('\t%s(implied is not valid: %r)',
+                                 log_indent, implied)
                 branch.add_literal(literal, add_node=False)
                 if implied is not None:
                     branch.reasons.add(Reason(None, [literal],
@@ -522,7 +930,8 @@ def expand_branch(branch):
                 branch.merge(implied)
 
             else:
-                logger.debug('\t%sdeferred  %r', log_indent, branch)
+                if trace:
+                    logger.debug('\t%sdeferred  %r', log_indent, branch)
                 # The best thing we can do here is to put the literal back
                 # into todo set to restart handling it later with properly
                 # initialized (and possibly substituted) implied branch.
@@ -538,11 +947,18 @@ def expand_branchset(trunk):
         expand_branch(branch)
 
 
-def branchset_to_resolve(trunk):
+def branchset_to_resolve(trunk, branchset=None):
+    if branchset is None:
+        branchset = trunk.branchset()
+
     dead_literals = set()
-    for branch in filternot(getter.valid, trunk.branchset()):
+    for branch in filternot(getter.valid, branchset):
         dead_literals |= branch.gen_literals
-    return dead_literals, set(trunk.branchmap[~literal] for literal in dead_literals)
+    # A dead branch may be shared with gen literals refused by trunk already,
+    # and there are no branches for opposites of such literals.
+    return dead_literals, set(trunk.branchmap[~literal]
+                              for literal in dead_literals
+                              if ~literal in trunk.branchmap)
 
 
 @logger.wrap
@@ -552,6 +968,8 @@ def resolve_branches(trunk, branches=None):
     branches.
     """
 
+    trace = util.tracing
+
     dead_literals = set()
     if branches is None:
         dead_literals, branches = branchset_to_resolve(trunk)
@@ -559,12 +977,14 @@ def resolve_branches(trunk, branches=None):
 
     while branches:
         logger.info('resolving %d branch(es)', len(branches))
-        logger.dump(trunk)
+        if trace:
+            logger.dump(trunk)
 
         resolved = Diff(trunk)  # created by merging together all diffs
 
         for branch in branches:
-            logger.debug('\t+merge %r', branch)
+            if trace:
+                logger.debug('\t+merge %r', branch)
             for gen_literal in branch.gen_literals:
                 if ~gen_literal in dead_literals:
                     resolved.reasons.add(Reason(gen_literal,
@@ -575,30 +995,50 @@ def resolve_branches(trunk, branches=None):
                                                 follow=False))
 
             resolved.merge(branch)
-        expand_branch(resolved)  # handle todos, if any
+        touched = commit_resolved(trunk, resolved)
+
+        # Untouched branches are valid, since all dead ones were resolved.
+        dead_literals, branches = branchset_to_resolve(trunk, touched)
+
+    if trace:
+        logger.dump(trunk)
 
+
+def commit_resolved(trunk, resolved):
+    """Expands the resolved diff and commits it into trunk, then updates the
+    rest branches accordingly. Returns a set of updated branches. Raises
+    SolveError if the diff is not valid."""
+    trace = util.tracing
+
+    expand_branch(resolved)  # handle todos, if any
+
+    if trace:
         logger.dump(resolved)
-        if not resolved.valid:
-            logger.info('resolved is not valid, giving up')
-            #TODO chek this commit works correctly
-            trunk.commit(resolved)
-            raise SolveError(trunk)
-
-        # Reintegrate into trunk. This also removes resolved branches and
-        # their opposites (refused branches) from branchmap.
+    if not resolved.valid:
+        logger.info('resolved is not valid, giving up')
+        #TODO chek this commit works correctly
         trunk.commit(resolved)
+        raise SolveError(trunk)
 
-        # Maintain remaining branches to be strict diffs with just updated
-        # trunk. This may involve new conflicts, i.e. new branches can be
-        # resolved next.
-        for branch in trunk.branchset():
-            logger.debug('\t-merge %r', branch)
-            branch.reverse_merge(resolved)
-        expand_branchset(trunk)
+    # Reintegrate into trunk. This also removes resolved branches and
+    # their opposites (refused branches) from branchmap.
+    trunk.commit(resolved)
 
-        dead_literals, branches = branchset_to_resolve(trunk)
+    # Maintain remaining branches to be strict diffs with just updated
+    # trunk. This may involve new conflicts, i.e. new branches can be
+    # resolved next. Only branches touched by the resolved diff may change,
+    # the rest are left as is.
+    touched = trunk.touched_branches(resolved)
 
-    logger.dump(trunk)
+    for branch in touched:
+        if trace:
+            logger.debug('\t-merge %r', branch)
+        branch.reverse_merge(resolved)
+    for branch in filter(getter.trunked, touched):
+        expand_branch(branch)
+
+    # Expanding may join touched branches (only they can be not ready).
+    return set(filter(getter.trunked, touched))
 
 
 @logger.wrap
@@ -613,27 +1053,176 @@ def stepwise_resolve(trunk):
         resolve_branches(trunk, branchset & trunk.branchset())
 
 
-def solve_trunk(pgraph, initial_values={}):
-    trunk = create_trunk(pgraph, initial_values)
+def solve_trunk(pgraph, initial_values={}, profiler=null_profiler,
+                engine='sets'):
+    with profiler.phase('create_trunk', 'solve') as phase:
+        trunk = create_trunk(pgraph, initial_values, engine)
+        if profiler.enabled:
+            phase.update(nr_trunk_nodes=len(trunk.nodes),
+                         nr_branches=len(trunk.branchmap))
+
+    with profiler.phase('collapse_branchset', 'solve'):
+        collapse_branchset(trunk)
+
+    with profiler.phase('expand_branchset', 'solve'):
+        expand_branchset(trunk)
 
-    expand_branchset(trunk)
-    resolve_branches(trunk)
-    stepwise_resolve(trunk)
+    for phase_name, func in [('resolve_branches', resolve_branches),
+                             ('stepwise_resolve', stepwise_resolve)]:
+        with profiler.phase(phase_name, 'solve') as phase:
+            func(trunk)
+            if profiler.enabled:
+                phase.update(rev=trunk.rev,
+                             nr_trunk_nodes=len(trunk.nodes),
+                             nr_branches=len(trunk.branchmap))
 
     return trunk
 
 
-def solve(pgraph, initial_values={}):
+def solve(pgraph, initial_values={}, profiler=null_profiler, engine='sets'):
+    """
+    Solves the pgraph and returns a dict mapping nodes to their values (None
+    for nodes left undetermined). Raises SolveError on conflicts.
+
+    Engine selects the way the trunk is propagated: 'sets' (the default)
+    keeps a set of left literals for each neglast, and 'watched' uses two
+    watched literals per neglast instead, which pays off for wide neglasts
+    most literals of which end up in the trunk, like ones of large Or nodes.
+    """
     logger.info('solving %r with initials: %r', pgraph, initial_values)
 
-    trunk = solve_trunk(pgraph, initial_values)
+    trunk = solve_trunk(pgraph, initial_values, profiler, engine)
     ret = dict.fromkeys(pgraph.nodes)
     ret.update(trunk.literals)
-    logger.debug('Solution:')
-    for literal in ret:
-        logger.debug('\t%s: %s', literal, ret[literal])
+    if util.tracing:
+        logger.debug('Solution:')
+        for literal in ret:
+            logger.debug('\t%s: %s', literal, ret[literal])
     return ret
 
+class IncrementalSolver(object):
+    """
+    Solves a pgraph repeatedly while initial values change in between.
+
+    The solver keeps a base trunk created with no initial values and having
+    all branches expanded, i.e. implication closures of all literals. Each
+    solve works on a copy of the base: initial literals are committed into
+    it, so that only branches touched by them get re-expanded, and the rest
+    is resolved as usual.
+
+    Implications added through add_implication are applied to the base
+    incrementally as well. Any other change of the pgraph (new nodes, or
+    constraints added directly, e.g. with '>>') invalidates the base, and it
+    is created from scratch upon the next solve.
+    """
+
+    def __init__(self, pgraph):
+        super(IncrementalSolver, self).__init__()
+        self.pgraph = pgraph
+        self.initial_literals = set()
+
+        self.base = None  # expanded trunk with no initial literals
+        self.base_nr_changes = 0  # pgraph.nr_changes the base respects
+
+        self.trunk = None  # the last solved trunk
+
+    def prepare_base(self):
+        nr_changes = self.pgraph.nr_changes
+        if self.base is not None and self.base_nr_changes == nr_changes:
+            return self.base
+
+        logger.info('creating base trunk for %d node(s)',
+                    len(self.pgraph.nodes))
+        self.base = None
+        self.base_nr_changes = nr_changes
+
+        base = create_trunk(self.pgraph)  # SolveError means no solution at all
+        collapse_branchset(base)
+        expand_branchset(base)
+
+        self.base = base
+        return base
+
+    def add_implication(self, if_literal, then_literal, why=None):
+        """Adds an implication (along with its contrapositive) to the pgraph
+        and updates the base trunk to respect it."""
+        base_is_fresh = (self.base is not None and
+                         self.base_nr_changes == self.pgraph.nr_changes)
+        if_literal.therefore(then_literal, why)
+
+        if not base_is_fresh:
+            self.base = None
+            return
+        self.base_nr_changes = self.pgraph.nr_changes
+
+        try:
+            for if_, then in ((if_literal, then_literal),
+                              (~then_literal, ~if_literal)):
+                self._apply_implication(self.base, if_, then)
+        except SolveError:
+            self.base = None  # recreate it to report the error properly
+
+    def _apply_implication(self, base, if_, then):
+        if if_ in base.literals:
+            if then in base.literals:
+                return
+
+            # The trunk itself grows, commit a closure of the implied literal.
+            resolved = Diff(base)
+            branch = base.branchmap.get(then)
+            if branch is None:
+                resolved.add_literal(then)  # ~then is in trunk, a conflict
+            else:
+                resolved.merge(branch)
+            commit_resolved(base, resolved)
+
+        else:
+            branchset = base.branchset() | set(itervalues(base.dead_branches))
+            for branch in branchset:
+                if if_ in branch.literals:
+                    branch.todo.add(then)
+            expand_branchset(base)
+
+    def solve(self, added={}, removed={}):
+        """Applies a delta to initial values and solves the pgraph.
+
+        Both added and removed are mappings or sets of literals. An added
+        literal overrides its negation set before. Returns a solution in the
+        same form as the solve function does."""
+        added = to_lset(added)
+
+        self.initial_literals -= to_lset(removed)
+        self.initial_literals -= set(~literal for literal in added)
+        self.initial_literals |= added
+
+        logger.info('solving %r incrementally with initials: %r',
+                    self.pgraph, self.initial_literals)
+
+        trunk = self.trunk = self.prepare_base().copy()
+
+        resolved = Diff(trunk)
+        for literal in self.initial_literals:
+            if literal in trunk.literals:
+                continue
+
+            resolved.reasons.add(Reason(literal))
+
+            branch = trunk.branchmap.get(literal)
+            if branch is None:
+                resolved.add_literal(literal)  # ~literal is in trunk
+            else:
+                resolved.merge(branch)
+
+        commit_resolved(trunk, resolved)
+
+        resolve_branches(trunk)
+        stepwise_resolve(trunk)
+
+        ret = dict.fromkeys(self.pgraph.nodes)
+        ret.update(trunk.literals)
+        return ret
+
+
 def why_implied_by_dead_branch(literal, *cause_literals):
     return '%s because of dead branch %s' % (literal, ~literal)
 
@@ -0,0 +1,338 @@
+"""
+Solver benchmarks on synthetic pgraphs.
+
+Usage: python -m mybuild.test.bench_solver [-o FILE] [-e ENGINE]
+                                          [CASE[:SIZE,...]...]
+
+Each case builds a pgraph of the given size and solves it phase by phase
+timing create_trunk, collapse_branchset, expand_branchset, resolve_branches
+and stepwise_resolve separately. Peak memory is measured in a separate run,
+so that it does not affect timings: with tracemalloc if available, or as
+a growth of the maximum resident set size of a forked child otherwise
+(which is coarser, and None where neither is supported).
+ENGINE selects a trunk propagation engine (see solver.trunk_engines).
+Results are written as JSON.
+"""
+
+from _compat import *
+
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import mybuild
+from mybuild import pgraph
+from mybuild.profiling import max_rss
+from mybuild.profiling import resource
+from mybuild.solver import *
+
+
+class BenchPgraph(pgraph.Pgraph):
+    pass
+
+
+@BenchPgraph.node_type
+class BenchAtom(pgraph.Atom):
+
+    def __init__(self, index, prefer_false=False):
+        super(BenchAtom, self).__init__()
+        self.index = index
+
+        if prefer_false:
+            self[False].level = 1  # like modules, try not to select an atom
+
+    def __repr__(self):
+        return 'A%d' % self.index
+
+
+def new_atoms(g, n, prefer_false=False):
+    return [g.new_node(BenchAtom, index, prefer_false) for index in range(n)]
+
+
+#
+# Generators. Each one populates a given pgraph and returns initial values.
+#
+
+def gen_chain(g, size):
+    """A0 => A1 => ... => An, each atom is resolved stepwise"""
+    atoms = new_atoms(g, size, prefer_false=True)
+    for a, b in zip(atoms, atoms[1:]):
+        a[True] >> b[True]
+    return {}
+
+def gen_rings(g, size, nr_rings=10):
+    """Rings of mutually implied atoms of the given size, each ring implies
+    the next one"""
+    atoms = new_atoms(g, size * nr_rings, prefer_false=True)
+    rings = [atoms[i:i+size] for i in range(0, len(atoms), size)]
+    for ring in rings:
+        for a, b in zip(ring, ring[1:] + ring[:1]):
+            a[True] >> b[True]
+    for ring, next_ring in zip(rings, rings[1:]):
+        ring[-1][True] >> next_ring[0][True]
+    return {}
+
+def gen_fan_out(g, size):
+    """A root implying all of its leaves, while leaves exclude each other
+    in pairs"""
+    atoms = new_atoms(g, size + 1, prefer_false=True)
+    root, leaves = atoms[0], atoms[1:]
+    for leaf in leaves:
+        root[True] >> leaf[True]
+    for a, b in zip(leaves[0::2], leaves[1::2]):
+        g.new_node(pgraph.AtMostOne, (a, b))
+    return {g.new_node(pgraph.Or, (root, leaves[0])): True}
+
+def gen_at_most_one(g, size, nr_groups=10):
+    """Groups of AtMostOne of the given size, first atom of each is set"""
+    atoms = new_atoms(g, size * nr_groups, prefer_false=True)
+    initial = {}
+    for i in range(0, len(atoms), size):
+        group = atoms[i:i+size]
+        initial[g.new_node(pgraph.AtMostOne, group)] = True
+        initial[group[0]] = True
+    return initial
+
+def gen_wide_or(g, size, nr_clauses=100):
+    """Overlapping Or clauses over the given number of atoms, with most of
+    atoms set to false"""
+    atoms = new_atoms(g, size)
+    width = size // 10
+    step = max(1, (size - width) // nr_clauses)
+    initial = dict((g.new_node(pgraph.Or, atoms[i:i+width]), True)
+                   for i in range(0, size - width + 1, step))
+    for atom in atoms:
+        if atom.index % 50:
+            initial[atom] = False
+    return initial
+
+def gen_levels(g, size, seed=0):
+    """Atoms resolved stepwise one by one, each having its own level, with
+    sparse random implications between them"""
+    rnd = random.Random(seed)
+    atoms = new_atoms(g, size)
+    for atom in atoms:
+        atom[rnd.random() < 0.5].level = atom.index
+
+    for _ in range(size // 2):
+        if_, then = rnd.sample(atoms, 2)
+        if_[True] >> then[True]
+    return {}
+
+def gen_tree(g, size, arity=2):
+    """Alternating And/Or levels of the given depth"""
+    nodes = new_atoms(g, arity ** size)
+    for depth in range(size):
+        node_type = (pgraph.And, pgraph.Or)[depth % 2]
+        nodes = [g.new_node(node_type, nodes[i:i+arity])
+                 for i in range(0, len(nodes), arity)]
+    root, = nodes
+    return {root: True}
+
+def gen_random(g, size, seed=0):
+    """Random implications and Or clauses between random atoms, kept
+    satisfiable by making all atoms true"""
+    rnd = random.Random(seed)
+    atoms = new_atoms(g, size)
+
+    for _ in range(2 * size):
+        if_, then = rnd.sample(atoms, 2)
+        if rnd.random() < 0.8:
+            if_[True] >> then[True]
+        else:
+            if_[False] >> then[True]
+
+    initial = {}
+    for _ in range(size // 10):
+        initial[g.new_node(pgraph.Or, rnd.sample(atoms, 3))] = True
+    return initial
+
+
+CASES = [
+    ('chain',       gen_chain,       [1000, 3000]),
+    ('rings',       gen_rings,       [100, 300]),
+    ('fan_out',     gen_fan_out,     [1000, 3000]),
+    ('at_most_one', gen_at_most_one, [10, 50]),
+    ('wide_or',     gen_wide_or,     [3000, 10000]),
+    ('levels',      gen_levels,      [300, 1000]),
+    ('tree',        gen_tree,        [8, 12]),
+    ('random',      gen_random,      [300, 1000]),
+]
+
+PHASES = [
+    ('create_trunk',       create_trunk),
+    ('collapse_branchset', collapse_branchset),
+    ('expand_branchset',   expand_branchset),
+    ('resolve_branches',   resolve_branches),
+    ('stepwise_resolve',   stepwise_resolve),
+]
+
+
+def run_phases(g, initial_values, engine='sets', timer=time.time):
+    """Solves a pgraph phase by phase, returns a dict of phase timings and
+    the name of an error (if any)."""
+    timings = {}
+    error = None
+
+    trunk = None
+    for phase, func in PHASES:
+        start = timer()
+        try:
+            if trunk is None:
+                trunk = func(g, initial_values, engine)
+            else:
+                func(trunk)
+        except SolveError as e:
+            error = '{0} in {1}'.format(type(e).__name__, phase)
+            break
+        finally:
+            timings[phase] = timer() - start
+
+    return timings, error
+
+
+def measure_peak_memory(g, initial_values, engine='sets'):
+    """Returns peak memory allocated while solving a pgraph (in bytes), or
+    None if it can't be measured."""
+    gc.collect()
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            run_phases(g, initial_values, engine)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    if resource is None or not hasattr(os, 'fork'):
+        return None
+
+    # The maximum RSS never goes down, solve in a fresh child to get it
+    # for this run only.
+    rfd, wfd = os.pipe()
+    pid = os.fork()
+    if not pid:
+        try:
+            os.close(rfd)
+            start = max_rss()
+            run_phases(g, initial_values, engine)
+            os.write(wfd, str(max_rss() - start).encode('ascii'))
+        finally:
+            os._exit(0)
+
+    os.close(wfd)
+    try:
+        with os.fdopen(rfd, 'rb') as f:
+            output = f.read()
+    finally:
+        os.waitpid(pid, 0)
+
+    return int(output) if output else None
+
+
+def run_case(name, generator, size, repeat=1, engine='sets'):
+    def build():
+        g = BenchPgraph()
+        start = time.time()
+        initial_values = generator(g, size)
+        return g, initial_values, time.time() - start
+
+    result = dict(case=name, size=size)
+
+    best = None
+    for _ in range(repeat):
+        g, initial_values, build_time = build()
+        gc.collect()
+        timings, error = run_phases(g, initial_values, engine)
+        timings['build'] = build_time
+
+        if best is None:
+            best = timings
+        else:
+            for phase in best:
+                best[phase] = min(best[phase], timings.get(phase, best[phase]))
+
+    result.update(nr_nodes=len(g.nodes), phases=best, error=error,
+                  total=sum(best[phase] for phase, _ in PHASES
+                            if phase in best))
+
+    g, initial_values, _ = build()
+    result['peak_memory'] = measure_peak_memory(g, initial_values, engine)
+
+    return result
+
+
+def run(selected=None, repeat=1, report=None, engine='sets'):
+    """Runs benchmarks for selected cases: a list of (case name, sizes)
+    pairs, sizes may be None for defaults. Returns a JSON-ready dict."""
+    cases = dict((name, (generator, sizes))
+                 for name, generator, sizes in CASES)
+    if selected is None:
+        selected = [(name, None) for name, _, _ in CASES]
+
+    results = []
+    for name, sizes in selected:
+        generator, default_sizes = cases[name]
+        for size in sizes or default_sizes:
+            result = run_case(name, generator, size, repeat, engine)
+            if report is not None:
+                report(result)
+            results.append(result)
+
+    return dict(mybuild=mybuild.__version__,
+                python=platform.python_version(),
+                implementation=platform.python_implementation(),
+                engine=engine,
+                results=results)
+
+
+def parse_case(arg):
+    name, _, sizes = arg.partition(':')
+    return name, [int(size) for size in sizes.split(',') if size]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('cases', nargs='*', type=parse_case,
+                        metavar='CASE[:SIZE,...]',
+                        help='cases to run (default: all): ' +
+                             ', '.join(name for name, _, _ in CASES))
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='file to write JSON results to (default: stdout)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of runs to take the best timing of')
+    parser.add_argument('-e', '--engine', default='sets',
+                        choices=sorted(trunk_engines),
+                        help='trunk propagation engine (default: sets)')
+    args = parser.parse_args(argv)
+
+    def report(result):
+        sys.stderr.write('{case:>12} {size:>6}: {total:8.3f}s '
+                         '({nr_nodes} nodes){error}\n'
+                         .format(**dict(result, error=(
+                                 ', ' + result['error']
+                                 if result['error'] else ''))))
+
+    data = run(args.cases or None, args.repeat, report, args.engine)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    else:
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
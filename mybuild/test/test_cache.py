@@ -0,0 +1,80 @@
+from _compat import *
+
+import unittest
+import os
+import shutil
+import tempfile
+
+from mybuild.binding.pydsl import module
+from mybuild.cache import ResolveCache
+from mybuild.context import resolve
+
+
+@module
+def conf(self):
+    self._constrain(m1(foo=17))
+
+@module
+def m1(self, foo=42):
+    pass
+
+
+class ResolveCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ResolveCache(self.cache_dir)
+
+        self.source = os.path.join(self.cache_dir, 'Pybuild')
+        self.write_source('initial')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def write_source(self, contents):
+        with open(self.source, 'w') as f:
+            f.write(contents)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.load(conf))
+
+    def test_roundtrip(self):
+        self.cache.store(conf, resolve(conf), [self.source])
+
+        instance_map = self.cache.load(conf)
+
+        self.assertEqual(set([conf, m1]), set(instance_map))
+        self.assertEqual(17, instance_map[m1].foo)
+
+    def test_source_changed(self):
+        self.cache.store(conf, resolve(conf), [self.source])
+        self.write_source('changed')
+
+        self.assertIsNone(self.cache.load(conf))
+
+    def test_file_added(self):
+        self.cache.store(conf, resolve(conf), [self.source],
+                         [self.cache_dir], ['Pybuild'])
+
+        os.mkdir(os.path.join(self.cache_dir, 'other'))
+        with open(os.path.join(self.cache_dir, 'other', 'README'), 'w'):
+            pass  # not a module file
+        self.assertIsNotNone(self.cache.load(conf))
+
+        with open(os.path.join(self.cache_dir, 'other', 'Pybuild'), 'w'):
+            pass
+        self.assertIsNone(self.cache.load(conf))
+
+    def test_version_changed(self):
+        self.cache.store(conf, resolve(conf), [self.source])
+
+        self.assertIsNone(ResolveCache(self.cache_dir, 'other').load(conf))
+
+
+def suite():
+    import sys
+    return unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main()
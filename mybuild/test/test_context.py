@@ -0,0 +1,247 @@
+from _compat import *
+
+import json
+import unittest
+
+from mybuild.binding.pydsl import module
+from mybuild.binding.pydsl import option
+from mybuild.context import Context
+from mybuild.context import ContextPgraph
+from mybuild.context import ModuleAtom
+from mybuild.context import OptionValueAtom
+from mybuild.context import RemoteInstance
+from mybuild.context import resolve
+from mybuild.context import resolve_all
+from mybuild.core import InstanceError
+from mybuild.profiling import Profiler
+from mybuild.profiling import max_rss
+
+
+# Modules are defined at a module level to be found by worker processes,
+# names must differ from ones of sibling test modules.
+
+@module
+def parallel_conf(self):
+    self._constrain(parallel_m1(a=2))
+
+@module
+def parallel_m1(self, a=option(1, 2, 3)):
+    self._constrain(parallel_m2(b=a))
+
+@module
+def parallel_m2(self, b=option(1, 2, 3)):
+    if b == 1:
+        raise InstanceError('b == 1')
+
+@module
+def parallel_conf3(self):
+    self._constrain(parallel_m1(a=3))
+
+@module
+def parallel_conf_any(self):
+    self._constrain(parallel_m2)
+
+
+class ParallelContextTestCase(unittest.TestCase):
+
+    def test_same_as_serial(self):
+        serial = resolve(parallel_conf)
+        parallel = resolve(parallel_conf, workers=2)
+
+        self.assertEqual(set(serial), set(parallel))
+        for module_type, instance in iteritems(parallel):
+            self.assertIsInstance(instance, module_type)
+            self.assertEqual(serial[module_type]._optuple, instance._optuple)
+
+    def test_remote_instances(self):
+        context = Context(workers=2)
+        context.resolve(parallel_conf)
+
+        instances = context._instances
+        self.assertIsInstance(instances[parallel_m2(b=1)], InstanceError)
+        self.assertIsInstance(instances[parallel_m2(b=3)], RemoteInstance)
+
+    def test_local_modules(self):
+        @module
+        def local_conf(self):
+            self._constrain(local_m1)
+
+        @module
+        def local_m1(self):
+            pass
+
+        modules = resolve(local_conf, workers=2)
+
+        self.assertIn(local_m1, modules)
+
+
+class ResolveAllTestCase(unittest.TestCase):
+
+    confs = [parallel_conf, parallel_conf3, parallel_conf_any]
+
+    def assertSameAsResolve(self, instance_maps, **kwargs):
+        self.assertEqual(set(self.confs), set(instance_maps))
+
+        for conf in self.confs:
+            expected = resolve(conf, **kwargs)
+            instance_map = instance_maps[conf]
+
+            self.assertEqual(set(expected), set(instance_map))
+            for module_type, instance in iteritems(instance_map):
+                self.assertIsInstance(instance, module_type)
+                self.assertEqual(expected[module_type]._optuple,
+                                 instance._optuple)
+
+    def test_serial(self):
+        self.assertSameAsResolve(resolve_all(self.confs))
+
+    def test_parallel(self):
+        self.assertSameAsResolve(resolve_all(self.confs, workers=2))
+
+    def test_lazy(self):
+        self.assertSameAsResolve(resolve_all(self.confs, lazy=True),
+                                 lazy=True)
+
+    def test_single_pgraph(self):
+        context = Context()
+        context.resolve_all(self.confs)
+        nr_nodes = len(context.pgraph.nodes)
+
+        for conf in self.confs:
+            self.assertIn(context.pgraph.node_for(conf), context.pgraph.nodes)
+        self.assertEqual(nr_nodes, len(context.pgraph.nodes))
+
+
+class PostedIndexTestCase(unittest.TestCase):
+
+    def instantiated_optuples(self, **kwargs):
+        profiler = Profiler()
+        context = Context(profiler=profiler, **kwargs)
+        context.resolve(parallel_conf)
+        return context, [phase.args['optuple'] for phase in profiler.phases
+                         if phase.cat == 'instantiate']
+
+    def test_no_duplicates(self):
+        for lazy in (False, True):
+            context, optuples = self.instantiated_optuples(lazy=lazy)
+            self.assertEqual(len(set(optuples)), len(optuples))
+
+    def test_candidate_counts(self):
+        context, optuples = self.instantiated_optuples()
+        counts = context.candidate_counts()
+
+        self.assertEqual(1, counts[parallel_conf])
+        self.assertEqual(3, counts[parallel_m1])
+        self.assertEqual(3, counts[parallel_m2])
+        self.assertEqual(len(optuples), sum(itervalues(counts)))
+
+
+class ContextPgraphTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pgraph = ContextPgraph(Context())
+
+    def test_atom_for(self):
+        g = self.pgraph
+
+        atom = g.atom_for(parallel_m1, 'a', 2)
+        self.assertIs(atom, g.atom_for(parallel_m1, 'a', 2))
+        self.assertIs(atom, g.new_node(OptionValueAtom, parallel_m1, 'a', 2))
+        self.assertIsNot(atom, g.atom_for(parallel_m1, 'a', 3))
+        self.assertIs(g.atom_for(parallel_m1),
+                      g.new_node(ModuleAtom, parallel_m1))
+
+    def test_node_for(self):
+        g = self.pgraph
+
+        node = g.node_for(parallel_m1(a=2))
+        self.assertIs(node, g.node_for(parallel_m1(a=2)))
+        self.assertIs(node, g.atom_for(parallel_m1, 'a', 2))
+        self.assertIs(g.node_for(parallel_conf), g.atom_for(parallel_conf))
+        self.assertIn(node, g.nodes)
+
+
+class ProfilerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = Profiler(trace_memory=True)
+        self.traced_memory = self.profiler.trace_memory  # reset by stop()
+        self.traced_rss = self.profiler.trace_rss
+        resolve(parallel_conf, profiler=self.profiler)
+        self.profiler.stop()
+
+    def test_phases(self):
+        names = set(phase.name for phase in self.profiler.phases)
+
+        for name in ['resolve', 'discover_all', 'init_pgraph', 'solve',
+                     'create_trunk', 'expand_branchset', 'resolve_branches',
+                     'stepwise_resolve']:
+            self.assertIn(name, names)
+
+        for phase in self.profiler.phases:
+            self.assertGreaterEqual(phase.duration, 0)
+            if self.traced_memory:
+                self.assertIn('memory_peak', phase.args)
+            if self.traced_rss:
+                self.assertGreaterEqual(phase.args['max_rss_delta'], 0)
+
+    def test_nested_memory_peak(self):
+        profiler = Profiler(trace_memory=True)
+        if not profiler.trace_memory:
+            self.skipTest('tracemalloc is not available')
+        try:
+            with profiler.phase('outer') as outer:
+                with profiler.phase('inner') as inner:
+                    buf = bytearray(1 << 20)
+                    del buf
+                with profiler.phase('after'):
+                    pass
+        finally:
+            profiler.stop()
+
+        self.assertGreaterEqual(inner.args['memory_peak'], 1 << 20)
+        self.assertGreaterEqual(outer.args['memory_peak'],
+                                inner.args['memory_peak'])
+
+    def test_max_rss_delta(self):
+        profiler = Profiler(trace_memory=True)
+        if not profiler.trace_rss:
+            self.skipTest('memory is traced by tracemalloc or not at all')
+        try:
+            with profiler.phase('outer') as outer:
+                with profiler.phase('inner') as inner:
+                    buf = bytearray(max_rss())  # surely a new peak
+                    del buf
+        finally:
+            profiler.stop()
+
+        self.assertGreater(inner.args['max_rss_delta'], 0)
+        self.assertGreaterEqual(outer.args['max_rss_delta'],
+                                inner.args['max_rss_delta'])
+
+    def test_module_instantiation(self):
+        instantiated = [phase for phase in self.profiler.phases
+                        if phase.cat == 'instantiate']
+
+        self.assertEqual(set(module._fullname for module in
+                             [parallel_conf, parallel_m1, parallel_m2]),
+                         set(phase.name for phase in instantiated))
+        self.assertTrue(any(phase.args.get('inviable')
+                            for phase in instantiated))
+
+    def test_export(self):
+        report = json.loads(json.dumps(self.profiler.to_json()))
+        self.assertTrue(report['summary'])
+
+        trace = json.loads(json.dumps(self.profiler.to_chrome_trace()))
+        for event in trace['traceEvents']:
+            self.assertIn(event['ph'], ('X', 'C'))
+
+
+def suite():
+    import sys
+    return unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+from _compat import *
+
+import unittest
+import json
+
+from mybuild import pgraph
+from mybuild.pgraph import Reason
+from mybuild.report import *
+from mybuild.solver import *
+from mybuild.test.test_solver import SolverTestCaseBase
+
+
+class Output(list):
+    """Text file object collecting what is written."""
+
+    def write(self, s):
+        self.append(s)
+
+    def lines(self):
+        return ''.join(self).splitlines()
+
+
+class ErrorReportTestCase(SolverTestCaseBase):
+
+    def solve_error(self, initial_values):
+        with self.assertRaises(SolveError) as cm:
+            solve(self.pgraph, initial_values)
+        return cm.exception
+
+    def dead_branches_error(self):
+        g = self.pgraph
+        A,B,C,X,Y = self.atoms('ABCXY')
+
+        X[True] >> B[True]
+        X[True] >> C[True]
+        Y[True] >> A[True]
+        Y[True] >> C[True]
+        g.AtMostOne(A, B, C)
+
+        return self.solve_error({g.Or(X, Y): True})
+
+    def test_violation(self):
+        A,B = self.atoms('AB')
+        A[True] >> B[False]
+
+        records = list(ErrorReport(self.solve_error({A: True, B: True})))
+
+        self.assertTrue(records)
+        self.assertEqual(set(['reason']),
+                         set(record.kind for record in records))
+        self.assertIn(repr(Reason(B[False], [A[True]])),
+                      [record.text for record in records])
+
+    def test_prefix_literals(self):
+        g = self.pgraph
+        A,B,C,D = self.atoms('ABCD')
+
+        def why(outcome, *causes):
+            return '%s: %s is already set' % (outcome, causes)
+        g.AtMostOne(A, B, C, D,
+                    why_one_operand_zero_implies_others_identity=why)
+
+        records = list(ErrorReport(self.solve_error({A: True, D: True})))
+        reasons = [record for record in records if record.kind == 'reason']
+
+        for record in reasons:
+            self.assertNotIsInstance(getattr(record.literal, 'node', None),
+                                     pgraph.PrefixNode)
+            self.assertNotIn('prefix', record.text)
+        self.assertTrue(set([why(D[False], A[True]),
+                             why(A[False], D[True])]) &
+                        set(record.text for record in reasons))
+
+    def test_dead_branches(self):
+        records = list(ErrorReport(self.dead_branches_error()))
+        kinds = [record.kind for record in records]
+
+        self.assertIn('branch', kinds)
+        self.assertEqual(kinds.count('branch'), kinds.count('end'))
+
+        # Each literal is explained once.
+        literals = [record.literal for record in records
+                    if record.kind == 'reason' and record.literal is not None]
+        self.assertEqual(len(set(literals)), len(literals))
+
+    def test_limits(self):
+        error = self.dead_branches_error()
+
+        records = list(ErrorReport(error, max_depth=0))
+        self.assertNotIn('branch', [record.kind for record in records])
+        self.assertIn('truncated', [record.kind for record in records])
+        self.assertEqual(set([0]), set(record.depth for record in records))
+
+        records = list(ErrorReport(error, max_reasons=1))
+        self.assertEqual(1, len([record for record in records
+                                 if record.kind == 'reason' and
+                                    record.depth == 0]))
+        self.assertEqual('truncated', records[-1].kind)
+
+    def test_dump(self):
+        report = ErrorReport(self.dead_branches_error())
+        records = list(report)
+
+        f = Output()
+        report.dump_text(f)
+        self.assertEqual([str(record) for record in records], f.lines())
+
+        f = Output()
+        report.dump_json(f)
+        self.assertEqual([record.to_dict() for record in records],
+                         [json.loads(line) for line in f.lines()])
+
+
+def suite():
+    import sys
+    return unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main()
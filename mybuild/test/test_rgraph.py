@@ -0,0 +1,161 @@
+from _compat import *
+
+import unittest
+
+from mybuild.rgraph import *
+from mybuild.solver import *
+from mybuild.test.test_solver import SolverTestCaseBase
+
+
+class ErrorRgraphTestCase(SolverTestCaseBase):
+    """Test cases for explanation of solver errors."""
+
+    def solve_error(self, initial_values):
+        with self.assertRaises(SolveError) as cm:
+            solve(self.pgraph, initial_values)
+        return cm.exception
+
+    def test_violation(self):
+        g = self.pgraph
+        A,B,C,D,E = self.atoms('ABCDE')
+
+        A[True] >> B[True]
+        D[True] >> E[True]  # unrelated to the violation
+        g.AtMostOne(B, C)
+
+        rgraph = get_error_rgraph(self.solve_error({A: True, C: True,
+                                                    D: True}))
+        reasons = [reason for reason, shift
+                   in traverse_error_rgraph(rgraph)]
+
+        self.assertIn(Reason(B[True], [A[True]]), reasons)
+        self.assertIn(A[True], rgraph.nodes)
+        self.assertIn(C[True], rgraph.nodes)
+        self.assertNotIn(D[True], rgraph.nodes)
+        self.assertNotIn(E[True], rgraph.nodes)
+
+        self.assertEqual(0, rgraph.nodes[A[True]].length)
+        self.assertEqual(1, rgraph.nodes[B[True]].length)
+
+    def test_shortest_path(self):
+        g = self.pgraph
+        A,B,C,D = self.atoms('ABCD')
+
+        A[True] >> B[True] >> C[True] >> D[False]
+        A[True] >> D[False]
+
+        rgraph = get_error_rgraph(self.solve_error({A: True, D: True}))
+
+        self.assertEqual(1, rgraph.nodes[D[False]].length)
+        self.assertNotIn(C[True], rgraph.nodes)
+
+    def test_full_rgraph(self):
+        g = self.pgraph
+        A,B,C,D = self.atoms('ABCD')
+
+        A[True] >> B[True] >> C[True] >> D[False]
+        A[True] >> D[False]
+
+        error = self.solve_error({A: True, D: True})
+        rgraph = get_error_rgraph(error, is_short=False)
+        nodes = rgraph.nodes
+
+        self.assertEqual(0, nodes[A[True]].length)
+        self.assertIs(nodes[A[True]], nodes[A[True]].parent)
+        self.assertEqual(1, nodes[D[False]].length)
+        self.assertEqual(2, nodes[C[True]].length)
+        self.assertIs(nodes[B[True]].container(), nodes[C[True]].parent)
+        self.assertEqual(2, nodes[C[True]].container().length)
+
+        shortened = shorten_error_rgraph(rgraph,
+                                         list(get_violation_nodes(error.trunk)))
+        self.assertTrue(list(traverse_error_rgraph(shortened)))
+
+    def test_lazy_dead_branches(self):
+        g = self.pgraph
+        A,B,C,X,Y = self.atoms('ABCXY')
+
+        X[True] >> B[True]
+        X[True] >> C[True]
+        Y[True] >> A[True]
+        Y[True] >> C[True]
+        g.AtMostOne(A, B, C)
+        N = g.Or(X, Y)
+
+        error = self.solve_error({N: True})
+        rgraph = get_error_rgraph(error)
+        violation_graphs = rgraph.violation_graphs
+
+        self.assertIn(X[True], violation_graphs)
+        self.assertEqual(0, len(violation_graphs))  # nothing is built yet
+
+        rgraph_branch = violation_graphs[X[True]]
+        self.assertIs(rgraph_branch, violation_graphs[X[True]])
+        self.assertIs(violation_graphs, rgraph_branch.violation_graphs)
+        self.assertEqual(1, len(violation_graphs))
+
+        dead_branches = error.trunk.dead_branches
+        for literal, branch in iteritems(dead_branches):
+            if branch.valid:
+                self.assertNotIn(literal, violation_graphs)
+            elif branch.gen_literals == dead_branches[X[True]].gen_literals:
+                self.assertIs(rgraph_branch, violation_graphs[literal])
+
+        self.assertTrue(list(traverse_error_rgraph(rgraph_branch)))
+
+    def test_full_dead_branches(self):
+        g = self.pgraph
+        A,B,C,X,Y = self.atoms('ABCXY')
+
+        X[True] >> B[True]
+        X[True] >> C[True]
+        Y[True] >> A[True]
+        Y[True] >> C[True]
+        g.AtMostOne(A, B, C)
+        N = g.Or(X, Y)
+
+        error = self.solve_error({N: True})
+        rgraph = get_error_rgraph(error, is_short=False)
+        violation_graphs = rgraph.violation_graphs
+
+        rgraph_branch = violation_graphs[X[True]]
+        self.assertIs(violation_graphs, rgraph_branch.violation_graphs)
+        self.assertEqual(0, rgraph_branch.nodes[X[True]].length)
+        self.assertLess(rgraph_branch.nodes[B[True]].length, float('+inf'))
+
+        for literal, branch in iteritems(error.trunk.dead_branches):
+            self.assertEqual(not branch.valid, literal in violation_graphs)
+
+
+class ShortestHyperpathsTestCase(unittest.TestCase):
+
+    def test_hyperpaths(self):
+        lengths, labels = find_shortest_hyperpaths([
+            (set(),           'ab', 'ab'),
+            (set('a'),        'c',  'a->c'),
+            (set('ab'),       'd',  'ab->d'),
+            (set('c'),        'd',  'c->d'),
+            (set('cd'),       'e',  'cd->e'),
+            (set('x'),        'e',  'x->e'),
+        ])
+
+        self.assertEqual(dict(a=0, b=0, c=1, d=1, e=3), lengths)
+        self.assertEqual('ab->d', labels['d'])
+        self.assertEqual('cd->e', labels['e'])
+
+    def test_unreachable(self):
+        lengths, labels = find_shortest_hyperpaths([
+            (set(),     'a', None),
+            (set('ax'), 'b', None),
+        ])
+
+        self.assertEqual(dict(a=0), lengths)
+
+
+def suite():
+    import sys
+    return unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main()
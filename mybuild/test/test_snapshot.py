@@ -0,0 +1,137 @@
+from _compat import *
+
+import unittest
+import io
+import os
+import shutil
+import tempfile
+
+from mybuild import pgraph
+from mybuild.binding.pydsl import module
+from mybuild.binding.pydsl import option
+from mybuild.cache import optuple_descriptor
+from mybuild.context import Context
+from mybuild.core import InstanceError
+from mybuild.snapshot import *
+from mybuild.solver import *
+from mybuild.test import bench_solver
+
+
+@module
+def snapshot_conf(self):
+    self._constrain(snapshot_m1(a=2))
+
+@module
+def snapshot_m1(self, a=option(1, 2, 3)):
+    self._constrain(snapshot_m2(b=a))
+
+@module
+def snapshot_m2(self, b=option(1, 2, 3)):
+    if b == 1:
+        raise InstanceError('b == 1')
+
+
+def ids_of(solution):
+    return sorted((node.id, value) for node, value in iteritems(solution))
+
+def solve_ids(g, initial_values):
+    try:
+        return ids_of(solve(g, initial_values))
+    except SolveError:
+        return None
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def reload(self, g):
+        path = os.path.join(self.tmp_dir, 'pgraph')
+        with open(path, 'wb') as f:
+            dump_pgraph(g, f)
+        with open(path, 'rb') as f:
+            return load_pgraph(f)
+
+    def test_roundtrip(self):
+        g = bench_solver.BenchPgraph()
+        A,B,C,D = bench_solver.new_atoms(g, 4, prefer_false=True)
+        A[True] >> B[True]
+        N = g.new_node(pgraph.AtMostOne, (B, C, D))
+
+        loaded = self.reload(g)
+
+        self.assertEqual(len(g.nodes), len(loaded.nodes))
+        for node, loaded_node in zip(g.nodes, loaded.nodes):
+            self.assertEqual(repr(node), repr(loaded_node))
+            self.assertEqual(isinstance(node, pgraph.Atom),
+                             isinstance(loaded_node, pgraph.Atom))
+            for literal, loaded_literal in zip(node, loaded_node):
+                self.assertEqual(literal.level, loaded_literal.level)
+                self.assertEqual(set(implied.id
+                                     for implied in literal.implies),
+                                 set(implied.id
+                                     for implied in loaded_literal.implies))
+                self.assertEqual(len(literal.neglasts),
+                                 len(loaded_literal.neglasts))
+
+        solution = solve(g, {N: True, A: True})
+        loaded_solution = solve(loaded, {loaded.node_at(N.id): True,
+                                         loaded.node_at(A.id): True})
+        self.assertEqual(ids_of(solution), ids_of(loaded_solution))
+
+    def test_bench_generators(self):
+        for name, generator, _ in bench_solver.CASES:
+            g = bench_solver.BenchPgraph()
+            initial_values = generator(g, 5)
+
+            loaded = self.reload(g)
+            loaded_initial_values = dict((loaded.node_at(node.id), value)
+                    for node, value in iteritems(initial_values))
+
+            self.assertEqual(solve_ids(g, initial_values),
+                             solve_ids(loaded, loaded_initial_values), name)
+
+    def test_context_pgraph(self):
+        context = Context()
+        solution = context.resolve_optuple(snapshot_conf())
+        g = context.pgraph
+
+        loaded = self.reload(g)
+        root = loaded.node_for_descriptor(
+                optuple_descriptor(snapshot_conf()))
+        self.assertIsNotNone(root)
+
+        self.assertEqual(ids_of(solution), ids_of(solve(loaded, {root: True})))
+
+        node = loaded.node_for_descriptor(
+                optuple_descriptor(snapshot_m1(a=2)))
+        self.assertIs(node, loaded.node_at(g.node_for(snapshot_m1(a=2)).id))
+
+        # Why functions are restored to be used for explanation.
+        original_node = g.node_for(snapshot_m1(a=2))
+        self.assertEqual(set(map(repr, original_node[True].imply_reasons)),
+                         set(map(repr, node[True].imply_reasons)))
+
+    def test_malformed(self):
+        with self.assertRaises(SnapshotError):
+            load_pgraph(io.BytesIO(b''))
+        with self.assertRaises(SnapshotError):
+            load_pgraph(io.BytesIO(b'not a snapshot' * 100))
+
+        f = io.BytesIO()
+        dump_pgraph(bench_solver.BenchPgraph(), f)
+        with self.assertRaises(SnapshotError):
+            load_pgraph(io.BytesIO(f.getvalue()[:-1]))
+
+
+def suite():
+    import sys
+    return unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,12 @@ from _compat import *
 
 import unittest
 import functools
+import logging
+import operator
+import random
+
+import util
+from util import bitset
 
 from mybuild import pgraph
 from mybuild.solver import *
@@ -69,6 +75,159 @@ class SolverTestCaseBase(unittest.TestCase):
         return [self.pgraph.NamedAtom(name=name) for name in names]
 
 
+class IndexedStoreTestCase(SolverTestCaseBase):
+    """Test cases for integer ids of nodes/literals and sets backed by them."""
+
+    def test_literal_ids(self):
+        g = self.pgraph
+        A,B = self.atoms('AB')
+
+        self.assertNotEqual(A.id, B.id)
+        for node in (A, B):
+            for literal in node:
+                self.assertEqual(node.id*2 + literal.value, literal.id)
+                self.assertIs(literal, g.literal_at(literal.id))
+            self.assertIs(node, g.node_at(node.id))
+
+    def test_node_list(self):
+        g = self.pgraph
+        A,B = self.atoms('AB')
+
+        nodes = g.nodes
+        self.assertEqual([A, B], list(nodes)[-2:])
+        self.assertIn(A, nodes)
+        self.assertNotIn(A[True], nodes)
+        self.assertNotIn(TestPgraph().new_node(NamedAtom, name='A'), nodes)
+
+        N = g.Or(A, B)
+        self.assertIs(nodes, g.nodes)
+        self.assertIs(N, nodes[N.id])
+        self.assertEqual(len(set(nodes)), len(nodes))
+
+    def test_node_index(self):
+        g = self.pgraph
+        A,B = self.atoms('AB')
+
+        self.assertIs(g.Or(A, B), g.Or(B, A))
+        self.assertIsNot(g.Or(A, B), g.And(A, B))
+        self.assertIs(A, g.NamedAtom(name='A'))
+        self.assertIsNot(A, g.NamedAtom(name='B'))
+
+    def test_implication_table(self):
+        g = self.pgraph
+        A,B,C = self.atoms('ABC')
+
+        A[True] >> B[True] >> C[False]
+        table = g.implication_table
+
+        self.assertEqual(set([B[True].id]),
+                         set(table.implied_ids(A[True].id)))
+        self.assertEqual(set([A[False].id]),
+                         set(table.implied_ids(B[False].id)))
+
+        A[True] >> C[False]
+        self.assertIsNot(table, g.implication_table)
+        self.assertEqual(set([B[True].id, C[False].id]),
+                         set(g.implication_table.implied_ids(A[True].id)))
+
+    def test_strong_components(self):
+        g = self.pgraph
+        A,B,C,D = self.atoms('ABCD')
+
+        A[True] >> B[True] >> C[True] >> A[True]
+        C[True] >> D[True]
+        table = g.implication_table
+
+        def components_of(mask):
+            return set(frozenset(map(g.literal_at, component))
+                       for component in table.strong_components(mask))
+
+        mask = bytearray([1]) * len(table)
+        self.assertEqual(set(frozenset(node[value] for node in (A, B, C))
+                             for value in (False, True)),
+                         components_of(mask))
+
+        mask[B[True].id] = 0
+        self.assertEqual(set([frozenset([A[False], B[False], C[False]])]),
+                         components_of(mask))
+
+    def test_literal_set(self):
+        A,B,C = self.atoms('ABC')
+
+        s = pgraph.LiteralSet([A[True], B[False]])
+        self.assertIn(A[True], s)
+        self.assertNotIn(A[False], s)
+        self.assertEqual(set([A[True], B[False]]), set(s))
+
+        s |= pgraph.LiteralSet([C[True]])
+        self.assertEqual(3, len(s))
+        s -= pgraph.LiteralSet([A[True], B[False]])
+        self.assertEqual([C[True]], list(s))
+
+        self.assertTrue(s.isdisjoint(pgraph.LiteralSet([C[False]])))
+        self.assertFalse(s.isdisjoint(pgraph.LiteralSet([C[True]])))
+        self.assertTrue(s.issuperset([C[True]]))
+        self.assertEqual(pgraph.LiteralSet([C[True]]), s)
+
+
+    def test_chunked_bitset(self):
+        rnd = random.Random(0)
+        size = 3 * bitset.CHUNK_BITS
+
+        for _ in range(200):
+            a, b = (set(rnd.sample(range(size), rnd.randint(0, 20)))
+                    for _ in range(2))
+            sa, sb = bitset.ChunkedBitSet(a), bitset.ChunkedBitSet(b)
+
+            self.assertEqual(a | b, set(sa | sb))
+            self.assertEqual(a & b, set(sa & sb))
+            self.assertEqual(a - b, set(sa - sb))
+            self.assertEqual(a ^ b, set(sa ^ sb))
+            self.assertEqual(a.isdisjoint(b), sa.isdisjoint(sb))
+            self.assertEqual(a >= b, sa >= sb)
+            self.assertEqual(a == b, sa == sb)
+
+            sa -= sb
+            sa |= sb
+            self.assertEqual(a | b, set(sa))
+            self.assertEqual(len(a | b), len(sa))
+
+    def test_chunked_bitset_len(self):
+        rnd = random.Random(0)
+        size = 3 * bitset.CHUNK_BITS
+
+        s, expected = bitset.ChunkedBitSet(), set()
+        for _ in range(200):
+            other = set(rnd.sample(range(size), rnd.randint(0, 20)))
+            op = rnd.choice([operator.ior, operator.isub,
+                             operator.iand, operator.ixor])
+            s = op(s, bitset.ChunkedBitSet(other))
+            expected = op(expected, other)
+
+            item = rnd.randrange(size)
+            s.add(item)
+            expected.add(item)
+
+            self.assertEqual(len(expected), len(s))
+            self.assertEqual(len(expected), len(s.copy()))
+
+    def test_literal_set_sharing(self):
+        A,B = self.atoms('AB')
+        far = self.atoms(['Z%d' % i for i in range(bitset.CHUNK_BITS)])[-1]
+
+        s = pgraph.LiteralSet([A[True], far[True]])
+        t = pgraph.LiteralSet() | s
+        self.assertEqual(s._bits, t._bits)
+        self.assertTrue(all(map(operator.is_, s._bits, t._bits)))
+
+        t.add(B[True])
+        t -= pgraph.LiteralSet([A[False]])  # no-op, keeps chunks shared
+        self.assertIs(s._bits[-1], t._bits[-1])
+
+        t -= pgraph.LiteralSet([far[True]])
+        self.assertEqual(1, len(t._bits))  # zero chunks are trimmed
+
+
 class TrunkTestCase(SolverTestCaseBase):
     """Test cases which do not involve branching."""
 
@@ -177,6 +336,128 @@ class TrunkTestCase(SolverTestCaseBase):
         with self.assertRaises(SolveError):
             solve(g, {A: True, B: True})
 
+    def test_at_most_one_linear(self):
+        g = self.pgraph
+        atoms = self.atoms('ABCDEFGHIJ')
+
+        N = g.AtMostOne(*atoms)
+        nr_implications = sum(len(literal.implies)
+                              for node in g.nodes for literal in node)
+        self.assertLess(nr_implications, 10 * len(atoms))
+
+        for atom in atoms:
+            solution = solve(g, {N: True, atom: True})
+
+            for other in atoms:
+                self.assertIs(other is atom, solution[other])
+
+
+class TrunkEngineTestCase(SolverTestCaseBase):
+    """Both trunk propagation engines must agree."""
+
+    def assertEnginesAgree(self, g, initial_values):
+        solutions = []
+        for engine in sorted(trunk_engines):
+            try:
+                solutions.append(solve(g, initial_values, engine=engine))
+            except SolveError as e:
+                solutions.append(type(e))
+        for solution in solutions[1:]:
+            self.assertEqual(solutions[0], solution)
+
+    def test_neglast(self):
+        g = self.pgraph
+        A,B,C,D = self.atoms('ABCD')
+
+        N = g.AllEqual(A,B,C)
+        A[True] >> D[False]
+
+        self.assertEnginesAgree(g, {N: True, D: True})
+        self.assertEnginesAgree(g, {N: True, B: True})
+
+    def test_violation(self):
+        g = self.pgraph
+        A,B,C = self.atoms('ABC')
+
+        N = g.AtMostOne(A,B,C)
+        with self.assertRaises(SolveError):
+            solve(g, {N: True, A: True, C: True}, engine='watched')
+
+    def test_bench_generators(self):
+        from mybuild.test import bench_solver
+
+        for name, generator, _ in bench_solver.CASES:
+            g = bench_solver.BenchPgraph()
+            self.assertEnginesAgree(g, generator(g, 5))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            create_trunk(self.pgraph, engine='unknown')
+
+
+class ReasonTestCase(SolverTestCaseBase):
+    """Reasons are stored in a compact form and materialized on demand."""
+
+    def test_imply_reasons(self):
+        A,B,C = self.atoms('ABC')
+
+        def why(outcome, *causes):
+            return 'because'
+
+        A[True] >> B[True]
+        B[True].therefore(C[True], why)
+
+        self.assertEqual(set([pgraph.Reason(B[True], [A[True]])]),
+                         A[True].imply_reasons)
+        self.assertEqual(set([pgraph.Reason(C[True], [B[True]], why)]),
+                         B[True].imply_reasons)
+        self.assertEqual(set([pgraph.Reason(A[False], [B[False]])]),
+                         B[False].imply_reasons)
+
+    def test_interning(self):
+        A,B = self.atoms('AB')
+
+        A[True] >> B[True]
+
+        self.assertIs(pgraph.Reason(B[True], [A[True]]),
+                      pgraph.Reason(B[True], (A[True],)))
+        reason, = A[True].imply_reasons
+        self.assertIs(reason, next(iter(A[True].imply_reasons)))
+        self.assertIsNot(reason, pgraph.Reason(B[True], [A[True]],
+                                               follow=True))
+
+    def test_empty_containers_shared(self):
+        A,B = self.atoms('AB')
+
+        A[True] >> B[True]
+
+        self.assertIs(B[True].implies, B[False].neglasts)
+        self.assertIsNone(A[True].imply_whys)
+        self.assertEqual(set([B[True]]), A[True].implies)
+        self.assertFalse(B[True].implies)
+
+    def test_neglast_reasons(self):
+        g = self.pgraph
+        A,B,C = self.atoms('ABC')
+
+        N = g.AtMostOne(A,B,C)
+        with self.assertRaises(SolveError) as cm:
+            solve(g, {N: True, A: True, B: True})
+        trunk = cm.exception.trunk
+
+        self.assertTrue(any(isinstance(reason, pgraph.NeglastReason)
+                            for reason in trunk.reasons))
+
+        for reason in trunk.iter_reasons():
+            self.assertIsInstance(reason, pgraph.Reason)
+
+        for reason in trunk.reasons:
+            if isinstance(reason, pgraph.NeglastReason):
+                neglast = reason.neglast
+                self.assertEqual(
+                        neglast.neg_reason_for(reason.last_literal)[1],
+                        reason.materialize())
+
 
 class BranchTestCase(SolverTestCaseBase):
 
@@ -292,6 +573,79 @@ class BranchTestCase(SolverTestCaseBase):
         for node in (pair_ands + atoms):
             self.assertIs(True, solution[node], "{0} is not True".format(node))
 
+    def test_collapse_branchset(self):
+        g = self.pgraph
+        A, B, C, D = self.atoms('ABCD')
+
+        A[True] >> B[True] >> C[True] >> A[True]
+        C[True] >> D[True]
+
+        trunk = create_trunk(g, {g.Or(A, D): True})
+        collapse_branchset(trunk)
+
+        for value in (False, True):
+            branch = trunk.branchmap[A[value]]
+            self.assertIs(branch, trunk.branchmap[B[value]])
+            self.assertIs(branch, trunk.branchmap[C[value]])
+            self.assertIsNot(branch, trunk.branchmap[D[value]])
+            self.assertEqual(set(node[value] for node in (A, B, C)),
+                             branch.gen_literals)
+
+        expand_branchset(trunk)
+        self.assertIn(D[True], trunk.branchmap[A[True]].literals)
+
+        solution = solve(g, {g.Or(A, D): True})
+        self.assertEqual(solution[A], solution[C])
+
+    def test_touched_branches(self):
+        g = self.pgraph
+        A, B, C, D = self.atoms('ABCD')
+
+        A[True] >> B[True]
+        N = g.And(C, D)
+
+        trunk = create_trunk(g)
+        expand_branchset(trunk)
+
+        resolved = Diff(trunk)
+        resolved.merge(trunk.branchmap[D[True]])
+        touched = commit_resolved(trunk, resolved)
+
+        c_branch = trunk.branchmap[C[True]]
+        self.assertIn(c_branch, touched)
+        self.assertIn(N[True], c_branch.literals)  # the last in the neglast
+
+        for literal in (A[True], A[False], B[True], B[False]):
+            self.assertNotIn(trunk.branchmap[literal], touched)
+
+    def test_copy_branch_index(self):
+        g = self.pgraph
+        A, B, C, D = self.atoms('ABCD')
+
+        A[True] >> B[True]
+        N = g.And(C, D)
+
+        trunk = create_trunk(g)
+        expand_branchset(trunk)
+
+        copy = trunk.copy()
+        self.assertIsNot(None, trunk.branch_index)
+        branches = copy.branchset()
+        for block_branches in itervalues(copy.branch_index):
+            self.assertTrue(block_branches <= branches)
+
+        resolved = Diff(copy)
+        resolved.merge(copy.branchmap[D[True]])
+        touched = commit_resolved(copy, resolved)
+
+        self.assertIn(copy.branchmap[C[True]], touched)
+        for literal in (A[True], A[False], B[True], B[False]):
+            self.assertNotIn(copy.branchmap[literal], touched)
+
+        # the original is not affected
+        self.assertIn(D[True], trunk.branchmap)
+        self.assertNotIn(N[True], trunk.branchmap[C[True]].literals)
+
     def test_trunk_base(self):
         g = self.pgraph
 
@@ -306,6 +660,175 @@ class BranchTestCase(SolverTestCaseBase):
         self.assertEqual(ComparableSolution(initial_trunk.base),
                          ComparableSolution(solved_trunk.base))
 
+    def test_trunk_revision(self):
+        g = self.pgraph
+
+        P, pair_ands, atoms = self.sneaky_chain()
+
+        trunk = solve_trunk(g, {P: True})
+        self.assertTrue(trunk.rev)
+
+        expected = Solution(trunk.base)
+        for rev, diff in enumerate(trunk.commits, 1):
+            expected |= diff
+            self.assertEqual(ComparableSolution(expected),
+                             ComparableSolution(trunk.revision(rev)))
+
+        self.assertEqual(ComparableSolution(trunk),
+                         ComparableSolution(trunk.revision(trunk.rev)))
+
+        # built backwards from the trunk, with no earlier revisions cached
+        other = solve_trunk(g, {P: True})
+        self.assertEqual(ComparableSolution(trunk.revision(trunk.rev - 1)),
+                         ComparableSolution(other.revision(other.rev - 1)))
+
+        self.assertRaises(ValueError, trunk.revision, trunk.rev + 1)
+
+
+class IncrementalSolverTestCase(SolverTestCaseBase):
+
+    def assertSameAsSolve(self, solution, initial_values):
+        self.assertEqual(solve(self.pgraph, initial_values), solution)
+
+    def test_solve(self):
+        g = self.pgraph
+        A, B, C = self.atoms('ABC')
+
+        # (C | X) & (~C | X) & (C | ~X), where X = (A | B) & (~A | B)
+        X = g.And(g.Or(A[True], B[True]), g.Or(A[False], B[True]))
+        P = g.And(g.Or(C[True], X[True]), g.Or(C[False], X[True]),
+                  g.Or(C[True], X[False]))
+
+        solution = IncrementalSolver(g).solve({P: True})
+
+        self.assertSameAsSolve(solution, {P: True})
+
+    def test_change_initial(self):
+        g = self.pgraph
+        A, B, C = self.atoms('ABC')
+        N = g.Or(A, B)
+        A[True] >> C[True]
+
+        solver = IncrementalSolver(g)
+
+        solution = solver.solve({N: True, A: False})
+        self.assertIs(True,  solution[B])
+        self.assertSameAsSolve(solution, {N: True, A: False})
+
+        solution = solver.solve({A: True})  # overrides A: False
+        self.assertIs(True,  solution[C])
+        self.assertSameAsSolve(solution, {N: True, A: True})
+
+        solution = solver.solve(removed={A: True})
+        self.assertSameAsSolve(solution, {N: True})
+
+    def test_add_implication(self):
+        g = self.pgraph
+        A, B = self.atoms('AB')
+
+        solver = IncrementalSolver(g)
+        self.assertIsNot(True, solver.solve({A: True})[B])
+
+        base = solver.base
+        solver.add_implication(A[True], B[True])
+        self.assertIs(base, solver.base)  # updated in place
+        self.assertIs(True, solver.solve()[B])
+
+        with self.assertRaises(SolveError):
+            solver.solve({B: False})
+
+    def test_new_nodes(self):
+        g = self.pgraph
+        A, B = self.atoms('AB')
+
+        solver = IncrementalSolver(g)
+        solver.solve({A: True})
+
+        g.new_const(False, g.And(A, B))
+        self.assertIs(False, solver.solve()[B])
+
+    def test_direct_implication(self):
+        g = self.pgraph
+        A, B = self.atoms('AB')
+
+        solver = IncrementalSolver(g)
+        self.assertIsNot(True, solver.solve({A: True})[B])
+
+        A[True] >> B[True]  # not through add_implication
+        self.assertIs(True, solver.solve()[B])
+
+
+class TracingTestCase(SolverTestCaseBase):
+
+    class RecordingHandler(logging.Handler):
+        def __init__(self):
+            logging.Handler.__init__(self, logging.DEBUG)
+            self.records = []
+        def emit(self, record):
+            self.records.append(record)
+
+    def setUp(self):
+        super(TracingTestCase, self).setUp()
+
+        self.handler = self.RecordingHandler()
+        self.logger = logging.getLogger('mybuild.solver')
+        self.saved = (self.logger.level, util.tracing)
+
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        level, tracing = self.saved
+        self.logger.setLevel(level)
+        self.logger.removeHandler(self.handler)
+        util.set_tracing(tracing)
+
+    def debug_records_of_solve(self):
+        g = self.pgraph
+        A, B, C = self.atoms('ABC')
+        A[True] >> B[True]
+
+        del self.handler.records[:]
+        solve(g, {g.Or(A, C): True})
+        return [record for record in self.handler.records
+                if record.levelno < logging.INFO]
+
+    def test_tracing_off(self):
+        util.set_tracing(False)
+        self.assertEqual([], self.debug_records_of_solve())
+
+    def test_tracing_on(self):
+        util.set_tracing(True)
+        self.assertNotEqual([], self.debug_records_of_solve())
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    """Makes sure benchmark generators produce solvable pgraphs."""
+
+    def test_small_sizes(self):
+        from mybuild.test import bench_solver
+
+        data = bench_solver.run([('chain', [10]), ('fan_out', [10]),
+                                 ('at_most_one', [3]), ('tree', [3]),
+                                 ('random', [30])])
+
+        for result in data['results']:
+            self.assertIsNone(result['error'], result['case'])
+            self.assertEqual(set(['build'] + [phase for phase, _
+                                              in bench_solver.PHASES]),
+                             set(result['phases']))
+
+    def test_peak_memory(self):
+        from mybuild.test import bench_solver
+
+        if bench_solver.tracemalloc is None and not (
+                bench_solver.resource and hasattr(bench_solver.os, 'fork')):
+            self.skipTest('no way to measure memory')
+
+        data = bench_solver.run([('chain', [100])])
+        result, = data['results']
+        self.assertGreaterEqual(result['peak_memory'], 0)
+
 
 def suite():
     import sys
@@ -10,6 +10,38 @@ __date__ = "2013-07-30"
 
 from _compat import *
 
+import hashlib as _hashlib
+import os.path as _path
+import platform as _platform
+import sys as _sys
+
+
+# Modules affecting the code generated for a given source.
+_compiler_modules = '__init__', 'lex', 'parse', 'helpers', 'location', 'x_ast'
+
+_grammar_stamp = None
+
+def grammar_stamp():
+    """Returns a digest identifying the grammar and the code generator in use.
+
+    The digest is computed over sources of the compiler modules (without
+    importing them, thus PLY tables are not built) and Python version, and
+    changes whenever any of them does."""
+    global _grammar_stamp
+
+    if _grammar_stamp is None:
+        digest = _hashlib.sha1(_platform.python_implementation().encode())
+        digest.update(repr(_sys.version_info[:2]).encode())
+
+        mylang_dir = _path.dirname(_path.abspath(__file__))
+        for name in _compiler_modules:
+            with open(_path.join(mylang_dir, name + '.py'), 'rb') as f:
+                digest.update(f.read())
+
+        _grammar_stamp = digest.digest()
+
+    return _grammar_stamp
+
 
 def my_compile(source, filename='<unknown>', mode='exec'):
     try:
@@ -10,6 +10,7 @@ from _compat import *
 
 import ply.lex
 
+from mylang import tables
 from mylang.location import Location
 
 
@@ -87,7 +88,7 @@ def t_error(t):
                       loc(t).to_syntax_error_tuple())
 
 
-lexer = ply.lex.lex(optimize=1, lextab=None)
+lexer = ply.lex.lex(**tables.lex_options())
 lexer.ignore_newline_stack = [0]
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('COLON', 'COMMA', 'DOUBLECOLON', 'EQUALS', 'ID', 'LBRACE', 'LBRACKET', 'LPAREN', 'NEWLINE', 'NUMBER', 'PERIOD', 'RBRACE', 'RBRACKET', 'RPAREN', 'SEMI', 'STRING'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_NEWLINE>(\\n|/\\*(.|\\n)*?\\*/)+)|(?P<t_LPAREN>\\()|(?P<t_RPAREN>\\))|(?P<t_LBRACKET>\\[)|(?P<t_RBRACKET>\\])|(?P<t_LBRACE>\\{)|(?P<t_RBRACE>\\})|(?P<t_NUMBER>\\d+)|(?P<t_STRING>\\"([^\\\\\\n]|(\\\\.))*?\\")|(?P<t_ID>[A-Za-z_]\\w*)|(?P<t_ignore_COMMENT>//.*)|(?P<t_PERIOD>\\.)|(?P<t_DOUBLECOLON>::)|(?P<t_COLON>:)|(?P<t_COMMA>,)|(?P<t_SEMI>;)|(?P<t_EQUALS>=)', [None, ('t_NEWLINE', 'NEWLINE'), None, None, ('t_LPAREN', 'LPAREN'), ('t_RPAREN', 'RPAREN'), ('t_LBRACKET', 'LBRACKET'), ('t_RBRACKET', 'RBRACKET'), ('t_LBRACE', 'LBRACE'), ('t_RBRACE', 'RBRACE'), ('t_NUMBER', 'NUMBER'), ('t_STRING', 'STRING'), None, None, (None, 'ID'), (None, None), (None, 'PERIOD'), (None, 'DOUBLECOLON'), (None, 'COLON'), (None, 'COMMA'), (None, 'SEMI'), (None, 'EQUALS')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
+_mylang_stamp = 'ae3adaf4ab0e6e97da4be9a2ece5916ccbd99459'
@@ -14,6 +14,7 @@ from collections import namedtuple
 import ply.yacc
 
 from mylang import lex
+from mylang import tables
 from mylang import x_ast as ast
 from mylang.location import Fileinfo
 from mylang.location import Location
@@ -774,7 +775,7 @@ def p_error(t):
 
 parser = ply.yacc.yacc(start='exec_start',
                        errorlog=ply.yacc.NullLogger(), debug=False,
-                       write_tables=False)
+                       tabmodule=tables.parsetab(), write_tables=False)
 
 # The main entry point.
 
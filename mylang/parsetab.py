@@ -0,0 +1,112 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'exec_startCOLON COMMA DOUBLECOLON EQUALS ID LBRACE LBRACKET LPAREN NEWLINE NUMBER PERIOD RBRACE RBRACKET RPAREN SEMI STRINGargument : ID EQUALS testargument : testbinding : nl_off qualname colons nl_on stmtexprbinding : nl_off qualname qualname mb_call colons nl_on typebodycall : LPAREN arguments RPARENcolons : COLON\n       colons : DOUBLECOLONdictent : test COLON testempty_list :exec_start : new_bblock typesuite\n    trailers             :  empty_list\n    trailers             :  trailers_plus\n\n    typestmts          :  typestmts_plus  mb_stmtdelim\n    arguments          :  arguments_plus  mb_comma\n    dictents           :  dictents_plus   mb_comma\n    getters            :  getters_plus    mb_comma\n    setters            :  setters_plus    mb_comma\n\n    typestmts          :  empty_list\n    arguments          :  empty_list\n    getters            :  empty_list\n    \n    qualname           :  name\n\n    typestmts_plus     :  string\n    typestmts_plus     :  typestmt\n    arguments_plus     :  argument\n    dictents_plus      :  dictent\n    getters_plus       :  getter\n    setters_plus       :  setter\n    \n    qualname           :  qualname        PERIOD     name\n\n    typestmts_plus     :  typestmts_plus  stmtdelim  typestmt\n    arguments_plus     :  arguments_plus  COMMA      argument\n    dictents_plus      :  dictents_plus   COMMA      dictent\n    getters_plus       :  getters_plus    COMMA      getter\n    setters_plus       :  setters_plus    COMMA      setter\n\n    trailers_plus      :  trailers                   trailer\n    myatom : pytest typebodymyatom : pytest qualname mb_call typebodypyatom : LBRACKET dictents RBRACKET\n       pyatom : LBRACKET COLON RBRACKETpyatom : LBRACKET testlist RBRACKETpyatom : NUMBERpyatom : LPAREN testlist RPARENpyatom : stringpytest : pystub trailers\n       pytest : mystub trailers_plusstmtexpr : teststring : STRINGpystub : name\n       pystub : pyatom\n       mystub : myatomtest : pytest\n       test : mystubtestlist : testlist_plus mb_commatestlist :testlist_plus : testlist_plus COMMA testtestlist_plus : testtrailer : PERIOD ID\n       name    : IDtrailer : call\n       mb_call : call\n       mb_call : emptytrailer : LBRACKET test RBRACKETtypebody : LBRACE typesuite RBRACE typerettyperet : typestmt : new_bblock bindingtypestmt : new_bblock nl_off qualname colons nl_on typebodytypesuite : skipnl typestmtsnew_bblock :trailer : PERIOD LBRACKET getters RBRACKETgetter : name trailerstrailer : PERIOD LBRACKET setters RBRACKETsetter : name trailers COLON testmb_comma :\n       mb_comma : COMMAnl_off :nl_on :skipnl :\n       skipnl : skipnl NEWLINEstmtdelim : mb_stmtdelim NEWLINE\n       stmtdelim : mb_stmtdelim SEMImb_stmtdelim :\n       mb_stmtdelim : stmtdelimempty :'
+    
+_lr_action_items = {'LBRACE':([12,20,22,23,25,26,28,29,32,33,34,37,38,39,45,47,48,54,63,65,66,70,71,72,75,77,78,80,85,88,89,90,102,104,114,119,],[-46,-21,-57,-75,-7,-6,44,-28,-59,-60,-40,-42,-48,44,-47,-9,-75,-57,-82,-11,-44,-43,-12,44,-5,-37,-38,-39,44,-58,-34,-41,-56,-61,-68,-70,]),'RPAREN':([12,22,31,34,37,38,39,42,43,45,46,47,49,50,51,52,53,54,59,62,65,66,67,68,70,71,73,74,75,77,78,80,81,82,88,89,90,91,93,94,96,99,102,103,104,114,119,],[-46,-57,-9,-40,-42,-48,-50,-51,-53,-47,-49,-9,-24,-19,-72,75,-2,-57,-72,-35,-11,-44,-55,90,-43,-12,-14,-73,-5,-37,-38,-39,-52,-73,-58,-34,-41,-63,-30,-1,-54,-36,-56,-62,-61,-68,-70,]),'STRING':([0,2,3,6,23,25,26,28,31,35,43,44,74,76,79,82,84,86,120,],[-67,-76,12,-77,-75,-7,-6,12,12,12,12,-76,12,12,12,12,12,12,12,]),'SEMI':([5,8,10,12,13,14,15,17,18,19,22,34,36,37,38,39,40,41,42,45,46,47,62,65,66,70,71,75,77,78,80,88,89,90,91,92,99,102,103,104,114,119,],[-22,-80,-23,-46,-81,19,-64,-29,-78,-79,-57,-40,-65,-42,-48,-50,-45,-3,-51,-47,-49,-9,-35,-11,-44,-43,-12,-5,-37,-38,-39,-58,-34,-41,-63,-4,-36,-56,-62,-61,-68,-70,]),'NEWLINE':([0,2,3,5,6,8,10,12,13,14,15,17,18,19,22,34,36,37,38,39,40,41,42,44,45,46,47,62,65,66,70,71,75,77,78,80,88,89,90,91,92,99,102,103,104,114,119,],[-67,-76,6,-22,-77,-80,-23,-46,-81,18,-64,-29,-78,-79,-57,-40,-65,-42,-48,-50,-45,-3,-51,-76,-47,-49,-9,-35,-11,-44,-43,-12,-5,-37,-38,-39,-58,-34,-41,-63,-4,-36,-56,-62,-61,-68,-70,]),'PERIOD':([12,20,21,22,27,29,34,37,38,42,45,46,47,54,62,63,64,65,66,70,71,75,77,78,80,88,89,90,91,99,102,103,104,105,113,114,119,121,123,126,127,],[-46,-21,24,-57,24,-28,-40,-42,-48,-9,-47,-49,-9,-57,-35,24,87,-11,-12,87,-12,-5,-37,-38,-39,-58,-34,-41,-63,-36,-56,-62,-61,-9,87,-68,-70,-9,-9,87,87,]),'NUMBER':([23,25,26,28,31,35,43,74,76,79,82,84,86,120,],[-75,-7,-6,34,34,34,34,34,34,34,34,34,34,34,]),'LBRACKET':([12,22,23,25,26,28,31,34,35,37,38,42,43,45,46,47,54,62,64,65,66,70,71,74,75,76,77,78,79,80,82,84,86,87,88,89,90,91,99,102,103,104,105,113,114,119,120,121,123,126,127,],[-46,-57,-75,-7,-6,35,35,-40,35,-42,-48,-9,35,-47,-49,-9,-57,-35,86,-11,-12,86,-12,35,-5,35,-37,-38,35,-39,35,35,35,101,-58,-34,-41,-63,-36,-56,-62,-61,-9,86,-68,-70,35,-9,-9,86,86,]),'EQUALS':([54,],[76,]),'COLON':([12,20,21,22,27,29,30,32,33,34,35,37,38,39,42,45,46,47,57,62,65,66,70,71,75,77,78,80,88,89,90,91,97,99,102,103,104,105,113,114,119,123,127,],[-46,-21,26,-57,-82,-28,26,-59,-60,-40,56,-42,-48,-50,-51,-47,-49,-9,79,-35,-11,-44,-43,-12,-5,-37,-38,-39,-58,-34,-41,-63,79,-36,-56,-62,-61,-9,120,-68,-70,-9,120,]),'LPAREN':([12,20,22,23,25,26,27,28,29,31,34,35,37,38,42,43,45,46,47,54,62,63,64,65,66,70,71,74,75,76,77,78,79,80,82,84,86,88,89,90,91,99,102,103,104,105,113,114,119,120,121,123,126,127,],[-46,-21,-57,-75,-7,-6,31,43,-28,43,-40,43,-42,-48,-9,43,-47,-49,-9,-57,-35,31,31,-11,-12,31,-12,43,-5,43,-37,-38,43,-39,43,43,43,-58,-34,-41,-63,-36,-56,-62,-61,-9,31,-68,-70,43,-9,-9,31,31,]),'DOUBLECOLON':([20,21,22,27,29,30,32,33,75,],[-21,25,-57,-82,-28,25,-59,-60,-5,]),'COMMA':([12,22,34,37,38,39,42,45,46,47,49,51,53,54,57,59,60,61,62,65,66,67,70,71,75,77,78,80,88,89,90,91,93,94,95,96,98,99,102,103,104,105,106,108,109,111,113,114,119,121,122,124,125,126,],[-46,-57,-40,-42,-48,-50,-51,-47,-49,-9,-24,74,-2,-57,-55,82,-25,84,-35,-11,-44,-55,-43,-12,-5,-37,-38,-39,-58,-34,-41,-63,-30,-1,-8,-54,-31,-36,-56,-62,-61,-9,-27,-26,116,118,-69,-68,-70,-9,-32,-33,-71,-69,]),'RBRACKET':([12,22,34,35,37,38,39,42,45,46,47,55,56,57,58,59,60,61,62,65,66,70,71,75,77,78,80,81,82,83,84,88,89,90,91,95,96,98,99,100,101,102,103,104,105,106,107,108,109,110,111,112,113,114,115,116,117,118,119,121,122,124,125,126,],[-46,-57,-40,-53,-42,-48,-50,-51,-47,-49,-9,77,78,-55,80,-72,-25,-72,-35,-11,-44,-43,-12,-5,-37,-38,-39,-52,-73,-15,-73,-58,-34,-41,-63,-8,-54,-31,-36,104,-9,-56,-62,-61,-9,-27,114,-26,-72,-20,-72,119,-69,-68,-16,-73,-17,-73,-70,-9,-32,-33,-71,-69,]),'$end':([0,1,2,3,4,5,6,7,8,9,10,12,13,14,15,17,18,19,22,34,36,37,38,39,40,41,42,45,46,47,62,65,66,70,71,75,77,78,80,88,89,90,91,92,99,102,103,104,114,119,],[-67,0,-76,-9,-10,-22,-77,-66,-80,-18,-23,-46,-81,-13,-64,-29,-78,-79,-57,-40,-65,-42,-48,-50,-45,-3,-51,-47,-49,-9,-35,-11,-44,-43,-12,-5,-37,-38,-39,-58,-34,-41,-63,-4,-36,-56,-62,-61,-68,-70,]),'ID':([0,2,3,6,11,12,13,16,18,19,20,21,22,23,24,25,26,28,29,31,34,35,37,38,39,43,44,45,47,54,65,66,70,71,74,75,76,77,78,79,80,82,84,86,87,88,89,90,101,102,104,114,116,118,119,120,],[-67,-76,-67,-77,-74,-46,-67,22,-78,-79,-21,22,-57,-75,22,-7,-6,22,-28,54,-40,22,-42,-48,22,22,-76,-47,-9,-57,-11,-44,-43,-12,54,-5,22,-37,-38,22,-39,22,22,22,102,-58,-34,-41,22,-56,-61,-68,22,22,-70,22,]),'RBRACE':([3,5,6,7,8,9,10,12,13,14,15,17,18,19,22,34,36,37,38,39,40,41,42,44,45,46,47,62,65,66,69,70,71,75,77,78,80,88,89,90,91,92,99,102,103,104,114,119,],[-9,-22,-77,-66,-80,-18,-23,-46,-81,-13,-64,-29,-78,-79,-57,-40,-65,-42,-48,-50,-45,-3,-51,-76,-47,-49,-9,-35,-11,-44,91,-43,-12,-5,-37,-38,-39,-58,-34,-41,-63,-4,-36,-56,-62,-61,-68,-70,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'colons':([21,30,],[23,48,]),'binding':([11,],[15,]),'argument':([31,74,],[49,93,]),'typestmts_plus':([3,],[8,]),'nl_on':([23,48,],[28,72,]),'exec_start':([0,],[1,]),'empty_list':([3,31,42,47,101,105,121,123,],[9,50,65,65,110,65,65,65,]),'typesuite':([2,44,],[4,69,]),'new_bblock':([0,3,13,],[2,11,11,]),'setter':([101,118,],[106,124,]),'arguments_plus':([31,],[51,]),'pyatom':([28,31,35,43,74,76,79,82,84,86,120,],[38,38,38,38,38,38,38,38,38,38,38,]),'skipnl':([2,44,],[3,3,]),'dictents':([35,],[55,]),'pytest':([28,31,35,43,74,76,79,82,84,86,120,],[39,39,39,39,39,39,39,39,39,39,39,]),'call':([27,63,64,70,113,126,127,],[32,32,88,88,88,88,88,]),'arguments':([31,],[52,]),'test':([28,31,35,43,74,76,79,82,84,86,120,],[40,53,57,67,53,94,95,96,97,100,125,]),'nl_off':([11,],[16,]),'stmtexpr':([28,],[41,]),'empty':([27,63,],[33,33,]),'string':([3,28,31,35,43,74,76,79,82,84,86,120,],[5,37,37,37,37,37,37,37,37,37,37,37,]),'testlist':([35,43,],[58,68,]),'getters':([101,],[107,]),'mystub':([28,31,35,43,74,76,79,82,84,86,120,],[42,42,42,42,42,42,42,42,42,42,42,]),'testlist_plus':([35,43,],[59,59,]),'trailers':([42,47,105,121,123,],[64,70,113,126,127,]),'getter':([101,116,],[108,122,]),'stmtdelim':([8,],[13,]),'getters_plus':([101,],[109,]),'setters_plus':([101,],[111,]),'typestmt':([3,13,],[10,17,]),'dictent':([35,84,],[60,98,]),'dictents_plus':([35,],[61,]),'name':([16,21,24,28,31,35,39,43,74,76,79,82,84,86,101,116,118,120,],[20,20,29,45,45,45,20,45,45,45,45,45,45,45,105,121,123,45,]),'mb_call':([27,63,],[30,85,]),'mb_comma':([51,59,61,109,111,],[73,81,83,115,117,]),'myatom':([28,31,35,43,74,76,79,82,84,86,120,],[46,46,46,46,46,46,46,46,46,46,46,]),'typestmts':([3,],[7,]),'typeret':([91,],[103,]),'pystub':([28,31,35,43,74,76,79,82,84,86,120,],[47,47,47,47,47,47,47,47,47,47,47,]),'typebody':([28,39,72,85,],[36,62,92,99,]),'trailers_plus':([42,47,105,121,123,],[66,71,71,71,71,]),'mb_stmtdelim':([8,],[14,]),'qualname':([16,21,39,],[21,27,63,]),'trailer':([64,70,113,126,127,],[89,89,89,89,89,]),'setters':([101,],[112,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> exec_start","S'",1,None,None,None),
+  ('argument -> ID EQUALS test','argument',3,'p_argument_kw','parse.py',43),
+  ('argument -> test','argument',1,'p_argument_pos','parse.py',43),
+  ('binding -> nl_off qualname colons nl_on stmtexpr','binding',5,'p_binding_simple','parse.py',43),
+  ('binding -> nl_off qualname qualname mb_call colons nl_on typebody','binding',7,'p_binding_typedef','parse.py',43),
+  ('call -> LPAREN arguments RPAREN','call',3,'p_call','parse.py',43),
+  ('colons -> COLON','colons',1,'p_colons','parse.py',43),
+  ('colons -> DOUBLECOLON','colons',1,'p_colons','parse.py',44),
+  ('dictent -> test COLON test','dictent',3,'p_dictent','parse.py',43),
+  ('empty_list -> <empty>','empty_list',0,'p_empty_list','parse.py',43),
+  ('exec_start -> new_bblock typesuite','exec_start',2,'p_exec_start','parse.py',43),
+  ('trailers -> empty_list','trailers',1,'p_list_alias','parse.py',44),
+  ('trailers -> trailers_plus','trailers',1,'p_list_alias','parse.py',45),
+  ('typestmts -> typestmts_plus mb_stmtdelim','typestmts',2,'p_list_alias','parse.py',47),
+  ('arguments -> arguments_plus mb_comma','arguments',2,'p_list_alias','parse.py',48),
+  ('dictents -> dictents_plus mb_comma','dictents',2,'p_list_alias','parse.py',49),
+  ('getters -> getters_plus mb_comma','getters',2,'p_list_alias','parse.py',50),
+  ('setters -> setters_plus mb_comma','setters',2,'p_list_alias','parse.py',51),
+  ('typestmts -> empty_list','typestmts',1,'p_list_alias','parse.py',53),
+  ('arguments -> empty_list','arguments',1,'p_list_alias','parse.py',54),
+  ('getters -> empty_list','getters',1,'p_list_alias','parse.py',55),
+  ('qualname -> name','qualname',1,'p_list_head','parse.py',44),
+  ('typestmts_plus -> string','typestmts_plus',1,'p_list_head','parse.py',46),
+  ('typestmts_plus -> typestmt','typestmts_plus',1,'p_list_head','parse.py',47),
+  ('arguments_plus -> argument','arguments_plus',1,'p_list_head','parse.py',48),
+  ('dictents_plus -> dictent','dictents_plus',1,'p_list_head','parse.py',49),
+  ('getters_plus -> getter','getters_plus',1,'p_list_head','parse.py',50),
+  ('setters_plus -> setter','setters_plus',1,'p_list_head','parse.py',51),
+  ('qualname -> qualname PERIOD name','qualname',3,'p_list_tail','parse.py',44),
+  ('typestmts_plus -> typestmts_plus stmtdelim typestmt','typestmts_plus',3,'p_list_tail','parse.py',46),
+  ('arguments_plus -> arguments_plus COMMA argument','arguments_plus',3,'p_list_tail','parse.py',47),
+  ('dictents_plus -> dictents_plus COMMA dictent','dictents_plus',3,'p_list_tail','parse.py',48),
+  ('getters_plus -> getters_plus COMMA getter','getters_plus',3,'p_list_tail','parse.py',49),
+  ('setters_plus -> setters_plus COMMA setter','setters_plus',3,'p_list_tail','parse.py',50),
+  ('trailers_plus -> trailers trailer','trailers_plus',2,'p_list_tail','parse.py',52),
+  ('myatom -> pytest typebody','myatom',2,'p_myatom_typedef','parse.py',43),
+  ('myatom -> pytest qualname mb_call typebody','myatom',4,'p_myatom_typedef_named','parse.py',43),
+  ('pyatom -> LBRACKET dictents RBRACKET','pyatom',3,'p_pyatom_dict','parse.py',43),
+  ('pyatom -> LBRACKET COLON RBRACKET','pyatom',3,'p_pyatom_dict','parse.py',44),
+  ('pyatom -> LBRACKET testlist RBRACKET','pyatom',3,'p_pyatom_list','parse.py',43),
+  ('pyatom -> NUMBER','pyatom',1,'p_pyatom_num','parse.py',43),
+  ('pyatom -> LPAREN testlist RPAREN','pyatom',3,'p_pyatom_parens_or_tuple','parse.py',43),
+  ('pyatom -> string','pyatom',1,'p_pyatom_string','parse.py',43),
+  ('pytest -> pystub trailers','pytest',2,'p_pytest','parse.py',43),
+  ('pytest -> mystub trailers_plus','pytest',2,'p_pytest','parse.py',44),
+  ('stmtexpr -> test','stmtexpr',1,'p_stmtexpr','parse.py',43),
+  ('string -> STRING','string',1,'p_string','parse.py',43),
+  ('pystub -> name','pystub',1,'p_stub','parse.py',43),
+  ('pystub -> pyatom','pystub',1,'p_stub','parse.py',44),
+  ('mystub -> myatom','mystub',1,'p_stub','parse.py',45),
+  ('test -> pytest','test',1,'p_test','parse.py',43),
+  ('test -> mystub','test',1,'p_test','parse.py',44),
+  ('testlist -> testlist_plus mb_comma','testlist',2,'p_testlist','parse.py',43),
+  ('testlist -> <empty>','testlist',0,'p_testlist_empty','parse.py',43),
+  ('testlist_plus -> testlist_plus COMMA test','testlist_plus',3,'p_testlist_list','parse.py',43),
+  ('testlist_plus -> test','testlist_plus',1,'p_testlist_single','parse.py',43),
+  ('trailer -> PERIOD ID','trailer',2,'p_trailer_attr_or_name','parse.py',43),
+  ('name -> ID','name',1,'p_trailer_attr_or_name','parse.py',44),
+  ('trailer -> call','trailer',1,'p_trailer_call','parse.py',43),
+  ('mb_call -> call','mb_call',1,'p_trailer_call','parse.py',44),
+  ('mb_call -> empty','mb_call',1,'p_trailer_call','parse.py',45),
+  ('trailer -> LBRACKET test RBRACKET','trailer',3,'p_trailer_item','parse.py',43),
+  ('typebody -> LBRACE typesuite RBRACE typeret','typebody',4,'p_typebody','parse.py',43),
+  ('typeret -> <empty>','typeret',0,'p_typeret','parse.py',43),
+  ('typestmt -> new_bblock binding','typestmt',2,'p_typestmt','parse.py',43),
+  ('typestmt -> new_bblock nl_off qualname colons nl_on typebody','typestmt',6,'p_typestmt_namespace','parse.py',43),
+  ('typesuite -> skipnl typestmts','typesuite',2,'p_typesuite','parse.py',43),
+  ('new_bblock -> <empty>','new_bblock',0,'p_new_bblock','parse.py',362),
+  ('trailer -> PERIOD LBRACKET getters RBRACKET','trailer',4,'p_trailer_multigetter','parse.py',634),
+  ('getter -> name trailers','getter',2,'p_getter','parse.py',638),
+  ('trailer -> PERIOD LBRACKET setters RBRACKET','trailer',4,'p_trailer_multisetter','parse.py',642),
+  ('setter -> name trailers COLON test','setter',4,'p_setter','parse.py',646),
+  ('mb_comma -> <empty>','mb_comma',0,'p_mb_comma','parse.py',731),
+  ('mb_comma -> COMMA','mb_comma',1,'p_mb_comma','parse.py',732),
+  ('nl_off -> <empty>','nl_off',0,'p_nl_off','parse.py',738),
+  ('nl_on -> <empty>','nl_on',0,'p_nl_on','parse.py',742),
+  ('skipnl -> <empty>','skipnl',0,'p_skipnl','parse.py',752),
+  ('skipnl -> skipnl NEWLINE','skipnl',2,'p_skipnl','parse.py',753),
+  ('stmtdelim -> mb_stmtdelim NEWLINE','stmtdelim',2,'p_stmtdelim','parse.py',756),
+  ('stmtdelim -> mb_stmtdelim SEMI','stmtdelim',2,'p_stmtdelim','parse.py',757),
+  ('mb_stmtdelim -> <empty>','mb_stmtdelim',0,'p_mb_stmtdelim','parse.py',760),
+  ('mb_stmtdelim -> stmtdelim','mb_stmtdelim',1,'p_mb_stmtdelim','parse.py',761),
+  ('empty -> <empty>','empty',0,'p_empty','parse.py',764),
+]
@@ -0,0 +1,113 @@
+"""
+Prebuilt PLY tables for the lexer and the parser of My-files.
+
+Building LALR tables from the grammar docstrings is a noticeable startup cost
+paid on every import of mylang.parse. Instead, the tables are generated once:
+
+    python -m mylang.tables
+
+and shipped as lextab.py and parsetab.py modules of the mylang package.
+
+The lexer and the parser only use them while they match the grammar: the
+lexer table is stamped with a digest of the lex module source, and parser
+tables carry a signature of the grammar checked by PLY itself. Otherwise (or
+if the tables are missing or have been built by an incompatible version of
+PLY) the tables are silently regenerated in memory, as before.
+"""
+
+from _compat import *
+
+import hashlib as _hashlib
+import importlib as _importlib
+import os.path as _path
+import sys as _sys
+
+
+LEXTAB   = 'mylang.lextab'
+PARSETAB = 'mylang.parsetab'
+
+# Module level variable of a lexer table holding a stamp of the lex module.
+_STAMP_VAR = '_mylang_stamp'
+
+
+def lex_stamp():
+    """Returns a hex digest of the lex module source, without importing it."""
+    mylang_dir = _path.dirname(_path.abspath(__file__))
+    with open(_path.join(mylang_dir, 'lex.py'), 'rb') as f:
+        return _hashlib.sha1(f.read()).hexdigest()
+
+
+def lextab():
+    """Returns the name of the prebuilt lexer table module, or None if there
+    is no up-to-date one."""
+    import ply.lex
+
+    try:
+        tab = _importlib.import_module(LEXTAB)
+    except ImportError:
+        return None
+
+    if (getattr(tab, '_tabversion', None) != ply.lex.__tabversion__ or
+            getattr(tab, _STAMP_VAR, None) != lex_stamp()):
+        return None
+
+    return LEXTAB
+
+
+def lex_options():
+    """Returns keyword arguments for ply.lex.lex to use the prebuilt table.
+
+    Without an up-to-date table the lexer is built in non-optimized mode:
+    in optimized mode PLY falls back to a default table name and would read
+    a stale table, or write one into the package, otherwise."""
+    tab = lextab()
+    if tab is None:
+        return dict(optimize=0)
+    return dict(optimize=1, lextab=tab)
+
+
+def parsetab():
+    """Returns the name of the prebuilt parser table module to pass to
+    ply.yacc.yacc. It is up to PLY to check its signature and version."""
+    return PARSETAB
+
+
+def build(outputdir=None):
+    """Generates table modules for the current grammar in the outputdir
+    (which defaults to the mylang package directory)."""
+    import ply.lex
+    import ply.yacc
+
+    from mylang import lex
+    from mylang import parse
+
+    if outputdir is None:
+        outputdir = _path.dirname(_path.abspath(__file__))
+
+    lexer = ply.lex.lex(module=lex, optimize=0)  # never reads a table
+    lexer.writetab(LEXTAB, outputdir)
+
+    lextab_file = _path.join(outputdir, LEXTAB.rpartition('.')[2] + '.py')
+    with open(lextab_file, 'a') as f:
+        f.write('{0} = {1!r}\n'.format(_STAMP_VAR, lex_stamp()))
+
+    # PLY reads an existing table first, and writes a new one only if that
+    # one is missing or stale. Make the import fail to always get it written.
+    saved_tab = _sys.modules.get(PARSETAB)
+    _sys.modules[PARSETAB] = None
+    try:
+        ply.yacc.yacc(module=parse, start='exec_start',
+                      errorlog=ply.yacc.NullLogger(), debug=False,
+                      tabmodule=PARSETAB, outputdir=outputdir,
+                      write_tables=True)
+    finally:
+        if saved_tab is not None:
+            _sys.modules[PARSETAB] = saved_tab
+        else:
+            _sys.modules.pop(PARSETAB, None)
+
+    return lextab_file
+
+
+if __name__ == "__main__":
+    build(*_sys.argv[1:2])
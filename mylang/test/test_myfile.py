@@ -0,0 +1,103 @@
+"""
+Unit tests for caching of compiled My-files in nsloader.myfile
+"""
+
+from _compat import *
+
+import os
+import shutil
+import sys
+import tempfile
+
+import unittest
+
+import mylang
+from nsloader import myfile
+
+
+SOURCE = 'x: 1\n'
+
+
+class MyFileCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp_dir, 'Mybuild')
+        self.write_source(SOURCE)
+
+        self.nr_compiles = 0
+        def my_compile(*args):
+            self.nr_compiles += 1
+            return mylang.my_compile(*args)
+        myfile.my_compile = my_compile
+
+        self.dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+
+    def tearDown(self):
+        sys.dont_write_bytecode = self.dont_write_bytecode
+        myfile.my_compile = mylang.my_compile
+        myfile.grammar_stamp = mylang.grammar_stamp
+        shutil.rmtree(self.tmp_dir)
+
+    def write_source(self, contents, mtime=1000000000):
+        with open(self.source, 'w') as f:
+            f.write(contents)
+        os.utime(self.source, (mtime, mtime))
+
+    def get_code(self):
+        loader = myfile.MyFileLoader(None, 'Mybuild', self.source)
+        return loader.get_code('Mybuild')
+
+    def cache_path(self):
+        loader = myfile.MyFileLoader(None, 'Mybuild', self.source)
+        return loader.cache_path_for(self.source)
+
+    def test_hit(self):
+        code = self.get_code()
+        self.assertTrue(os.path.isfile(self.cache_path()))
+
+        self.assertEqual(code.co_consts, self.get_code().co_consts)
+        self.assertEqual(1, self.nr_compiles)
+
+    def test_mtime_changed(self):
+        self.get_code()
+        self.write_source(SOURCE, mtime=1000000001)
+        self.get_code()
+        self.assertEqual(2, self.nr_compiles)
+
+    def test_size_changed(self):
+        self.get_code()
+        self.write_source(SOURCE + 'y: 2\n')
+        self.get_code()
+        self.assertEqual(2, self.nr_compiles)
+
+    def test_stamp_changed(self):
+        self.get_code()
+        myfile.grammar_stamp = lambda: b'\0' * 20
+        self.get_code()
+        self.assertEqual(2, self.nr_compiles)
+
+    def test_corrupt(self):
+        self.get_code()
+
+        with open(self.cache_path(), 'rb') as f:
+            data = f.read()
+        for garbage in (data[:myfile.CACHE_HEADER.size + 1],  # truncated
+                        data[:myfile.CACHE_HEADER.size] + b'\xff' * 8,
+                        data[:10]):
+            with open(self.cache_path(), 'wb') as f:
+                f.write(garbage)
+            self.get_code()
+
+        self.assertEqual(4, self.nr_compiles)
+        self.get_code()  # rewritten by the last compilation
+        self.assertEqual(4, self.nr_compiles)
+
+    def test_grammar_stamp(self):
+        self.assertIn('__init__', mylang._compiler_modules)
+        self.assertEqual(20, len(mylang.grammar_stamp()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Unit tests for mylang.tables
+"""
+
+from _compat import *
+
+import os
+import shutil
+import tempfile
+
+import unittest
+
+from mylang import tables
+
+
+class TablesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.outputdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outputdir)
+
+    def test_build(self):
+        lextab_file = tables.build(self.outputdir)
+
+        namespace = {}
+        with open(lextab_file) as f:
+            exec(f.read(), namespace)
+        self.assertEqual(namespace['_mylang_stamp'], tables.lex_stamp())
+
+        self.assertIn('parsetab.py', os.listdir(self.outputdir))
+
+    def test_stale_lextab(self):
+        lex_stamp = tables.lex_stamp
+        tables.lex_stamp = lambda: 'stale'
+        try:
+            self.assertIsNone(tables.lextab())
+            self.assertEqual(dict(optimize=0), tables.lex_options())
+        finally:
+            tables.lex_stamp = lex_stamp
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,19 +24,28 @@ from glue import PyDslLoader
 from glue import MyDslLoader
 
 from nsimporter.hook import NamespaceImportHook
+from nsloader.pyfile import PyFileLoader
 
+from mybuild.cache import ResolveCache
 from mybuild.context import resolve
+from mybuild.profiling import Profiler
 from mybuild.solver import SolveError
-from mybuild.rgraph import *
+from mybuild.report import ErrorReport
 
 from waflib import Context as wafcontext
 from waflib import Errors  as waferrors
 from waflib import Logs    as waflogs
+from waflib import Options as wafoptions
 from waflib import Utils   as wafutils
 
 import unittest
 from test import module_tests_solver
 from mybuild.test import test_solver
+from mybuild.test import test_cache
+from mybuild.test import test_context
+from mybuild.test import test_snapshot
+from mybuild.test import test_rgraph
+from mybuild.test import test_report
 
 
 namespace_importer = NamespaceImportHook(loaders={
@@ -112,13 +121,21 @@ def my_resolve(ctx, conf_module):
     try:
         instance_map = cache[conf_module]
     except KeyError:
-        try:
-            instance_map = resolve(conf_module)
-        except SolveError as e:
-            e.rgraph = get_error_rgraph(e)
-            for reason, depth in traverse_error_rgraph(e.rgraph):
-                print_reason(e.rgraph, reason, depth)
-            raise e
+        disk_cache = ctx.my_disk_cache()
+        instance_map = disk_cache.load(conf_module)
+
+        if instance_map is None:
+            try:
+                instance_map = resolve(conf_module, workers=getattr(
+                        wafoptions.options, 'my_workers', None),
+                        profiler=ctx.my_profiler())
+            except SolveError as e:
+                ctx.my_report_error(e)
+                raise e
+
+            disk_cache.store(conf_module, instance_map, loaded_my_files(),
+                             my_search_dirs(), namespace_importer.loaders)
+            ctx.my_dump_profile()
 
         cache[conf_module] = instance_map
 
@@ -127,24 +144,76 @@ def my_resolve(ctx, conf_module):
 wafcontext.Context._my_resolve_cache = {}  # {conf_module: instance_map}
 
 
-def print_reason(rgraph, reason, depth):
-        print ('  ' * depth, reason)
-        if not reason.follow:
-            return
+@wafcontext.ctx_method
+def my_disk_cache(ctx):
+    """Returns a persistent cache of resolved configurations stored
+    in a build directory (or in a top directory if there is no one yet)."""
+    try:
+        base_dir = ctx.bldnode.abspath()
+    except AttributeError:
+        base_dir = wafcontext.out_dir or wafcontext.run_dir
+    return ResolveCache(os.path.join(base_dir, '.mybuild', 'resolve'))
+
+
+@wafcontext.ctx_method
+def my_profiler(ctx):
+    """Returns a profiler shared by all resolutions if --my-profile is given,
+    or None otherwise."""
+    if not getattr(wafoptions.options, 'my_profile', None):
+        return None
+
+    profiler = wafcontext.Context._my_profiler
+    if profiler is None:
+        profiler = wafcontext.Context._my_profiler = Profiler(
+                trace_memory=True)
+        if not (profiler.trace_memory or profiler.trace_rss):
+            waflogs.warn('mywaf: unable to measure memory usage, '
+                         'the profile will only contain timings')
+    return profiler
+
+wafcontext.Context._my_profiler = None
 
-        literal = None
-        if reason.literal is not None:
-            literal = ~reason.literal
-        else:
-            literal = reason.cause_literals[0]
+@wafcontext.ctx_method
+def my_dump_profile(ctx):
+    """Writes a Chrome trace of all resolutions so far to a --my-profile
+    file (if any)."""
+    profiler = ctx.my_profiler()
+    if profiler is not None:
+        with open(wafoptions.options.my_profile, 'w') as f:
+            profiler.dump_chrome_trace(f)
+
+
+def loaded_my_files():
+    """Lists files of all Mybuild/Pybuild modules loaded so far."""
+    return sorted(module.__file__ for module in list(itervalues(sys.modules))
+                  if isinstance(getattr(module, '__loader__', None),
+                                PyFileLoader))
+
+
+def my_search_dirs():
+    """Lists directories searched for Mybuild/Pybuild files."""
+    return sorted(set(path_entry for path in
+                      itervalues(namespace_importer.namespace_path)
+                      for path_entry in path))
+
+
+@wafcontext.ctx_method
+def my_report_error(ctx, error):
+    """Prints a report explaining a SolveError, and also writes it as JSON
+    lines to a --my-error-report file (if any)."""
+    options = wafoptions.options
+    max_depth = getattr(options, 'my_error_depth', None)
+    if max_depth is None:
+        max_depth = 3
+    report = ErrorReport(error, max_depth=max_depth)
+    error.rgraph = report.rgraph
 
-        assert literal in rgraph.violation_graphs
+    report.dump_text(sys.stdout)
 
-        print('---dead branch {0}---------'.format(literal))
-        reason_generator = traversal(rgraph.violation_graphs[literal])
-        for reason in reason_generator:
-            print_reason(rgraph, reason[0], reason[1])
-        print('---------dead branch {0}---'.format(literal))
+    report_file = getattr(options, 'my_error_report', None)
+    if report_file:
+        with open(report_file, 'w') as f:
+            report.dump_json(f)
 
 
 @wafcontext.ctx_method
@@ -203,6 +272,16 @@ def init(ctx):
 
 def options(ctx):
     print('mywaf: options %r' % ctx)
+    ctx.add_option('--my-workers', type='int', default=None,
+                   help='instantiate Mybuild modules in N processes')
+    ctx.add_option('--my-profile', metavar='FILE', default=None,
+                   help='write a Chrome trace of Mybuild resolution to FILE')
+    ctx.add_option('--my-error-report', metavar='FILE', default=None,
+                   help='write a report of Mybuild resolution errors to FILE '
+                        'as JSON lines')
+    ctx.add_option('--my-error-depth', type='int', default=None,
+                   help='follow dead branches up to N levels deep when '
+                        'reporting Mybuild resolution errors (default: 3)')
 
 def configure(ctx):
     print('mywaf: configure %r' % ctx)
@@ -211,6 +290,11 @@ def selftest(ctx):
     suite = unittest.TestSuite()
     suite.addTests([
         test_solver.suite(),
+        test_cache.suite(),
+        test_context.suite(),
+        test_snapshot.suite(),
+        test_rgraph.suite(),
+        test_report.suite(),
         module_tests_solver.suite(ctx),
     ])
 
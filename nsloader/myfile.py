@@ -8,13 +8,35 @@ __date__ = "2013-07-05"
 
 from _compat import *
 
+import hashlib
+import marshal
+import os
+import struct
+import sys
+
+from mylang import grammar_stamp
 from mylang import my_compile
 from mylang import runtime
 from nsloader import pyfile
 
 
+# Cache file layout: magic, grammar stamp (SHA-1), source mtime and size,
+# followed by a marshalled code object.
+CACHE_MAGIC  = b'MYC\x01'
+CACHE_HEADER = struct.Struct('<4s20sqq')
+CACHE_SUFFIX = '.myc'
+
+
 class MyFileLoader(pyfile.PyFileLoader):
-    """Loads My-files using myfile parser/linker."""
+    """Loads My-files using myfile parser/linker.
+
+    Compiled code objects are cached in a __pycache__-like directory next to
+    each source file, or in cache_dir if it is set. A cached code is used as
+    long as the source file keeps its mtime and size, and the grammar stays
+    the same (see mylang.grammar_stamp).
+    """
+
+    cache_dir = None  # None stands for __pycache__ near the source file
 
     def defaults_for_module(self, module):
         return dict(self.defaults,
@@ -23,7 +45,75 @@ class MyFileLoader(pyfile.PyFileLoader):
 
     def get_code(self, fullname):
         source_path = self.get_filename(fullname)
+
+        try:
+            source_stat = os.stat(source_path)
+        except OSError:
+            source_stat = None
+
+        if source_stat is not None:
+            cache_path = self.cache_path_for(source_path)
+            code = self._load_cached_code(cache_path, source_stat)
+            if code is not None:
+                return code
+
         source_string = self.get_source(fullname)
+        code = my_compile(source_string, source_path, 'exec')
+
+        if source_stat is not None and not sys.dont_write_bytecode:
+            self._store_cached_code(cache_path, source_stat, code)
+
+        return code
+
+    def cache_path_for(self, source_path):
+        cache_dir = self.cache_dir
+        if cache_dir is None:
+            head, tail = os.path.split(source_path)
+            return os.path.join(head, '__pycache__', tail + CACHE_SUFFIX)
+
+        # Flatten the whole path into a single file name.
+        abs_path = os.path.abspath(source_path)
+        path_digest = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()
+        return os.path.join(cache_dir, '{0}-{1}{2}'.format(
+                os.path.basename(source_path), path_digest, CACHE_SUFFIX))
+
+    def _cache_header(self, source_stat):
+        return CACHE_HEADER.pack(CACHE_MAGIC, grammar_stamp(),
+                                 int(source_stat.st_mtime),
+                                 source_stat.st_size)
+
+    def _load_cached_code(self, cache_path, source_stat):
+        try:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+
+        header = self._cache_header(source_stat)
+        if not data.startswith(header):
+            return None
+
+        try:
+            return marshal.loads(data[len(header):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def _store_cached_code(self, cache_path, source_stat, code):
+        data = self._cache_header(source_stat) + marshal.dumps(code)
+
+        tmp_path = '{0}.{1}.tmp'.format(cache_path, os.getpid())
+        try:
+            cache_dir = os.path.dirname(cache_path)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+
+            if os.path.exists(cache_path):
+                os.remove(cache_path)  # rename fails on Windows otherwise
+            os.rename(tmp_path, cache_path)
 
-        return my_compile(source_string, source_path, 'exec')
+        except (IOError, OSError):
+            pass  # e.g. read-only file system, just go without caching
 
@@ -3,7 +3,10 @@ from _compat import *
 import unittest
 
 from mybuild.binding.pydsl import module
+from mybuild.binding.pydsl import option
+from mybuild.context import Context
 from mybuild.context import resolve
+from mybuild.core import InstanceError
 from mybuild.solver import solve
 from mybuild.solver import SolveError
 
@@ -123,6 +126,40 @@ class SolverTestCase(unittest.TestCase):
         self.assertIn(m3, modules)
 
 
+    def test_lazy_product(self):
+        @module
+        def conf(self):
+            self._constrain(m1(b=3))
+
+        @module
+        def m1(self, a=option(*range(10)), b=option(*range(10)),
+               c=option(*range(10))):
+            pass
+
+        context = Context(lazy=True)
+        modules = context.resolve(conf)
+
+        self.assertIn(m1, modules)
+        self.assertEqual(3, modules[m1].b)
+        # conf, m1(b=3) and m1() completed with defaults
+        self.assertEqual(3, len(context._instances))
+
+    def test_lazy_expansion(self):
+        @module
+        def conf(self):
+            self._constrain(m1)
+
+        @module
+        def m1(self, a=option(1, 2, 3)):
+            if a != 3:
+                raise InstanceError('unsupported')
+
+        modules = resolve(conf, lazy=True)
+
+        self.assertIn(m1, modules)
+        self.assertEqual(3, modules[m1].a)
+
+
 def suite(wafctx_):
     class WafCtxBoundTestCase(SolverTestCase):
         wafctx = wafctx_
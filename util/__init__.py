@@ -7,6 +7,7 @@ from _compat import *
 
 import logging as _logging
 import functools as _functools
+import os as _os
 from inspect import ismethod
 
 from util.collections import is_container
@@ -22,6 +23,17 @@ def identity(x):
 _logging.DUMP = _logging.DEBUG // 2
 _logging.addLevelName(_logging.DUMP, 'DUMP')
 
+# Tracing of hot code paths (e.g. the solver). Unless it is on, such code
+# doesn't issue debug logging calls at all, not even checking whether a
+# logger is enabled for them. It is turned on by init_logging with a debug
+# level, or by setting MYBUILD_TRACE environment variable.
+tracing = bool(_os.environ.get('MYBUILD_TRACE'))
+
+def set_tracing(enabled=True):
+    global tracing
+    tracing = bool(enabled)
+
+
 logging_defaults = dict(
     level=_logging.DEBUG,
     format='%(levelname)-8s%(name)s:\t%(message)s',
@@ -38,6 +50,9 @@ def init_logging(filename_or_stream, **kwargs):
 
     _logging.basicConfig(**init_dict)
 
+    if init_dict['level'] <= _logging.DEBUG:
+        set_tracing()
+
 
 def get_extended_logger(name):
 	return extend_logger(_logging.getLogger(name))
@@ -55,6 +70,9 @@ def logger_wrap(logger, func, width=60):
 
     @_functools.wraps(func)
     def decorated(*args, **kwargs):
+        if not tracing:
+            return func(*args, **kwargs)
+
         logger.debug(header)
         try:
             return func(*args, **kwargs)
@@ -65,7 +83,7 @@ def logger_wrap(logger, func, width=60):
 
 
 def logger_dump(logger, target, attrs=None):
-    if not logger.isEnabledFor(_logging.DEBUG):
+    if not tracing or not logger.isEnabledFor(_logging.DEBUG):
     	return
 
     if isinstance(attrs, str):
@@ -0,0 +1,594 @@
+"""
+Sets backed by arbitrary-size ints, either by a single one (BitSet), or by
+a tuple of immutable fixed-size chunks shared between sets (ChunkedBitSet).
+"""
+from __future__ import absolute_import
+
+
+from _compat import *
+
+from util.collections import MutableSet
+
+
+# Translates a byte array of 0/1 flags into a string of binary digits.
+_FLAG_DIGITS = bytes(bytearray(b'0' + b'1' * 255))
+
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+
+else:
+    def popcount(bits):
+        """Returns the number of bits set."""
+        return bin(bits).count('1')
+
+
+def iter_bits(bits):
+    """Yields indices of set bits in ascending order.
+
+    >>> list(iter_bits(0b101001))
+    [0, 3, 5]
+    """
+    digits = bin(bits)[:1:-1]  # LSB first, without '0b'
+    index = digits.find('1')
+    while index >= 0:
+        yield index
+        index = digits.find('1', index + 1)
+
+
+def bits_from_flags(flags):
+    """Packs a byte array of flags (one byte per bit, LSB first) into an int.
+
+    >>> bin(bits_from_flags(bytearray([1, 0, 0, 1, 1])))
+    '0b11001'
+    """
+    return int(bytes(flags.translate(_FLAG_DIGITS)[::-1]) or b'0', 2)
+
+
+def bits_from_indices(indices):
+    """Returns an int with the given bits set.
+
+    >>> bin(bits_from_indices([3, 0, 3]))
+    '0b1001'
+    """
+    indices = list(indices)
+    if not indices:
+        return 0
+
+    flags = bytearray(max(indices) + 1)
+    for index in indices:
+        flags[index] = 1
+    return bits_from_flags(flags)
+
+
+class BitSet(MutableSet):
+    """Mutable set of non-negative ints backed by a single arbitrary-size int.
+
+    Set operations between bit sets of the same type are carried out
+    word-wise on the underlying ints. Subclasses may store arbitrary objects
+    by mapping them to dense indices through _index_of and _item_at methods.
+
+    >>> s = BitSet([1, 5])
+    >>> s |= BitSet([2])
+    >>> sorted(s), len(s), 5 in s, 3 in s
+    ([1, 2, 5], 3, True, False)
+    >>> s - BitSet([1, 2])
+    BitSet([5])
+    >>> BitSet([1]).isdisjoint(BitSet([2])), BitSet([1, 2]) >= BitSet([2])
+    (True, True)
+    """
+    __slots__ = '_bits',
+
+    __hash__ = None
+
+    _empty_bits = 0
+
+    def __init__(self, iterable=()):
+        super(BitSet, self).__init__()
+        self._bits = self._empty_bits
+        if iterable:
+            self._bits = self._bits_of(iterable)
+
+    def _index_of(self, item):
+        return item
+
+    def _item_at(self, index):
+        return index
+
+    def _from_bits(self, bits):
+        ret = type(self)()
+        ret._bits = bits
+        return ret
+
+    def _from_iterable(self, iterable):
+        return self._from_bits(self._bits_of(iterable))
+
+    def _bits_of(self, other):
+        if self._is_compatible(other):
+            return other._bits
+        return bits_from_indices(map(self._index_of, other))
+
+    def _is_compatible(self, other):
+        # Checking the exact type first bypasses slow ABC instance checks.
+        return type(other) is type(self) or isinstance(other, type(self))
+
+    def __contains__(self, item):
+        try:
+            index = self._index_of(item)
+        except (AttributeError, TypeError):
+            return False
+        return bool(self._bits >> index & 1)
+
+    def __iter__(self):
+        return map(self._item_at, iter_bits(self._bits))
+
+    def __len__(self):
+        return popcount(self._bits)
+
+    def __bool__(self):
+        return bool(self._bits)
+    __nonzero__ = __bool__
+
+    def add(self, item):
+        self._bits |= 1 << self._index_of(item)
+
+    def discard(self, item):
+        bit = 1 << self._index_of(item)
+        if self._bits & bit:
+            self._bits ^= bit
+
+    def remove(self, item):
+        bit = 1 << self._index_of(item)
+        if not self._bits & bit:
+            raise KeyError(item)
+        self._bits ^= bit
+
+    def pop(self):
+        bits = self._bits
+        if not bits:
+            raise KeyError('pop from an empty set')
+        lowest = bits & -bits
+        self._bits = bits ^ lowest
+        return self._item_at(lowest.bit_length() - 1)
+
+    def clear(self):
+        self._bits = self._empty_bits
+
+    def copy(self):
+        return self._from_bits(self._bits)
+
+    def update(self, *others):
+        for other in others:
+            self._bits |= self._bits_of(other)
+
+    def update_flags(self, flags):
+        """Adds items with indices flagged by non-zero elements of flags."""
+        if not isinstance(flags, bytearray):
+            flags = bytearray(flags)
+        self._bits |= bits_from_flags(flags)
+
+    def __ior__(self, other):
+        self._bits |= self._bits_of(other)
+        return self
+
+    def __iand__(self, other):
+        self._bits &= self._bits_of(other)
+        return self
+
+    def __isub__(self, other):
+        self._bits &= ~self._bits_of(other)
+        return self
+
+    def __ixor__(self, other):
+        self._bits ^= self._bits_of(other)
+        return self
+
+    def __or__(self, other):
+        return self._from_bits(self._bits | self._bits_of(other))
+    __ror__ = __or__
+
+    def __and__(self, other):
+        return self._from_bits(self._bits & self._bits_of(other))
+    __rand__ = __and__
+
+    def __xor__(self, other):
+        return self._from_bits(self._bits ^ self._bits_of(other))
+    __rxor__ = __xor__
+
+    def __sub__(self, other):
+        return self._from_bits(self._bits & ~self._bits_of(other))
+
+    def __rsub__(self, other):
+        return self._from_bits(self._bits_of(other) & ~self._bits)
+
+    union        = __or__
+    intersection = __and__
+    difference   = __sub__
+
+    def isdisjoint(self, other):
+        if self._is_compatible(other):
+            return not self._bits & other._bits
+        return not any(item in self for item in other)
+
+    def issuperset(self, other):
+        if self._is_compatible(other):
+            return not other._bits & ~self._bits
+        return all(item in self for item in other)
+
+    def issubset(self, other):
+        if self._is_compatible(other):
+            return not self._bits & ~other._bits
+        return all(item in other for item in self)
+
+    def __ge__(self, other):
+        if not self._is_compatible(other):
+            return super(BitSet, self).__ge__(other)
+        return self.issuperset(other)
+
+    def __le__(self, other):
+        if not self._is_compatible(other):
+            return super(BitSet, self).__le__(other)
+        return self.issubset(other)
+
+    def __gt__(self, other):
+        if not self._is_compatible(other):
+            return super(BitSet, self).__gt__(other)
+        return self._bits != other._bits and self.issuperset(other)
+
+    def __lt__(self, other):
+        if not self._is_compatible(other):
+            return super(BitSet, self).__lt__(other)
+        return self._bits != other._bits and self.issubset(other)
+
+    def __eq__(self, other):
+        if not self._is_compatible(other):
+            return super(BitSet, self).__eq__(other)
+        return self._bits == other._bits
+
+    def __repr__(self):
+        return '{cls.__name__}({items!r})'.format(cls=type(self),
+                                                   items=list(self))
+
+
+#
+# Persistent chunked bitsets.
+#
+# Chunks are immutable ints, so sets derived from one another can refer to the
+# same chunk objects. Operations below return operands themselves (or their
+# chunks) whenever the result would be equal, thus preserving sharing, and
+# zero chunks at the end are always trimmed to make representation canonical.
+#
+
+CHUNK_SHIFT = 10
+CHUNK_BITS  = 1 << CHUNK_SHIFT
+CHUNK_MASK  = CHUNK_BITS - 1  # of an index within a chunk
+
+_CHUNK_ALL_SET = (1 << CHUNK_BITS) - 1
+
+
+def _trimmed(chunks):
+    end = len(chunks)
+    while end and not chunks[end-1]:
+        end -= 1
+    return tuple(chunks[:end])
+
+
+def chunks_from_bits(bits):
+    """Splits an int into a tuple of chunks.
+
+    >>> chunks_from_bits(1 << CHUNK_BITS | 1)
+    (1, 1)
+    """
+    chunks = []
+    while bits:
+        chunks.append(bits & _CHUNK_ALL_SET)
+        bits >>= CHUNK_BITS
+    return tuple(chunks)
+
+
+def chunks_or(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    ret = None
+
+    for i, chunk in enumerate(b):
+        if not chunk:
+            continue
+        mine = a[i]
+        if mine is chunk:
+            continue
+        if mine:
+            chunk |= mine
+            if chunk == mine:
+                continue
+        if ret is None:
+            ret = list(a)
+        ret[i] = chunk
+
+    return a if ret is None else tuple(ret)
+
+
+def chunks_and(a, b):
+    ret = []
+    for mine, chunk in zip(a, b):
+        if mine is not chunk:
+            masked = mine & chunk
+            mine = (mine if masked == mine else
+                    chunk if masked == chunk else masked)
+        ret.append(mine)
+    return _trimmed(ret)
+
+
+def chunks_sub(a, b):
+    ret = None
+
+    for i, chunk in enumerate(b[:len(a)]):
+        mine = a[i]
+        if not (mine and chunk):
+            continue
+        if mine is chunk:
+            mine = 0
+        else:
+            masked = mine & ~chunk
+            if masked == mine:
+                continue
+            mine = masked
+        if ret is None:
+            ret = list(a)
+        ret[i] = mine
+
+    return a if ret is None else _trimmed(ret)
+
+
+def chunks_xor(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    ret = list(a)
+    for i, chunk in enumerate(b):
+        ret[i] = (ret[i] ^ chunk) if chunk is not ret[i] else 0
+    return _trimmed(ret)
+
+
+def chunks_popcount_delta(old, new):
+    """Returns the number of bits set in new chunks minus that in old ones.
+    Only chunks that are not shared between the two are counted.
+
+    >>> a = chunks_from_bits(1 << CHUNK_BITS | 1)
+    >>> chunks_popcount_delta(a, chunks_or(a, (0b110,)))
+    2
+    """
+    delta = 0
+    nr_common = min(len(old), len(new))
+    for mine, chunk in zip(old[:nr_common], new[:nr_common]):
+        if mine is not chunk:
+            if mine & ~chunk:
+                delta += popcount(chunk) - popcount(mine)
+            else:
+                delta += popcount(chunk ^ mine)  # only bits added
+    for chunk in new[nr_common:]:
+        if chunk:
+            delta += popcount(chunk)
+    for mine in old[nr_common:]:
+        if mine:
+            delta -= popcount(mine)
+    return delta
+
+
+class ChunkedBitSet(BitSet):
+    """Persistent variant of BitSet that stores bits in a tuple of immutable
+    chunks of CHUNK_BITS bits each.
+
+    Copies and results of set operations share chunks that are not changed
+    with their operands, e.g. merging a set into an empty one makes them
+    refer to the same chunks. Zero chunks at the end are not stored, so a set
+    of few items with large indices only takes the chunks they fall into.
+
+    The length is not recounted over all chunks: a set remembers chunks it
+    was last counted for, and only bits of chunks changed since then (or
+    taken from an operand counted already) are counted.
+
+    >>> s = ChunkedBitSet([1, 5000])
+    >>> s |= ChunkedBitSet([2])
+    >>> sorted(s), len(s), 5000 in s, 3 in s
+    ([1, 2, 5000], 3, True, False)
+    >>> t = ChunkedBitSet() | s
+    >>> t._bits is s._bits
+    True
+    >>> s - ChunkedBitSet([1, 2])
+    ChunkedBitSet([5000])
+    >>> ChunkedBitSet([5000]).isdisjoint(ChunkedBitSet([2])), s >= t
+    (True, True)
+    """
+    __slots__ = '_counted',  # (chunks, number of bits set in them)
+
+    _empty_bits = ()
+
+    def __init__(self, iterable=()):
+        self._counted = self._empty_bits, 0
+        super(ChunkedBitSet, self).__init__(iterable)
+
+    def _adopt_count(self, other):
+        # Takes the count from an operand whose chunks became ours.
+        if (self._is_compatible(other) and self._bits is other._bits and
+                other._counted[0] is other._bits):
+            self._counted = other._counted
+
+    def _bits_of(self, other):
+        if self._is_compatible(other):
+            return other._bits
+        return chunks_from_bits(bits_from_indices(map(self._index_of, other)))
+
+    def _set_chunk(self, chunk_index, chunk):
+        chunks = list(self._bits)
+        if chunk_index >= len(chunks):
+            chunks.extend([0] * (chunk_index + 1 - len(chunks)))
+        chunks[chunk_index] = chunk
+        self._bits = _trimmed(chunks)
+
+    def __contains__(self, item):
+        try:
+            index = self._index_of(item)
+        except (AttributeError, TypeError):
+            return False
+        chunks = self._bits
+        chunk_index = index >> CHUNK_SHIFT
+        return (chunk_index < len(chunks) and
+                bool(chunks[chunk_index] >> (index & CHUNK_MASK) & 1))
+
+    def _iter_indices(self):
+        for chunk_index, chunk in enumerate(self._bits):
+            if chunk:
+                base = chunk_index << CHUNK_SHIFT
+                for index in iter_bits(chunk):
+                    yield base + index
+
+    def __iter__(self):
+        return map(self._item_at, self._iter_indices())
+
+    def __len__(self):
+        chunks = self._bits
+        counted, count = self._counted
+        if counted is not chunks:
+            count += chunks_popcount_delta(counted, chunks)
+            self._counted = chunks, count
+        return count
+
+    def copy(self):
+        ret = self._from_bits(self._bits)
+        ret._counted = self._counted
+        return ret
+
+    def iter_blocks(self, block_shift):
+        """Yields indices of blocks of 2**block_shift items having any items
+        in the set, that is, distinct indices of items shifted right by
+        block_shift, in ascending order. Blocks may not exceed chunks.
+
+        >>> list(ChunkedBitSet([1, 2, 65, 5000]).iter_blocks(6))
+        [0, 1, 78]
+        """
+        if not 0 <= block_shift <= CHUNK_SHIFT:
+            raise ValueError('block_shift must be within [0, CHUNK_SHIFT]')
+        blocks_per_chunk_shift = CHUNK_SHIFT - block_shift
+
+        for chunk_index, chunk in enumerate(self._bits):
+            base = chunk_index << blocks_per_chunk_shift
+            while chunk:
+                block = ((chunk & -chunk).bit_length() - 1) >> block_shift
+                yield base + block
+                chunk &= -1 << ((block + 1) << block_shift)
+
+    def __bool__(self):
+        return bool(self._bits)
+    __nonzero__ = __bool__
+
+    def add(self, item):
+        index = self._index_of(item)
+        chunk_index = index >> CHUNK_SHIFT
+        bit = 1 << (index & CHUNK_MASK)
+
+        chunks = self._bits
+        if chunk_index < len(chunks):
+            chunk = chunks[chunk_index]
+            if chunk & bit:
+                return
+            self._bits = (chunks[:chunk_index] + (chunk | bit,) +
+                          chunks[chunk_index+1:])
+        else:
+            self._bits = chunks + (0,) * (chunk_index - len(chunks)) + (bit,)
+
+        counted, count = self._counted
+        if counted is chunks:
+            self._counted = self._bits, count + 1
+
+    def discard(self, item):
+        if item in self:
+            self.remove(item)
+
+    def remove(self, item):
+        if item not in self:
+            raise KeyError(item)
+        index = self._index_of(item)
+        chunk_index = index >> CHUNK_SHIFT
+        self._set_chunk(chunk_index, (self._bits[chunk_index] ^
+                                      1 << (index & CHUNK_MASK)))
+
+    def pop(self):
+        for index in self._iter_indices():
+            item = self._item_at(index)
+            self.remove(item)
+            return item
+        raise KeyError('pop from an empty set')
+
+    def update(self, *others):
+        for other in others:
+            self._bits = chunks_or(self._bits, self._bits_of(other))
+
+    def update_flags(self, flags):
+        if not isinstance(flags, bytearray):
+            flags = bytearray(flags)
+        self._bits = chunks_or(self._bits, _trimmed([
+                bits_from_flags(flags[start:start+CHUNK_BITS])
+                for start in range(0, len(flags), CHUNK_BITS)]))
+
+    def __ior__(self, other):
+        self._bits = chunks_or(self._bits, self._bits_of(other))
+        self._adopt_count(other)
+        return self
+
+    def __iand__(self, other):
+        self._bits = chunks_and(self._bits, self._bits_of(other))
+        return self
+
+    def __isub__(self, other):
+        self._bits = chunks_sub(self._bits, self._bits_of(other))
+        return self
+
+    def __ixor__(self, other):
+        self._bits = chunks_xor(self._bits, self._bits_of(other))
+        return self
+
+    def __or__(self, other):
+        return self._from_bits(chunks_or(self._bits, self._bits_of(other)))
+    __ror__ = __or__
+
+    def __and__(self, other):
+        return self._from_bits(chunks_and(self._bits, self._bits_of(other)))
+    __rand__ = __and__
+
+    def __xor__(self, other):
+        return self._from_bits(chunks_xor(self._bits, self._bits_of(other)))
+    __rxor__ = __xor__
+
+    def __sub__(self, other):
+        return self._from_bits(chunks_sub(self._bits, self._bits_of(other)))
+
+    def __rsub__(self, other):
+        return self._from_bits(chunks_sub(self._bits_of(other), self._bits))
+
+    union        = __or__
+    intersection = __and__
+    difference   = __sub__
+
+    def isdisjoint(self, other):
+        if self._is_compatible(other):
+            return not any(mine & chunk for mine, chunk
+                           in zip(self._bits, other._bits))
+        return not any(item in self for item in other)
+
+    def issuperset(self, other):
+        if self._is_compatible(other):
+            return (len(other._bits) <= len(self._bits) and
+                    not any(chunk & ~mine for mine, chunk
+                            in zip(self._bits, other._bits)
+                            if mine is not chunk))
+        return all(item in self for item in other)
+
+    def issubset(self, other):
+        if self._is_compatible(other):
+            return other.issuperset(self)
+        return all(item in other for item in self)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()